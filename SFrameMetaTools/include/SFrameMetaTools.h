@@ -2,6 +2,7 @@
 #define SFRAMEMETATOOLS_H_BCDHRMT9
 
 #include <string>
+#include <vector>
 namespace SFrameMetaTools {
     std::string GetLibVersionString();
 }
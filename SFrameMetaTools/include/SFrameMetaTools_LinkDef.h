@@ -17,4 +17,16 @@
 #pragma link C++ class LogScale+;
 #pragma link C++ class CountScale+;
 
+// Dictionaries for the stl containers that are commonly found in ntuples.
+// Cycles created by sframe_create_full_cycle.py don't build their own
+// dictionaries for these types, but load libSFrameMetaTools instead.
+#pragma link C++ class vector<vector<float> >+;
+#pragma link C++ class vector<vector<double> >+;
+#pragma link C++ class vector<vector<int> >+;
+#pragma link C++ class vector<vector<unsigned int> >+;
+#pragma link C++ class vector<vector<short> >+;
+#pragma link C++ class vector<vector<unsigned short> >+;
+#pragma link C++ class vector<string>+;
+#pragma link C++ class vector<vector<string> >+;
+
 #endif // __CINT__
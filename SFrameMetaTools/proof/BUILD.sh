@@ -2,6 +2,7 @@
 
 if [ "$1" = "clean" ]; then
     make distclean
+    rm -f BUILD_CACHE_PATH
     exit 0
 fi
 
@@ -10,4 +11,46 @@ if [ "x" != "x" ]; then
     exit 0
 fi
 
-make default
+# All the workers on a node build the very same library. Instead of compiling
+# it once per worker, the first worker builds it into a cache that is shared
+# by all the workers of the node, while the others wait for it to finish.
+# The cache is keyed by the sources and the ROOT version, so a changed package
+# or a different ROOT gets a new build. SETUP.C loads the library from the
+# path written into BUILD_CACHE_PATH.
+CACHE_DIR="${SFRAME_META_TOOL_PAR_CACHE:-${TMPDIR:-/tmp}/SFrameMetaTools_par_cache_$(id -un)}"
+CACHE_KEY="$( ( find Makefile include src -type f ! -name '*_Dict.*' ! -name '_*_version_info.*' | sort | xargs cat; \
+                root-config --version --arch ) | md5sum | cut -d' ' -f1 )"
+CACHE_ENTRY="${CACHE_DIR}/${CACHE_KEY}"
+
+build_into_cache() {
+    if [ -d "${CACHE_ENTRY}" ]; then
+        echo "Using the cached build in ${CACHE_ENTRY}"
+        return 0
+    fi
+    make default || return 1
+    # Ask the SFrame Makefile where it put the library
+    local SHLIB="$( make --no-print-directory -s -f Makefile -f - print_shlibfile <<'EOF'
+print_shlibfile:
+	@echo $(SHLIBFILE)
+EOF
+)"
+    # Fill the entry under a temporary name, so that it appears complete or not at all
+    rm -rf "${CACHE_ENTRY}.tmp"
+    mkdir -p "${CACHE_ENTRY}.tmp" && cp "${SHLIB}" "${CACHE_ENTRY}.tmp/" && mv "${CACHE_ENTRY}.tmp" "${CACHE_ENTRY}"
+}
+
+mkdir -p "${CACHE_DIR}" || exit 1
+if command -v flock > /dev/null; then
+    ( flock 9 && build_into_cache ) 9> "${CACHE_ENTRY}.lock" || exit 1
+else
+    # Without flock, an atomic mkdir does the locking
+    until mkdir "${CACHE_ENTRY}.lockdir" 2> /dev/null; do
+        sleep 1
+    done
+    build_into_cache
+    STATUS=$?
+    rmdir "${CACHE_ENTRY}.lockdir"
+    [ ${STATUS} -eq 0 ] || exit 1
+fi
+
+echo "${CACHE_ENTRY}" > BUILD_CACHE_PATH
@@ -66,6 +66,83 @@ def main():
     parser.add_option( "-m", "--mc-tags", dest="mctags", action="store",
                         type="str", default="mc_,mcevt,truth",
                         help="Comma separated tags that identify MC variables. Default: mc_,mcevt,truth" )
+    parser.add_option( "-s", "--split-jobs", dest="njobs", action="store",
+                        type="int", default=0,
+                        help="Number of jobs to split the input files into. One config file is written per job." )
+    parser.add_option( "--split-by", dest="split_by", action="store",
+                        type="choice", choices=[ "entries", "bytes" ], default="entries",
+                        help="Balance the jobs in the number of entries or of compressed bytes. Default: entries" )
+    parser.add_option( "--split-files", dest="split_files", action="store_true", default=False,
+                        help="Also split input files that are larger than a job into ranges of entries, aligned to the clusters of the tree." )
+    parser.add_option( "--proof", dest="proof", action="store_true", default=False,
+                        help="Run the cycle on PROOF-Lite. The number of workers is chosen from the number of cores and the number of entries in the input files." )
+    parser.add_option( "--proof-workers", dest="proof_workers", action="store",
+                        type="int", default=0,
+                        help="Number of PROOF-Lite workers to use instead of the automatic choice." )
+    parser.add_option( "--compression", dest="compression", action="store",
+                        type="str", default="",
+                        help="Compression of the output tree, as algorithm:level with one of zlib, lzma, lz4 or zstd, like lz4:4." )
+    parser.add_option( "--auto-flush", dest="auto_flush", action="store",
+                        type="int", default=0,
+                        help="AutoFlush of the output tree. Entries per cluster if positive, compressed bytes per cluster if negative." )
+    parser.add_option( "--tune-baskets", dest="tune_baskets", action="store_true", default=False,
+                        help="Give every output branch a basket size that fits one cluster, from the sizes of the branches in the rootfile." )
+    parser.add_option( "--selection", dest="selection", action="store",
+                        type="str", default="",
+                        help="Skip the events failing this C++ expression of the variables, like \"el_n>0 && met>20000\". Only its branches are read before it is applied." )
+    parser.add_option( "--timing", dest="timing", action="store_true", default=False,
+                        help="Time the phases of the processing, and write a table and a histogram of the event processing time into the log and the output." )
+    parser.add_option( "--progress", dest="progress", action="store",
+                        type="int", default=0,
+                        help="Write a progress record with the events/s, MB/s and ETA of every process every this many seconds. Combine them with sframe_progress." )
+    parser.add_option( "--progress-output", dest="progress_output", action="store",
+                        type="str", default="",
+                        help="File for the progress records, or unix:PATH for the datagram socket of sframe_progress. Default: CYCLENAME_progress.jsonl in the temporary directory" )
+    parser.add_option( "--benchmark", dest="benchmark", action="store_true",
+                        default=False,
+                        help="Also create bench/CYCLENAME_Benchmark.cxx, a program timing the event loop of the cycle "
+                        "over the first entries of a file, without sframe_main." )
+    parser.add_option( "--systematics", dest="systematics", action="store",
+                        type="str", default="",
+                        help="Comma separated regular expressions of the systematic variations in the branch names, like "
+                        "\"_JES_(up|down)\". The branches of all the variations are read once per event, the analysis runs once per "
+                        "variation, and every variation gets its own output tree." )
+    parser.add_option( "--block-size", dest="block_size", action="store",
+                        type="int", default=0,
+                        help="Read the flat variables of basic types this many entries at a time, into one buffer per "
+                        "variable for the vectorizable loops of ExecuteBlock." )
+    parser.add_option( "--count-reads", dest="count_reads", action="store_true",
+                        default=False,
+                        help="Count the reads of the input variables by the cycle, and write the variable list "
+                        "with the unread variables commented out at the end of the cycle." )
+    parser.add_option( "--used-variables", dest="used_variables", action="store",
+                        default="",
+                        help="File of the variable list written by --count-reads. Default: CYCLENAME_used_variables.C" )
+    parser.add_option( "--memory-monitor", dest="memory", action="store",
+                        type="int", default=0,
+                        help="Sample the memory usage every this many events, and write a summary of its growth into the log." )
+    parser.add_option( "--memory-alarm", dest="memory_alarm", action="store",
+                        type="int", default=512,
+                        help="Warn in the log every time the resident memory grew by this many MB more. Default: 512" )
+    parser.add_option( "--max-output-size", dest="max_output_size", action="store",
+                        type="int", default=0,
+                        help="Split the output file into parts of at most this many megabytes, at cluster boundaries of the output tree." )
+    parser.add_option( "--max-output-entries", dest="max_output_entries", action="store",
+                        type="int", default=0,
+                        help="Split the output file into parts of at most this many entries, at cluster boundaries of the output tree." )
+    parser.add_option( "--implicit-mt", dest="implicit_mt", action="store",
+                        type="int", default=-1,
+                        help="Enable the implicit multithreading of ROOT with this many threads, 0 for all the cores, for unzipping the input and writing the output. Under PROOF-Lite the cores are shared between the workers." )
+    parser.add_option( "--pch", dest="pch", action="store_true", default=False,
+                        help="Use a precompiled header for the package. It is created as include/ANALYSIS_PCH.h if it doesn't exist." )
+    parser.add_option( "--decompose", dest="decompose", action="store_true", default=False,
+                        help="Read the data members of split objects in the rootfile into separate variables, instead of reading the whole objects." )
+    parser.add_option( "-i", "--input-files", dest="files", action="store",
+                        type="str", default="",
+                        help="Comma separated glob patterns, or a text file with one file per line, of the input files for the config. Patterns ending in .xml stand for the output files of the cycles configured in them. Remember to quote the patterns." )
+    parser.add_option( "-j", "--nproc", dest="nproc", action="store",
+                        type="int", default=0,
+                        help="Number of parallel processes used to count the entries of the input files. Default: number of cores" )
     # parser.add_option( "-f", "--more-functions", dest="functions", action="store_const",
     #                     const=True, default=False,
     #                     help="Put stuff into separate functions where possible." )
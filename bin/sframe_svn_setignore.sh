@@ -8,6 +8,8 @@ function sframe_svn_setignore {
     svn propset svn:ignore "${PREV}${NL}obj${NL}.sframe.\*" .
     local PREV="$(svn propget svn:ignore src)"
     svn propset svn:ignore "${PREV}${NL}${LIBRARY}_Dict.h${NL}${LIBRARY}_Dict.cxx${NL}_${LIBRARY}_version_info.cxx" src
+    local PREV="$(svn propget svn:ignore include)"
+    svn propset svn:ignore "${PREV}${NL}${LIBRARY}_PCH.h.gch" include
 
     echo "Now ignoring:"
     echo "   obj/"
@@ -15,6 +17,7 @@ function sframe_svn_setignore {
     echo "   src/${LIBRARY}_Dict.h"
     echo "   src/${LIBRARY}_Dict.cxx"
     echo "   src/_${LIBRARY}_version_info.cxx"
+    echo "   include/${LIBRARY}_PCH.h.gch"
     echo "If you have trouble checking in please run 'svn up' first."
     echo "You can edit the ignores by calling 'svn propedit svn:ignore .' in any directory." 
 }
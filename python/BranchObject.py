@@ -33,8 +33,11 @@ class Variable( object ):
         query+="""(?:(?:[ \t]*(?P<point>\*)[ \t]*)|(?:(?<!\*)[ \t]+(?!\*)))"""
         # if there is a star, it can have whitespaces before or after.
         # if there is no star, there must be some whitespace which is neiter preceded nor succede by a star.
-        # and now for the name
-        query+="""(?P<name>[a-zA-Z_][a-zA-Z_0-9]*)[ \t]*;[ \t]*"""
+        # and now for the name. Dots can only appear in the names of the data members
+        # of split objects, like el.pt, which are read in the decomposed mode.
+        query+="""(?P<name>[a-zA-Z_][a-zA-Z_0-9.]*)"""
+        # Arrays have fixed dimensions, like x[100] or x[100][4]
+        query+="""(?P<dims>(?:[ \t]*\[[ \t]*[0-9]+[ \t]*\])*)[ \t]*;[ \t]*"""
         # finally there may be a comment with the variable.
         # in a TTree this is usually saved in the title.
         query+="""(?P<title>//.*)?$"""
@@ -49,7 +52,14 @@ class Variable( object ):
         name = match.group( "name" )
         pointer = match.group( "point" )
         title = match.group( "title" )
-        return cls(name=name, typename=typename,pointer=pointer, commented=commented,title=title)
+        shape = [ int( n ) for n in re.findall( "[0-9]+", match.group( "dims" ) ) ]
+        # Like in ROOT class headers, a comment starting with //[n] names the counter
+        # of a variable-length array, whose first dimension is then the largest length.
+        count = ""
+        countmatch = re.match( """//[ \t]*\[[ \t]*([a-zA-Z_][a-zA-Z_0-9.]*)[ \t]*\]""", title or "" )
+        if shape and countmatch:
+            count = countmatch.group( 1 )
+        return cls(name=name, typename=typename,pointer=pointer, commented=commented,title=title,member=( "." in name ),shape=shape,count=count)
         
     
     ## @short Constructor of the Variable class
@@ -63,16 +73,27 @@ class Variable( object ):
     # @param name The name of the variable.
     # @param commeneted Should be eiter "" or "//" to indicate wheter to use this variable or not
     # @param pointer Should be eiter "" or "*" to indicate whether this variable needs to be accessed as an object.
-    def __init__( self, name, typename="", pointer="", commented="", title="" ):
+    # @param member Whether this variable is a data member of a split object, read without the object.
+    # @param shape List of the array dimensions, empty if the variable is no array.
+    # @param count Name of the counter of a variable-length array. The first dimension is then its maximum.
+    def __init__( self, name, typename="", pointer="", commented="", title="", member=False, shape=[], count="" ):
         super( Variable, self ).__init__()
+        self.member=member
         self.SetName(name)
         self.SetTypeName(typename)
         self.SetPointer(pointer)
         self.SetCommented(commented)
         self.SetTitle(title)
+        self.shape=list(shape)
+        self.count=count
         self._typelength=0
         self._namelength=0
         self.mc=0
+        # Whether the variable is used by the selection of the events
+        self.selection=False
+        # The systematic variation and the nominal variable of a variant
+        self.variation=""
+        self.nominal=None
     
     def SetName(self,name):
         self._name = name
@@ -83,7 +104,8 @@ class Variable( object ):
         if not re.match( "[a-zA-Z_]", cname ):  # furthermore, the name must start with a letter, not a number
             cname = "_" + cname
         
-        if cname != name:
+        # The dots in the names of the data members of split objects are expected
+        if cname != name and not ( self.member and cname == name.replace( ".", "_" ) ):
             print >>sys.stderr, "WARNING: Illegal characters in variable name \"%s\", using \"%s\" instead. " % (name, cname)
         self._cname = cname
     
@@ -162,13 +184,19 @@ class Variable( object ):
     
     def GetNameLength(self):
         if not self._namelength:
-            self._namelength = len("%s%s; " % (self.pointer, self.name))
+            self._namelength = len("%s%s%s; " % (self.pointer, self.name, self.Dims()))
         return self._namelength
     
     namelength = property(GetNameLength,SetNameLength)
     
+    def Dims(self):
+        return "".join( [ "[%d]" % n for n in self.shape ] )
+    
+    def Size(self):
+        return reduce( lambda a, b: a*b, self.shape, 1 )
+    
     def StdPointName(self):
-        return ("%-"+str(self.namelength)+"s")%("%s%s; " % (self.pointer, self.cname))
+        return ("%-"+str(self.namelength)+"s")%("%s%s%s; " % (self.pointer, self.cname, self.Dims()))
     
     def StdTypeName(self):
         return ("%-"+str(self.typelength)+"s") % (self.commented+ self._typename)
@@ -179,8 +207,15 @@ class Variable( object ):
     def Declaration(self):
         return self.StdTypeName()+self.StdPointName()+self.title
     
+    # The line for a variable list. It keeps the real names of the data members
+    # of split objects, which ReadFromString recognizes by their dots.
+    def VarlistDeclaration(self):
+        if not self.member:
+            return self.Declaration()
+        return self.StdTypeName()+("%-"+str(self.namelength)+"s")%("%s%s%s; " % (self.pointer, self.name, self.Dims()))+self.title
+    
     def __repr__(self):
-        return "Variable(%s, %s, %s, %s, %s )"%(repr(self.name),repr(self.typename),repr(self.pointer),repr(self.commented),repr(self.title))
+        return "Variable(%s, %s, %s, %s, %s, %s, %s )"%(repr(self.name),repr(self.typename),repr(self.pointer),repr(self.commented),repr(self.title),repr(self.shape),repr(self.count))
         
     def __str__(self):
         return self.Declaration()
@@ -0,0 +1,284 @@
+"""
+Functions to find the input variables that the user code of a cycle created
+by sframe_create_full_cycle.py actually uses.
+
+The code that CreateHeader and CreateSource generate for every variable has a
+fixed form. It is recognized line by line and left out, and only the rest of
+the code is searched for the names of the variables.
+"""
+
+import sys, os, re
+
+## @short Regular expressions matching the lines generated for one variable
+#
+# Every expression has a group "cname" with the C++ name of the variable. The
+# lines of the connection block, which binds, declares, clears and fills the
+# variables, are the ones that CommentOutUnused may comment out.
+connectionLines = [
+    re.compile( r"""^\s*(?P<commented>(?://\s*)?)Bind(?:Block)?Branch\(\s*\d+\s*,\s*"(?P<name>[^"]*)"\s*,\s*(?:\w+::)?(?P<cname>\w+)\s*\);""" ),
+    re.compile( r"""^\s*(?P<commented>(?://\s*)?)BindArray\(\s*\d+\s*,\s*"(?P<name>[^"]*)"\s*,\s*&(?:\w+::)?(?P<cname>\w+)(?:\[0\])+\s*,\s*\d+\s*\);""" ),
+    re.compile( r"""^\s*(?://\s*)?(?:TuneOutputBranch\(\s*)?DeclareVariable\(\s*(?:output\.)?out_(?P<cname>\w+)\s*,\s*"[^"]*"\s*(?:,\s*treeName\s*)?\)""" ),
+    re.compile( r"""^\s*(?://\s*)?out_(?P<cname>\w+)\s*=\s*\*?(?:\w+::)?(?P=cname)\s*;""" ),
+    re.compile( r"""^\s*(?://\s*)?out_(?P<cname>\w+)\.clear\(\);""" ) ]
+otherGeneratedLines = [
+    re.compile( r"""^\s*(?P<cname>\w+)\.Watch\(\s*\w+_Branches::(?P=cname)\s*,\s*"(?P=cname)"\s*\);""" ),
+    re.compile( r"""^\s*m_readCounters\.push_back\(\s*&(?P<cname>\w+)\s*\);""" ),
+    re.compile( r"""^\s*ReadCounter<.*>\s*(?P<cname>\w+)\s*;\s*//!""" ),
+    re.compile( r"""^\s*(?:\w+::)?(?P<cname>\w+)\s*=\s*m_block\.(?P=cname)\[\s*m_blockIndex\s*\];""" ),
+    re.compile( r"""^\s*ReadBlockBranch\(\s*\d+\s*,\s*(?:\w+::)?(?P<cname>\w+)\s*,\s*m_block\.(?P=cname)\s*,""" ) ]
+## @short Regular expressions matching the lines exchanging the variants of the systematic variations
+#
+# The group "cname" is the nominal variable, the group "variant" its variant.
+variantLines = [
+    re.compile( r"""^\s*std::swap\(\s*(?:\w+::)?(?P<cname>\w+)\s*,\s*(?:\w+::)?(?P<variant>\w+)\s*\);""" ),
+    re.compile( r"""^\s*std::swap_ranges\(\s*&(?:\w+::)?(?P<cname>\w+)(?:\[0\])+\s*,.*,\s*&(?:\w+::)?(?P<variant>\w+)(?:\[0\])+\s*\);""" ) ]
+
+## @short Function blanking out the comments and string literals of C++ code
+#
+# The code switched off with #if 0, up to its #else or #endif, is blanked out
+# as well. The newlines are kept, so that the lines of the result match the
+# lines of the code.
+#
+# @param code The C++ code
+def StripCode( code ):
+    pattern = re.compile( r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.DOTALL )
+    lines = pattern.sub( lambda match: re.sub( "[^\n]", " ", match.group( 0 ) ), code ).split( "\n" )
+    # The depth of the nested conditionals in the switched off code, 0 outside of it
+    depth = 0
+    for i, line in enumerate( lines ):
+        directive = re.match( r"\s*#\s*(\w+)(.*)", line )
+        word = directive and directive.group( 1 )
+        if depth:
+            if word in ( "if", "ifdef", "ifndef" ):
+                depth += 1
+            elif word == "endif" or ( depth == 1 and word in ( "else", "elif" ) ):
+                depth -= 1
+        elif word == "if" and re.match( r"\s*0\s*$", directive.group( 2 ) ):
+            depth = 1
+        else:
+            continue
+        lines[ i ] = " " * len( line )
+    return "\n".join( lines )
+
+## @short Function to tell whether a line was generated for a variable
+#
+# Returns the match of the line, or None for the lines of the user code.
+#
+# @param line One line of the code
+def GeneratedLine( line ):
+    for expression in connectionLines + otherGeneratedLines + variantLines:
+        match = expression.match( line )
+        if match:
+            return match
+    return None
+
+## @short Function reading the input variables from the generated connection block
+#
+# Returns a list of ( name, cname, commented ) tuples of the variables bound in
+# the source of the cycle, in their order.
+#
+# @param code The code of the source of the cycle
+def ReadBindings( code ):
+    bindings = []
+    for line in code.splitlines():
+        for expression in connectionLines[ :2 ]:
+            match = expression.match( line )
+            if match:
+                bindings.append( ( match.group( "name" ), match.group( "cname" ), bool( match.group( "commented" ) ) ) )
+    return bindings
+
+## @short Function reading the variants of the systematic variations
+#
+# Returns a list of ( cname, variant ) pairs of the C++ names of the nominal
+# variables and their variants.
+#
+# @param code The code of the source of the cycle
+def ReadVariants( code ):
+    variants = []
+    for line in code.splitlines():
+        for expression in variantLines:
+            match = expression.match( line )
+            if match:
+                variants.append( ( match.group( "cname" ), match.group( "variant" ) ) )
+    return variants
+
+## @short Function finding the class name of the cycle in its source
+#
+# @param code The code of the source of the cycle
+def FindClassName( code ):
+    match = re.search( r"(\w+)::ExecuteEvent\s*\(", code )
+    return match and match.group( 1 ) or ""
+
+## @short Function finding the header of the cycle included by its source
+#
+# @param source Path of the source of the cycle
+# @param code The code of the source of the cycle
+# @param className Name of the cycle
+def FindHeader( source, code, className ):
+    for include in re.findall( r'#include\s*"([^"]*)"', code ):
+        if os.path.basename( include ) == className + ".h":
+            header = os.path.join( os.path.dirname( source ), include )
+            if os.path.exists( header ):
+                return os.path.normpath( header )
+    return ""
+
+## @short Function returning the closing brace that matches an opening one
+#
+# @param code The stripped code
+# @param start Position of the opening brace
+def MatchingBrace( code, start ):
+    depth = 0
+    for i in xrange( start, len( code ) ):
+        if code[ i ] == "{":
+            depth += 1
+        elif code[ i ] == "}":
+            depth -= 1
+            if not depth:
+                return i
+    return len( code )
+
+## @short Function returning the bodies of the member functions of a class
+#
+# Only the member functions that are defined outside of the class, like in
+# the other sources of the package, are found.
+#
+# @param code The stripped code
+# @param className Name of the class
+def MethodBodies( code, className ):
+    bodies = []
+    for match in re.finditer( r"\b%s::~?\w+\s*\(" % className, code ):
+        brace = code.find( "{", match.end() )
+        semicolon = code.find( ";", match.end() )
+        if brace < 0 or ( 0 <= semicolon < brace ):
+            continue
+        bodies.append( code[ match.start():MatchingBrace( code, brace ) + 1 ] )
+    return bodies
+
+## @short Function removing the generated code from the code of a cycle
+#
+# The comments, the strings, the structs of the header and the lines
+# generated for every variable are replaced by blanks.
+#
+# @param code The code
+# @param className Name of the cycle
+def UserCode( code, className ):
+    stripped = StripCode( code )
+    for struct in re.finditer( r"struct\s+%s_(?:Branches|Block|Output)\s*[:{]" % className, stripped ):
+        end = MatchingBrace( stripped, stripped.find( "{", struct.start() ) )
+        stripped = stripped[ :struct.start() ] + re.sub( "[^\n]", " ", stripped[ struct.start():end + 1 ] ) + stripped[ end + 1: ]
+    # The generated lines are recognized in the original code, with their strings
+    return "\n".join( [ not GeneratedLine( line ) and userLine or ""
+                        for line, userLine in zip( code.split( "\n" ), stripped.split( "\n" ) ) ] )
+
+## @short Function finding the names referenced by the user code of a cycle
+#
+# The source and the header of the cycle are searched without their generated
+# code. The other sources and headers of the package are searched only in the
+# member functions of the cycle that they define.
+#
+# @param source Path of the source of the cycle
+# @param header Path of the header of the cycle
+# @param className Name of the cycle
+# @param others Paths of the other files of the package
+def ReferencedNames( source, header, className, others ):
+    names = set()
+    for filename in [ source, header ]:
+        if filename:
+            names.update( re.findall( r"[A-Za-z_]\w*", UserCode( open( filename ).read(), className ) ) )
+    for filename in others:
+        for body in MethodBodies( StripCode( open( filename ).read() ), className ):
+            names.update( re.findall( r"[A-Za-z_]\w*", body ) )
+    return names
+
+## @short Function finding the other sources and headers of the package of a cycle
+#
+# @param source Path of the source of the cycle
+# @param header Path of the header of the cycle
+def PackageFiles( source, header ):
+    files = set()
+    for directory in set( [ os.path.dirname( source ) or ".", os.path.dirname( header ) or "." ] ):
+        for name in os.listdir( directory ):
+            if os.path.splitext( name )[ 1 ] in ( ".cxx", ".cpp", ".cc", ".C", ".h", ".hpp", ".icc" ) and not name.endswith( "_Dict.h" ):
+                files.add( os.path.normpath( os.path.join( directory, name ) ) )
+    files.discard( os.path.normpath( source ) )
+    files.discard( os.path.normpath( header ) )
+    return sorted( files )
+
+## @short Function finding the input variables that the user code of a cycle uses
+#
+# Returns the class name and a list of ( name, cname, used ) tuples of the
+# bound input variables. A variable is used if the user code names it, or if
+# it is the size of a used array, or the user code calls its size accessor,
+# or if it is the variant of a used variable in a systematic variation.
+#
+# @param source Path of the source of the cycle
+# @param package Whether to search the other files of the package as well
+def AnalyseCycle( source, package = True ):
+    code = open( source ).read()
+    className = FindClassName( code )
+    if not className:
+        print >>sys.stderr, "ERROR: No ExecuteEvent found in \"%s\"" % source
+        return "", []
+    header = FindHeader( source, code, className )
+    if not header:
+        print >>sys.stderr, "WARNING: The header of %s was not found, only searching its source" % className
+    others = package and PackageFiles( source, header ) or []
+    names = ReferencedNames( source, header, className, others )
+    bindings = [ ( name, cname ) for name, cname, commented in ReadBindings( code ) if not commented ]
+    used = set( [ cname for name, cname in bindings if cname in names ] )
+    # The sizes of the arrays, which the header declares with //[size]
+    sizes = {}
+    if header:
+        for cname, size in re.findall( r"\b(\w+)\s*(?:\[\d+\])+\s*;\s*//\s*\[\s*([\w.]+)\s*\]", open( header ).read() ):
+            sizes[ cname ] = re.sub( r"[^\w]", "_", size )
+    for cname, size in sizes.items():
+        if cname in used or cname + "_size" in names:
+            used.add( size )
+    for cname, variant in ReadVariants( code ):
+        if cname in used:
+            used.add( variant )
+    return className, [ ( name, cname, cname in used ) for name, cname in bindings ]
+
+## @short Function commenting out the connection block of the unused variables
+#
+# The lines binding, declaring, clearing and filling the unused variables in
+# the source of the cycle are commented out, so that their branches are not
+# read anymore. A backup of the source is kept.
+#
+# @param source Path of the source of the cycle
+# @param unused Set of the C++ names of the unused variables
+def CommentOutUnused( source, unused ):
+    lines = open( source ).read().split( "\n" )
+    changed = 0
+    for i, line in enumerate( lines ):
+        if line.lstrip().startswith( "//" ):
+            continue
+        for expression in connectionLines:
+            match = expression.match( line )
+            if match and match.group( "cname" ) in unused:
+                indent = line[ :len( line ) - len( line.lstrip() ) ]
+                lines[ i ] = indent + "// " + line.lstrip()
+                changed += 1
+                break
+    if not changed:
+        return 0
+    import shutil
+    print >>sys.stderr, "WARNING:: Copying \"%s\" to \"%s.backup\"" % ( source, source )
+    shutil.copy2( source, source + ".backup" )
+    output = open( source, "w" )
+    output.write( "\n".join( lines ) )
+    output.close()
+    return changed
+
+## @short Function writing the variable list with the unused variables commented out
+#
+# @param varlist List of "Variable" objects the cycle was created from
+# @param used Set of the C++ names of the used variables
+# @param filename Path of the variable list to write
+def WritePrunedVarlist( varlist, used, filename ):
+    output = open( filename, "w" )
+    for var in varlist:
+        if not var.commented and var.cname not in used:
+            var.commented = "//"
+        output.write( var.VarlistDeclaration().rstrip() + "\n" )
+    output.close()
@@ -24,7 +24,7 @@
 # </code>
 
 
-import re, sys
+import re, sys, math
 import BranchObject
 import TTreeReader
 import FullCycleTemplates as templates
@@ -107,6 +107,580 @@ def CleanType( typename ):
 
 
 
+## @short Function to get the list of input files from a glob pattern or a file list
+#
+# The input files can be given as one or more comma separated glob patterns, like
+# "data/*.root,more_data/*.root", or as a text file that lists one file per line.
+# Lines in such a list that start with # are ignored. A pattern ending in ".xml"
+# stands for the output files of the cycles configured in the matching files,
+# see ReadOutputFilePatterns.
+#
+# @param files Glob patterns or name of a text file with a list of files
+def ExpandInputFiles( files ):
+    """
+    Expand the glob patterns or the file list in files into a sorted list of file names.
+    """
+    import os.path, glob
+    if os.path.isfile( files ) and not files.endswith( ".xml" ) and open( files ).read( 4 ) != "root":
+        filelist = []
+        for line in open( files ):
+            line = line.strip()
+            if line and not line.startswith( "#" ):
+                filelist.append( line )
+        return filelist
+    
+    filelist = []
+    for pattern in files.split( "," ):
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if pattern.endswith( ".xml" ):
+            configs = sorted( glob.glob( pattern ) )
+            if not configs:
+                print >>sys.stderr, "WARNING: No configurations match \"%s\"" % pattern
+            for config in configs:
+                outputs = ReadOutputFilePatterns( config )
+                if not outputs:
+                    print >>sys.stderr, "WARNING: No output files recorded in \"%s\"" % config
+                filelist += ExpandInputFiles( ",".join( outputs ) )
+            continue
+        matches = glob.glob( pattern )
+        if not matches:
+            print >>sys.stderr, "WARNING: No input files match \"%s\"" % pattern
+        filelist += sorted( matches )
+    return filelist
+
+## @short Class to hold the information about one input file
+#
+# A list of instances of this class is assembled by CreateCycle from the input files
+# given on the command line, and written into the configuration by CreateConfig.
+class InputFile( object ):
+    """
+    One of the input files of the configuration, with the number of entries and
+    compressed bytes of its tree, and the Lumi to give it in the configuration.
+    An input file can also be restricted to the range of nmax entries after the
+    first skip entries, in which case entries, zipbytes and lumi refer to that range.
+    """
+    def __init__( self, name, entries=0, zipbytes=0, lumi=1.0, skip=0, nmax=-1 ):
+        super( InputFile, self ).__init__()
+        self.name = name
+        self.entries = entries
+        self.zipbytes = zipbytes
+        self.lumi = lumi
+        self.skip = skip
+        self.nmax = nmax
+    
+    def __repr__( self ):
+        return "InputFile(%s, %s, %s, %s, %s, %s )" % ( repr( self.name ), repr( self.entries ), repr( self.zipbytes ), repr( self.lumi ), repr( self.skip ), repr( self.nmax ) )
+
+## @short Function to split an input file into entry ranges at cluster boundaries
+#
+# A file that is larger than a whole job is split into nranges ranges of about
+# equal numbers of entries. The ranges start at cluster boundaries of the tree,
+# so that no two jobs decompress the same baskets.
+# Returns a list of "InputFile" objects, one per range. Their compressed bytes and
+# Lumi are the shares of those of the whole file.
+#
+# @param inputFile The "InputFile" to split
+# @param nranges The number of ranges to split it into
+# @param treename Name of the input tree
+def SplitInputFile( inputFile, nranges, treename ):
+    import bisect
+    boundaries = TTreeReader.GetClusterBoundaries( inputFile.name, treename )
+    if len( boundaries ) < 2:
+        return [ inputFile ]
+    nentries = boundaries[ -1 ]
+    
+    # Find the cluster boundary that is closest to each ideal splitting point
+    starts = [ 0 ]
+    for i in range( 1, nranges ):
+        ideal = nentries * i / nranges
+        index = bisect.bisect_left( boundaries, ideal )
+        if index > 0 and ideal - boundaries[ index - 1 ] <= boundaries[ index ] - ideal:
+            index -= 1
+        if starts[ -1 ] < boundaries[ index ] < nentries:
+            starts.append( boundaries[ index ] )
+    
+    ranges = []
+    for start, end in zip( starts, starts[ 1: ] + [ nentries ] ):
+        share = float( end - start ) / nentries
+        ranges.append( InputFile( inputFile.name, end - start, int( inputFile.zipbytes * share ), inputFile.lumi * share, start, end - start ) )
+    return ranges
+
+## @short Function to distribute weighted items over a number of jobs
+#
+# This function solves the bin packing problem of the job splitting with the
+# "largest first" heuristic: The items are sorted by decreasing weight, and each
+# one is given to the job with the smallest total weight so far. Ties go to the
+# job with the fewest items, so that unknown weights still give balanced jobs.
+# Returns a list of njobs lists of item indices. Some may be empty if there
+# are fewer items than jobs.
+#
+# @param weights List of the weights of the items
+# @param njobs Number of jobs to distribute the items over
+def BalanceJobs( weights, njobs ):
+    import heapq
+    jobs = [ [] for i in range( njobs ) ]
+    heap = [ ( 0, 0, i ) for i in range( njobs ) ]
+    for index in sorted( range( len( weights ) ), key=lambda index: -weights[ index ] ):
+        total, nitems, job = heapq.heappop( heap )
+        jobs[ job ].append( index )
+        heapq.heappush( heap, ( total + weights[ index ], nitems + 1, job ) )
+    for job in jobs:
+        job.sort()
+    return jobs
+
+## @short Function to print the load balance of a job splitting
+#
+# The total weight of a set of jobs is limited by the slowest job. The efficiency
+# printed here is the mean weight divided by the largest, which is 100% for
+# perfectly balanced jobs. If the largest item is larger than the mean job, it
+# limits what more jobs can achieve, which is pointed out as well.
+#
+# @param weights List of the weights of the items
+# @param jobs List of lists of item indices, as returned by BalanceJobs
+# @param unit Name of the unit of the weights
+def PrintJobBalance( weights, jobs, unit ):
+    totals = [ sum( [ weights[ index ] for index in job ] ) for job in jobs ]
+    mean = float( sum( totals ) ) / len( totals )
+    print "Job splitting:: %6s %8s %14s %8s" % ( "job", "files", unit, "/ mean" )
+    for i, job in enumerate( jobs ):
+        print "Job splitting:: %6d %8d %14d %8.3f" % ( i, len( job ), totals[ i ], mean and totals[ i ] / mean )
+    if not mean:
+        return
+    print "Job splitting:: %d jobs, mean %d %s, largest %d %s, efficiency %.1f%%" % ( len( jobs ), mean, unit, max( totals ), unit, 100. * mean / max( totals ) )
+    if max( weights ) > mean:
+        print "Job splitting:: The largest input file or range has %d %s, which limits the longest job." % ( max( weights ), unit )
+
+## @short The compression algorithms of ROOT, see ROOT::ECompressionAlgorithm
+CompressionAlgorithms = { "zlib":1, "lzma":2, "lz4":4, "zstd":5 }
+
+## @short Function to read a compression setting like lz4:4
+#
+# Returns a tuple of the number of the algorithm and the level. Exits with an
+# error message if the setting cannot be understood.
+#
+# @param compression The algorithm name and the level, separated by a colon
+def ParseCompression( compression ):
+    algorithm, sep, level = compression.partition( ":" )
+    if algorithm.lower() not in CompressionAlgorithms or not level.isdigit():
+        print >>sys.stderr, "ERROR: Unknown compression \"%s\", expected one of %s with a level, like lz4:4" % ( compression, ", ".join( sorted( CompressionAlgorithms ) ) )
+        sys.exit(-1)
+    return ( CompressionAlgorithms[ algorithm.lower() ], int( level ) )
+
+## @short The AutoFlush of ROOT, flushing every 30 MB of compressed data
+DefaultAutoFlush = -30000000
+
+## @short The limits of the basket sizes of the output branches
+MinBasketSize = 1024
+MaxBasketSize = 4 * 1024 * 1024
+
+## @short Function to derive the basket sizes of the output branches
+#
+# Reading a tree is fastest when every branch has one basket per cluster. The
+# basket of each output branch gets the average uncompressed size of the branch
+# per entry in the input, times the number of entries in a cluster of the output.
+# Returns a dictionary from the variable names to the basket sizes.
+#
+# @param varlist List of the variables of the cycle
+# @param branchSizes Sizes per entry of the input branches, see TTreeReader.GetBranchSizes
+# @param autoflush The AutoFlush of the output tree, 0 for the default of ROOT
+def OutputBasketSizes( varlist, branchSizes, autoflush = 0 ):
+    written = [ var for var in varlist if not var.commented and not var.shape and var.name in branchSizes ]
+    if not autoflush:
+        autoflush = DefaultAutoFlush
+    if autoflush > 0:
+        entries = autoflush
+    else:
+        # A cluster ends after this many compressed bytes
+        zipbytes = sum( [ branchSizes[ var.name ][ 1 ] for var in written ] )
+        entries = zipbytes and -autoflush / zipbytes
+    sizes = {}
+    for var in written:
+        size = int( branchSizes[ var.name ][ 0 ] * entries )
+        size = 1024 * ( ( size + 1023 ) / 1024 )
+        sizes[ var.name ] = min( max( size, MinBasketSize ), MaxBasketSize )
+    return sizes
+
+## @short The smallest number of entries that is worth starting a PROOF worker for
+ProofMinEntriesPerWorker = 100000
+
+## @short Function to choose the PROOF-Lite settings for a set of input files
+#
+# Starting a PROOF-Lite worker takes a few seconds, so small inputs get fewer
+# workers than there are cores. With fewer than two files per worker, the files
+# have to be shared between the workers, and smaller packets even out the end of
+# the job. Many small files are spread out on a file by file basis anyway.
+# Returns a tuple of the number of workers and the PROOF_PacketAsAFraction
+# setting, which is 0 to keep the default of ROOT.
+#
+# @param inputFiles List of "InputFile" objects
+# @param nworkers Number of workers to use. Chosen automatically if 0.
+def ProofSettings( inputFiles, nworkers = 0 ):
+    import multiprocessing
+    entries = sum( [ f.entries for f in inputFiles ] )
+    if not nworkers:
+        nworkers = multiprocessing.cpu_count()
+        if entries:
+            nworkers = max( 1, min( nworkers, entries / ProofMinEntriesPerWorker ) )
+    fraction = 0
+    if entries:
+        if len( inputFiles ) < 2 * nworkers:
+            fraction = 8
+        else:
+            fraction = 4
+    return ( nworkers, fraction )
+
+## @short Function to keep only the first one of the elements with a tag name
+#
+# The example configuration contains several of most elements. This function
+# removes all but the first one, and returns that one. It raises an AssertionError
+# if there is no such element.
+#
+# @param parent The node below which to look for the elements
+# @param tagname The tag name of the elements
+def KeepFirstElement( parent, tagname ):
+    nodes = parent.getElementsByTagName( tagname )
+    if not nodes:
+        raise AssertionError( "No %s section found" % tagname )
+    for node in nodes[ 1: ]:
+        node.parentNode.removeChild( node )
+    return nodes[ 0 ]
+
+## @short Function to get the container types that have a dictionary in libSFrameMetaTools
+#
+# SFrameMetaTools builds the dictionaries of the stl containers that are commonly
+# found in ntuples, so that every analysis package doesn't need to build its own.
+# This function reads the list of these types from the SFrameMetaTools LinkDef file.
+# An empty set is returned if SFrameMetaTools is not set up.
+def SharedDictionaryTypes():
+    """
+    Get the set of cleaned type names for which libSFrameMetaTools has a dictionary
+    """
+    import os.path
+    tooldir = os.getenv( "SFRAME_META_TOOL_DIR" )
+    if not tooldir:
+        return set()
+    linkdef = os.path.join( tooldir, "SFrameMetaTools/include/SFrameMetaTools_LinkDef.h" )
+    if not os.path.exists( linkdef ):
+        print >>sys.stderr, "WARNING: Expected to find the SFrameMetaTools LinkDef file at", linkdef
+        return set()
+    types = set()
+    for match in re.finditer( """#pragma link C\+\+ class (?P<type>.*?)\+;""", open( linkdef ).read() ):
+        if Is_stl_like( match.group( "type" ) ):
+            types.add( CleanType( match.group( "type" ) ) )
+    return types
+
+
+## @short Class to hold the optional features of a new cycle
+#
+# CreateCycle fills it from the command line, and CreateHeader, CreateSource and
+# CreateBenchmark hand it to the functions in CycleFeatures, which create the
+# code of one feature each. All the features are switched off by default.
+class CycleOptions( object ):
+    """
+    The settings of the code of a cycle, given as keyword arguments with the
+    names of the attributes:
+
+      create_output         Whether to create the code of the output variables
+      functions             Whether to handle the variables in functions of their own
+      outtree               Name of the output tree
+      proof                 Whether to create the code for running on PROOF-Lite
+      implicit_mt           Threads of the implicit multi-threading of ROOT, -1 for none
+      tune_output           Whether to set the compression and the baskets of the output tree
+      compression           ( algorithm, level ) of the output tree, see ParseCompression
+      auto_flush            AutoFlush of the output tree, 0 for the default of ROOT
+      basketSizes           Basket sizes of the output branches by variable name
+      rollover              Whether to split the output file into parts
+      max_output_size       Maximal size of an output file in megabytes
+      max_output_entries    Maximal number of entries of an output file
+      selection             Selection of the events, as a C++ expression of the variables
+      selection_expression  The selection on the branches struct, see CompileSelection
+      timing                Whether the cycle times the phases of the processing
+      progress              Seconds between the progress records, 0 for none
+      progress_output       File or "unix:" socket for the progress records
+      memory                Events between the samples of the memory monitor, 0 for none
+      memory_alarm          Growth of the resident memory in MB that raises an alarm
+      count_reads           Whether to count the reads of the input variables
+      used_variables        Variable list written with the unread variables commented out
+      block_size            Entries of the flat variables read at a time, 0 for one at a time
+      benchmark             Whether to create the benchmark driver of the cycle
+      variations            Names of the systematic variations, see FindVariations
+    """
+    Defaults = { "create_output":False, "functions":False, "outtree":"", "proof":False, "implicit_mt":-1,
+                 "tune_output":False, "compression":( -1, 0 ), "auto_flush":0, "basketSizes":{},
+                 "rollover":False, "max_output_size":0, "max_output_entries":0,
+                 "selection":"", "selection_expression":"", "timing":False, "progress":0, "progress_output":"",
+                 "memory":0, "memory_alarm":512, "count_reads":False, "used_variables":"",
+                 "block_size":0, "benchmark":False, "variations":[] }
+
+    def __init__( self, **kwargs ):
+        super( CycleOptions, self ).__init__()
+        for name, value in self.Defaults.items():
+            setattr( self, name, kwargs.pop( name, value ) )
+        if kwargs:
+            raise TypeError( "Unknown cycle options: %s" % ", ".join( sorted( kwargs ) ) )
+
+    def __repr__( self ):
+        return "CycleOptions(%s )" % ",".join( [ " %s=%s" % ( name, repr( getattr( self, name ) ) ) for name in sorted( self.Defaults ) ] )
+
+## @short Function returning the prefix of the input variables in the generated code
+#
+# With the read counters, the generated code uses the variables of the
+# branches struct directly, so that only the reads of the user code count.
+#
+# @param className Name of the analysis cycle
+# @param varlist List of "Variable" objects of the cycle
+# @param options The CycleOptions of the cycle
+def BranchesPrefix( className, varlist, options ):
+    return options.count_reads and varlist and className + "_Branches::" or ""
+
+## @short Function returning the code getting the input tree of the cycle
+#
+# The benchmark driver hands its input tree to the cycle.
+#
+# @param options The CycleOptions of the cycle
+def InputTreeCall( options ):
+    return options.benchmark and "InputTree()" or "GetInputTree( InTreeName.c_str() )"
+
+## @short Function creating the code for running on PROOF
+#
+# Every feature has a function like this one. It receives the formatting
+# dictionary with the class name, the list of variables and the CycleOptions,
+# and returns the code of the feature by the key of the place where it goes,
+# see FeatureKeys.
+#
+# @param formdict Dictionary with the class, namespace and fullClassName of the cycle
+# @param varlist List of "Variable" objects of the cycle
+# @param options The CycleOptions of the cycle
+def ProofFeature( formdict, varlist, options ):
+    if not options.proof:
+        return {}
+    return { "configDeclarations":templates.proof_ConfigDeclarations,
+             "propertyDeclarations":templates.proof_PropertyDeclarations,
+             "masterInputDataSetup":templates.proof_MasterInputDataSetup,
+             "sourceIncludes":templates.proof_Includes }
+
+## @short Function creating the code of the implicit multi-threading of ROOT
+def ImplicitMTFeature( formdict, varlist, options ):
+    if options.implicit_mt < 0:
+        return {}
+    return { "configDeclarations":templates.mt_ConfigDeclarations,
+             "functionDeclarations":templates.mt_FunctionDeclaration,
+             "propertyDeclarations":templates.mt_PropertyDeclarations % { "implicit_mt":options.implicit_mt },
+             "beginCycleSetup":templates.mt_BeginCycleSetup,
+             "inputDataSetup":templates.mt_InputDataSetup,
+             "functionBodys":templates.mt_FunctionBody % formdict,
+             "sourceIncludes":templates.mt_Includes }
+
+## @short Function creating the code setting the compression and the baskets of the output tree
+def OutputTuningFeature( formdict, varlist, options ):
+    if not options.create_output or not options.tune_output:
+        return {}
+    return { "configDeclarations":templates.output_ConfigDeclarations,
+             "functionDeclarations":templates.output_FunctionDeclaration,
+             "propertyDeclarations":templates.output_PropertyDeclarations % { "algorithm":options.compression[ 0 ], "level":options.compression[ 1 ],
+                                                                              "auto_flush":options.auto_flush },
+             "functionBodys":templates.output_FunctionBody % formdict,
+             "sourceIncludes":templates.output_Includes }
+
+## @short Function creating the code splitting the output file into parts
+def RolloverFeature( formdict, varlist, options ):
+    if not options.create_output or not options.rollover:
+        return {}
+    return dict( templates.rollover_Hooks,
+                 configDeclarations=templates.rollover_ConfigDeclarations,
+                 headerIncludes=templates.rollover_HeaderIncludes,
+                 propertyDeclarations=templates.rollover_PropertyDeclarations % { "max_size":options.max_output_size,
+                                                                                  "max_entries":options.max_output_entries },
+                 inputDataSetup=templates.rollover_InputDataSetup,
+                 inputDataEnd=templates.rollover_InputDataEnd,
+                 functionBodys=templates.rollover_FunctionBody % formdict,
+                 sourceIncludes=templates.rollover_Includes )
+
+## @short Function creating the code of the progress records
+def ProgressFeature( formdict, varlist, options ):
+    if options.progress <= 0:
+        return {}
+    return dict( templates.progress_Hooks,
+                 configDeclarations=templates.progress_ConfigDeclarations,
+                 propertyDeclarations=templates.progress_PropertyDeclarations % { "interval":options.progress, "output":options.progress_output },
+                 inputDataSetup=templates.progress_InputDataSetup,
+                 inputDataEnd=templates.progress_InputDataEnd,
+                 functionBodys=templates.progress_FunctionBody % formdict,
+                 sourceIncludes=templates.progress_Includes )
+
+## @short Function creating the code timing the phases of the processing
+def TimingFeature( formdict, varlist, options ):
+    if not options.timing:
+        return {}
+    return dict( templates.timing_Hooks,
+                 configDeclarations=templates.timing_ConfigDeclarations,
+                 headerIncludes=templates.timing_HeaderIncludes,
+                 propertyDeclarations=templates.timing_PropertyDeclarations,
+                 inputDataSetup=templates.timing_InputDataSetup,
+                 inputDataEnd=templates.timing_InputDataEnd,
+                 masterInputDataEnd=templates.timing_MasterInputDataEnd,
+                 cycleEnd=templates.timing_CycleEnd,
+                 functionBodys=templates.timing_FunctionBody % formdict,
+                 sourceIncludes=templates.timing_Includes )
+
+## @short Function creating the code of the memory monitor
+#
+# The capacities of the output vectors are monitored as well.
+def MemoryFeature( formdict, varlist, options ):
+    if options.memory <= 0:
+        return {}
+    containers = []
+    if options.create_output:
+        containers = [ var for var in varlist if var.pointer and not var.commented and not var.shape and not var.variation and CleanType( var.typename ).startswith( "vector<" ) ]
+    capacityUpdates = "".join( [ templates.memory_CapacityUpdate % { "index":i, "cname":var.cname } for i, var in enumerate( containers ) ] )
+    capacityReport = ""
+    if containers:
+        capacityReport = templates.memory_CapacityReport % { "names":", ".join( [ "\"out_%s\"" % var.cname for var in containers ] ),
+                                                             "sizes":", ".join( [ "sizeof( out_%s.front() )" % var.cname for var in containers ] ) }
+    return dict( templates.memory_Hooks,
+                 configDeclarations=templates.memory_ConfigDeclarations,
+                 propertyDeclarations=templates.memory_PropertyDeclarations % { "interval":options.memory, "alarm":options.memory_alarm,
+                                                                                "ncontainers":len( containers ) },
+                 inputDataSetup=templates.memory_InputDataSetup,
+                 inputDataEnd=templates.memory_InputDataEnd,
+                 functionBodys=templates.memory_FunctionBody % dict( formdict, capacityUpdates=capacityUpdates, capacityReport=capacityReport ),
+                 sourceIncludes=templates.memory_Includes )
+
+## @short Function creating the code used by the benchmark driver
+def BenchmarkFeature( formdict, varlist, options ):
+    if not options.benchmark:
+        return {}
+    return { "configDeclarations":templates.benchmark_ConfigDeclarations % formdict,
+             "propertyDeclarations":templates.benchmark_PropertyDeclarations }
+
+## @short Function creating the code reading the flat variables a block of entries at a time
+#
+# The benchmark driver repeats its passes without the bulk reads.
+def BlockFeature( formdict, varlist, options ):
+    blockVariables = options.block_size > 0 and BlockVariables( varlist ) or []
+    if not blockVariables:
+        return {}
+    branches = BranchesPrefix( formdict[ "class" ], varlist, options )
+    blockReads = ""
+    unpacking = ""
+    for slot, var in enumerate( varlist ):
+        if var in blockVariables:
+            subs_dict = { "slot":slot, "cname":var.cname, "branches":branches }
+            blockReads += templates.block_Read % subs_dict
+            unpacking += templates.block_Unpacking % subs_dict
+    blockBuffers = "".join( [ templates.block_Buffer % { "type":var.typename, "cname":var.cname } for var in blockVariables ] )
+    return { "configDeclarations":templates.block_ConfigDeclarations % formdict,
+             "headerIncludes":templates.block_HeaderIncludes,
+             "blockBindings":templates.block_Bindings,
+             "blockMembers":templates.block_Members,
+             "blockStruct":templates.block_Struct % dict( formdict, blockBuffers=blockBuffers ),
+             "propertyDeclarations":templates.block_PropertyDeclarations % { "size":options.block_size },
+             "functionBodys":templates.block_FunctionBody % dict( formdict, blockReads=blockReads ),
+             "sourceIncludes":templates.block_Includes,
+             "blockReading":templates.block_Reading % { "unpacking":unpacking },
+             "blockSetup":templates.block_Setup,
+             "executeBlock":templates.block_Execute % dict( formdict, example=blockVariables[ 0 ].cname ),
+             "blockComparison":templates.benchmark_BlockComparison % formdict }
+
+## @short Function creating the code counting the reads of the input variables
+def ReadCounterFeature( formdict, varlist, options ):
+    if not options.count_reads or not varlist:
+        return {}
+    readCounters = ""
+    watches = ""
+    for var in ReadCounterVariables( varlist ):
+        readCounters += templates.readCounter_Declaration % { "type":var.typename + var.pointer + var.Dims(), "cname":var.cname }
+        watches += templates.readCounter_Watch % dict( formdict, cname=var.cname )
+    return { "configDeclarations":templates.readCounter_ConfigDeclarations % { "readCounters":readCounters },
+             "headerIncludes":templates.readCounter_HeaderIncludes,
+             "propertyDeclarations":templates.readCounter_PropertyDeclarations % { "file":options.used_variables or formdict[ "class" ] + "_used_variables.C",
+                                                                                   "watches":watches },
+             "inputDataSetup":templates.readCounter_InputDataSetup,
+             "inputDataEnd":templates.readCounter_InputDataEnd,
+             "masterInputDataEnd":templates.readCounter_MasterInputDataEnd,
+             "cycleEnd":templates.readCounter_CycleEnd,
+             "functionBodys":templates.readCounter_FunctionBody % dict( formdict, declarations=UsedVariableLines( varlist ) ),
+             "sourceIncludes":templates.readCounter_Includes }
+
+## @short Function creating the code of the systematic variations
+#
+# The loop over the variations in ExecuteEvent, and the output variables
+# declared once per variation, are created by CreateHeader and CreateSource.
+def VariationFeature( formdict, varlist, options ):
+    if not options.variations:
+        return {}
+    code = { "configDeclarations":templates.variation_ConfigDeclarations % dict( formdict, nVariations=len( options.variations ) + 1 ),
+             "headerIncludes":templates.variation_HeaderIncludes,
+             "propertyDeclarations":templates.variation_PropertyDeclarations,
+             "variationSetup":templates.variation_Setup % { "inputTree":InputTreeCall( options ) },
+             "variationRestore":templates.variation_Restore,
+             "sourceIncludes":templates.variation_Includes }
+    selectOutput = ""
+    if options.create_output:
+        outputSwaps = "".join( [ templates.variation_OutputSwap % { "cname":var.cname } for var in varlist if not var.commented and not var.shape and not var.variation ] )
+        code[ "configDeclarations" ] += templates.variation_OutputDeclarations % formdict
+        code[ "branchesOutputBase" ] = templates.variation_BranchesOutputBase % formdict
+        code[ "outputStruct" ] = templates.variation_OutputStruct % dict( formdict, outputSwaps=outputSwaps,
+                                                                          outputVariableDeclarations=OutputVariableDeclarations( varlist ) )
+        code[ "propertyDeclarations" ] += templates.variation_OutputPropertyDeclarations % { "outtree":options.outtree }
+        selectOutput = templates.variation_SelectOutput
+    code[ "functionBodys" ] = templates.variation_FunctionBody % dict( formdict, selectOutput=selectOutput,
+                                                                      **VariationCode( varlist, options.variations, BranchesPrefix( formdict[ "class" ], varlist, options ) ) )
+    if options.create_output:
+        code[ "functionBodys" ] += templates.variation_OutputFunctionBody % formdict
+    return code
+
+## @short The functions creating the code of the features, in the order of their code
+#
+# The order matters for the code at the phase hooks: the output file is
+# switched before the progress is recorded, and both before the timing starts.
+CycleFeatures = [ ProofFeature, ImplicitMTFeature, OutputTuningFeature, RolloverFeature, ProgressFeature, TimingFeature,
+                  MemoryFeature, BenchmarkFeature, BlockFeature, ReadCounterFeature, VariationFeature ]
+
+## @short The places in the generated code where the features add their code
+#
+# The declarations and the includes of the header, the parts of the source, and
+# the phase hooks, see PhaseHooks.
+FeatureKeys = [ "configDeclarations", "functionDeclarations", "headerIncludes", "branchesOutputBase", "outputStruct",
+                "blockBindings", "blockMembers", "blockStruct",
+                "propertyDeclarations", "masterInputDataSetup", "masterInputDataEnd", "beginCycleSetup",
+                "inputDataSetup", "inputDataEnd", "cycleEnd", "functionBodys", "sourceIncludes",
+                "blockReading", "blockSetup", "executeBlock", "blockComparison", "variationSetup", "variationRestore" ]
+
+## @short Function collecting the code of all the features of a cycle
+#
+# Returns the code of the features in CycleFeatures, joined by key, with an
+# empty string for every key that no feature uses.
+#
+# @param formdict Dictionary with the class, namespace and fullClassName of the cycle
+# @param varlist List of "Variable" objects of the cycle
+# @param options The CycleOptions of the cycle
+def FeatureCode( formdict, varlist, options ):
+    code = dict( [ ( key, "" ) for key in FeatureKeys + PhaseHooks ] )
+    for feature in CycleFeatures:
+        for key, lines in feature( formdict, varlist, options ).items():
+            code[ key ] += lines
+    return code
+
+
+## @short Function creating the declarations of the output variables
+#
+# @param varlist List of "Variable" objects of the cycle
+def OutputVariableDeclarations( varlist ):
+    declarations = ""
+    for var in varlist:
+        if var.variation:
+            # The variants only replace the values of their nominal variables
+            pass
+        elif var.shape:
+            declarations += ("// %(type)s\tout_%(cname)s%(dims)s; // Arrays are not copied to the output tree\n") % {"type":var.StdTypeName(),"cname":var.cname,"dims":var.Dims()}
+        else:
+            declarations += ("%(type)s\tout_%(cname)s;\n") % {"type":var.StdTypeName(),"cname":var.cname}
+    return declarations
+
+
 ## @short Function creating an analysis cycle header
 #
 # This function can be used to create the header file for a new analysis
@@ -116,9 +690,12 @@ def CleanType( typename ):
 # @param fileName  Optional parameter with the output header file name
 # @param namespace  Optional parameter with the name of the namespace to use
 # @param varlist  Optional parameter with a list of "Variable" objects for which to create declarations
-# @param create_output  Optional parameter for whether to create declarations for output variables
+# @param options  Optional parameter with the CycleOptions of the cycle
 # @param kwargs Unused.
-def CreateHeader( className, headerName = "" , namespace = "", varlist = [], create_output = False, functions=False, **kwargs):
+def CreateHeader( className, headerName = "" , namespace = "", varlist = [], options = None, **kwargs):
+    options = options or CycleOptions()
+    create_output = options.create_output
+    
     # Construct the file name if it has not been specified:
     if  not headerName:
         headerName = className + ".h"
@@ -127,34 +704,94 @@ def CreateHeader( className, headerName = "" , namespace = "", varlist = [], cre
     if namespace:
         fullClassName = namespace + "::" + className
     formdict = { "class":className, "namespace":namespace, "fullClassName":fullClassName }
+    features = FeatureCode( formdict, varlist, options )
     
     # Now create all the lines to declare the input and output variables
     inputVariableDeclarations = ""
+    inputVariableInitialisations = ""
+    inputVariableDeletions = ""
     outputVariableDeclarations = ""
+    arrayAccessors = ""
     anystl=False
-    for var in varlist:
+    anymcstl=False
+    anymc=False
+    cnames = dict( [ ( var.name, var.cname ) for var in varlist ] )
+    selectionSlots = ""
+    memberSlots = ""
+    optionalSlots = ""
+    for slot, var in enumerate( varlist ):
         subs_dict = dict( formdict )
         subs_dict['declare']=var.Declaration()
         subs_dict["commented"]=var.commented
         subs_dict["typename"]=var.typename
         subs_dict["cname"]=var.cname
-        anystl = anystl or Is_stl_like( var.typename )
+        if var.mc:
+            anymc = True
+            anymcstl = anymcstl or ( var.pointer and Is_stl_like( var.typename ) )
+        else:
+            anystl = anystl or ( var.pointer and Is_stl_like( var.typename ) )
         
         inputVariableDeclarations += "%(declare)s\n" % subs_dict
-        
-        if create_output:
-            outputVariableDeclarations += ("%(type)s\tout_%(cname)s;\n") % {"type":var.StdTypeName(),"cname":var.cname}
+        if var.pointer:
+            # The objects of the pointer variables are owned by the branches struct
+            inputVariableInitialisations += "        %(commented)s%(cname)s = 0;\n" % subs_dict
+            inputVariableDeletions += "        %(commented)sdelete %(cname)s;\n" % subs_dict
+        if var.count:
+            subs_dict[ "countcname" ] = cnames[ var.count ]
+            arrayAccessors += templates.arrayAccessor % subs_dict
+        if var.selection:
+            selectionSlots += templates.selection_Slot % { "slot":slot }
+        if var.member:
+            memberSlots += templates.member_Slot % { "slot":slot }
+        if var.variation:
+            optionalSlots += templates.optional_Slot % { "slot":slot }
+    
+    if create_output:
+        outputVariableDeclarations = OutputVariableDeclarations( varlist )
     
-    if functions:
+    # With systematic variations, the output variables are declared once per variation
+    declarations = options.variations and "variation_" or ""
+    if options.functions:
         formdict[ "functionDeclarations" ] = templates.ConnectInputVariables_declaration
+        if anymc:
+            formdict[ "functionDeclarations" ] += templates.ConnectMCInputVariables_declaration
         if create_output:
-            formdict[ "functionDeclarations" ] += templates.DeclareOutputVariables_declaration
+            formdict[ "functionDeclarations" ] += getattr( templates, declarations + "DeclareOutputVariables_declaration" ) % formdict
+            formdict[ "functionDeclarations" ] += templates.FillOutputVariables_declaration
             if anystl:
                 formdict[ "functionDeclarations" ] += templates.ClearOutputVariables_declaration
+            if anymc:
+                formdict[ "functionDeclarations" ] += getattr( templates, declarations + "DeclareMCOutputVariables_declaration" ) % formdict
+                formdict[ "functionDeclarations" ] += templates.FillMCOutputVariables_declaration
+                if anymcstl:
+                    formdict[ "functionDeclarations" ] += templates.ClearMCOutputVariables_declaration
     else:
         formdict[ "functionDeclarations" ] = ""
     formdict[ "inputVariableDeclarations" ] = inputVariableDeclarations
+    formdict[ "inputVariableInitialisations" ] = inputVariableInitialisations
+    formdict[ "inputVariableDeletions" ] = inputVariableDeletions
+    formdict[ "selectionSlots" ] = selectionSlots
+    formdict[ "memberSlots" ] = memberSlots
+    formdict[ "optionalSlots" ] = optionalSlots
+    formdict[ "nInputVariables" ] = len( varlist )
+    formdict[ "arrayAccessors" ] = arrayAccessors
     formdict[ "outputVariableDeclarations" ] = outputVariableDeclarations
+    if options.variations and create_output:
+        formdict[ "outputVariableDeclarations" ] = "// In %s_Output, once per variation\n" % className
+
+    # The declarations of the features
+    formdict[ "functionDeclarations" ] += features[ "functionDeclarations" ]
+    for key in [ "configDeclarations", "headerIncludes", "branchesOutputBase", "blockBindings", "blockMembers" ]:
+        formdict[ key ] = features[ key ]
+    
+    # The branch buffers are kept in a holder without a dictionary
+    if varlist:
+        formdict[ "headerIncludes" ] += templates.branches_HeaderIncludes
+        formdict[ "branchesBase" ] = templates.branches_Base % formdict
+        branches = features[ "outputStruct" ] + templates.branches_Body % formdict + features[ "blockStruct" ]
+    else:
+        formdict[ "branchesBase" ] = ""
+        branches = ""
     # Some printouts:
     print "CreateHeader:: Cycle name     = " + className
     print "CreateHeader:: File name      = " + headerName
@@ -163,13 +800,13 @@ def CreateHeader( className, headerName = "" , namespace = "", varlist = [], cre
     Backup( headerName )
     
     # Construct the contents:
-    body = templates.header_Body % formdict
+    body = branches + templates.header_Body % formdict
     if namespace:
         ns_body = templates.namespace % { "namespace":namespace, "body": templates.Indent( body ) }
     else:
         ns_body = body
     
-    full_contents = templates.header_Frame % {"body":ns_body, "capclass":( namespace+"_"+className ).upper(), "fullClassName":namespace+"::"+className}
+    full_contents = templates.header_Frame % {"body":ns_body, "capclass":( namespace+"_"+className ).upper(), "fullClassName":namespace+"::"+className, "headerIncludes":formdict[ "headerIncludes" ]}
     
     # Write the header file:
     output = open( headerName, "w" )
@@ -179,6 +816,29 @@ def CreateHeader( className, headerName = "" , namespace = "", varlist = [], cre
     return headerName
 
 
+## @short Function creating the precompiled header of the analysis package
+#
+# The SFrame Makefile, as modified by library_version_string_facility.py,
+# precompiles the header $(INCDIR)/$(LIBRARY)_PCH.h once for the whole package
+# if it exists. This function creates it, unless there already is one, in which
+# case it is kept so that any user additions survive.
+#
+# @param pchName  Name of the precompiled header file
+# @param analysis  Name of the analysis package
+# @param kwargs Unused.
+def CreatePCHHeader( pchName, analysis = "MyAnalysis", **kwargs ):
+    import os.path
+    if os.path.exists( pchName ):
+        print "Keeping existing precompiled header \"%s\"" % pchName
+        return
+    
+    print "CreatePCHHeader:: File name   = " + pchName
+    output = open( pchName, "w" )
+    output.write( templates.pch_Header % { "analysis":analysis, "capanalysis":analysis.upper() } )
+    output.close()
+    return
+
+
 ## @short Function creating the analysis cycle source file
 #
 # This function creates the source file that works with the header created
@@ -190,9 +850,14 @@ def CreateHeader( className, headerName = "" , namespace = "", varlist = [], cre
 # @param fileName  Optional parameter with the output source file name
 # @param namespace  Optional parameter with the name of the namespace to use
 # @param varlist  Optional parameter with a list of "Variable" objects to be used by the cycle
-# @param create_output  Optional parameter for whether to produce code for output variables
+# @param header  Optional parameter with the name of the header of the cycle
+# @param options  Optional parameter with the CycleOptions of the cycle
 # @param kwargs Unused.
-def CreateSource( className, sourceName = "", namespace = "", varlist = [], create_output = False, header = "", functions=False, **kwargs ):
+def CreateSource( className, sourceName = "", namespace = "", varlist = [], header = "", options = None, **kwargs ):
+    options = options or CycleOptions()
+    create_output = options.create_output
+    variations = options.variations
+    
     # Construct the file name if it has not been specified:
     if sourceName == "":
         sourceName = className + ".cxx"
@@ -204,20 +869,28 @@ def CreateSource( className, sourceName = "", namespace = "", varlist = [], crea
     if namespace:
         fullClassName = namespace + "::" + className
     formdict = { "class":className, "namespace":namespace, "fullClassName":fullClassName }
+    features = FeatureCode( formdict, varlist, options )
     
     # Determine the relative path of the header using os.path.relpath
     import filesystem,os
     include = filesystem.relpath( header, os.path.dirname( sourceName ) )
     
-    # Now create all the lines to handle the variables
-    inputVariableConnections = ""
-    outputVariableConnections = ""
-    outputVariableClearing = ""
-    outputVariableFilling = ""
+    # Now create all the lines to handle the variables. The MC-only variables
+    # are collected separately, so that the data/MC decision is taken once per
+    # input data instead of once per variable and event.
+    code = { "common":{ "in":"", "out":"", "clear":"", "fill":"" },
+             "mc":{ "in":"", "out":"", "clear":"", "fill":"" } }
     
-    mcBlockOpen=False
+    branches = BranchesPrefix( className, varlist, options )
     
-    for var in varlist:
+    # The flat variables that are read a block of entries at a time
+    blockNames = set( [ var.name for var in options.block_size > 0 and BlockVariables( varlist ) or [] ] )
+    
+    # With systematic variations, every variation declares its own output variables
+    output = variations and "output." or ""
+    treeName = variations and ", treeName" or ""
+    
+    for slot, var in enumerate( varlist ):
         subs_dict = dict( formdict )
         subs_dict['declare']=var.Declaration()
         subs_dict["commented"]=var.commented
@@ -225,51 +898,94 @@ def CreateSource( className, sourceName = "", namespace = "", varlist = [], crea
         subs_dict["cname"]=var.cname
         subs_dict["name"]=var.name
         subs_dict["pointer"]=var.pointer
-        if var.mc and not mcBlockOpen:
-            blockCTRL=templates.StartMCBlock
-            mcBlockOpen=True
-        elif not var.mc and mcBlockOpen:
-            blockCTRL=templates.CloseMCBlock
-            mcBlockOpen=False
+        subs_dict["branches"]=branches
+        subs_dict["output"]=output
+        subs_dict["treeName"]=treeName
+        # Every variable, even a commented one, has a slot in the cache of branch indices
+        subs_dict["slot"]=slot
+        lines = code[ "mc" if var.mc else "common" ]
+        if var.shape:
+            # Arrays are read into their preallocated buffers
+            subs_dict["first"]="&%s%s%s" % ( branches, var.cname, "[0]" * len( var.shape ) )
+            subs_dict["size"]=var.Size()
+            lines[ "in" ] += "%(commented)sBindArray( %(slot)d, \"%(name)s\", %(first)s, %(size)d );\n" % subs_dict
+            continue
+        if var.name in blockNames:
+            lines[ "in" ] += "BindBlockBranch( %(slot)d, \"%(name)s\", %(branches)s%(cname)s );\n" % subs_dict
         else:
-            blockCTRL=""
-        inputVariableConnections += blockCTRL+"%(commented)sConnectVariable( InTreeName.c_str(), \"%(name)s\", %(cname)s );\n" % subs_dict
+            lines[ "in" ] += "%(commented)sBindBranch( %(slot)d, \"%(name)s\", %(branches)s%(cname)s );\n" % subs_dict
         
-        if create_output:
-            outputVariableConnections += blockCTRL+"%(commented)sDeclareVariable( out_%(cname)s, \"%(name)s\" );\n" % subs_dict
-            outputVariableFilling += blockCTRL+"%(commented)sout_%(cname)s = %(pointer)s%(cname)s;\n" % subs_dict
+        if create_output and not var.variation:
+            if options.tune_output:
+                subs_dict["basket"]=options.basketSizes.get( var.name, 0 )
+                lines[ "out" ] += "%(commented)sTuneOutputBranch( DeclareVariable( %(output)sout_%(cname)s, \"%(name)s\"%(treeName)s ), %(basket)d );\n" % subs_dict
+            else:
+                lines[ "out" ] += "%(commented)sDeclareVariable( %(output)sout_%(cname)s, \"%(name)s\"%(treeName)s );\n" % subs_dict
+            lines[ "fill" ] += "%(commented)sout_%(cname)s = %(pointer)s%(branches)s%(cname)s;\n" % subs_dict
             if var.pointer and Is_stl_like( var.typename ):
                 # Not all pointer-accessed types can do this, only stl-vectors                
-                outputVariableClearing += "%(commented)sout_%(cname)s.clear();\n" % subs_dict
+                lines[ "clear" ] += "%(commented)sout_%(cname)s.clear();\n" % subs_dict
     
-    if mcBlockOpen:
-        inputVariableConnections +=templates.CloseMCBlock
-        if create_output:
-            outputVariableConnections +=templates.CloseMCBlock
-            outputVariableFilling +=templates.CloseMCBlock
+    formdict[ "inputVariableConnections" ] = code[ "common" ][ "in" ]
+    formdict[ "outputVariableConnections" ] = code[ "common" ][ "out" ]
+    formdict[ "outputVariableClearing" ] = code[ "common" ][ "clear" ]
+    formdict[ "outputVariableFilling" ] = code[ "common" ][ "fill" ]
+    formdict[ "mcInputVariableConnections" ] = code[ "mc" ][ "in" ]
+    formdict[ "mcOutputVariableConnections" ] = code[ "mc" ][ "out" ]
+    formdict[ "mcOutputVariableClearing" ] = code[ "mc" ][ "clear" ]
+    formdict[ "mcOutputVariableFilling" ] = code[ "mc" ][ "fill" ]
     
+    # The code of the features, like the monitors at the boundaries of the
+    # phases of the processing, and the configuration of the cycle
+    formdict.update( features )
+    formdict[ "endMasterInputDataId" ] = features[ "masterInputDataEnd" ] and " id" or ""
     
-    formdict[ "inputVariableConnections" ] = inputVariableConnections
-    formdict[ "outputVariableConnections" ] = outputVariableConnections
-    formdict[ "outputVariableClearing" ] = outputVariableClearing
-    formdict[ "outputVariableFilling" ] = outputVariableFilling
+    # The input variables are bound and read through the branches struct
+    formdict[ "bindingsSetup" ] = ""
+    formdict[ "bindingsReading" ] = ""
+    formdict[ "selectionReading" ] = ""
+    if varlist:
+        formdict[ "bindingsSetup" ] = templates.bindings_Setup % { "inputTree":InputTreeCall( options ) }
+        formdict[ "bindingsReading" ] = templates.bindings_Reading
+    if varlist and options.selection:
+        # With systematic variations, the selection is evaluated on the values of every variation
+        reading = variations and templates.variation_SelectionReading or templates.selection_Reading
+        formdict[ "selectionReading" ] = reading % { "selection":options.selection, "expression":options.selection_expression,
+                                                     "rejection":features[ "rejection" ] }
     
-    formdict[ "functionBodys" ] = ""
+    # Pairs of the function used for the common and the MC-only variables of
+    # each kind, with the key of the code they contain:
+    kinds = [ ( "inputVariableConnections", "ConnectInputVariables", "ConnectMCInputVariables", "in" ) ]
+    if create_output:
+        kinds += [ ( "outputVariableConnections", "DeclareOutputVariables", "DeclareMCOutputVariables", "out" ),
+                   ( "outputVariableClearing", "ClearOutputVariables", "ClearMCOutputVariables", "clear" ),
+                   ( "outputVariableFilling", "FillOutputVariables", "FillMCOutputVariables", "fill" ) ]
     
-    if functions:
-        formdict[ "functionBodys" ]+=templates.ConnectInputVariables_body%formdict
-        formdict[ "inputVariableConnections" ] = templates.ConnectInputVariables_call
-        
-        if create_output:
-            formdict[ "functionBodys" ]+=templates.DeclareOutputVariables_body%formdict
-            formdict[ "outputVariableConnections" ] = templates.DeclareOutputVariables_call
-        
-            if outputVariableClearing:
-                formdict[ "functionBodys" ]+=templates.ClearOutputVariables_body%formdict
-                formdict[ "outputVariableClearing" ] = templates.ClearOutputVariables_call
-        
-        
+    for key, common, mc, kind in kinds:
+        if variations and kind == "out":
+            common, mc = "variation_" + common, "variation_" + mc
+        if options.functions:
+            call = ""
+            # The common connections, declarations and filling always get a
+            # function, the clearing only if there is something to clear
+            if code[ "common" ][ kind ] or kind != "clear":
+                formdict[ "functionBodys" ] += getattr( templates, common+"_body" ) % formdict
+                call += getattr( templates, common+"_call" )
+            if code[ "mc" ][ kind ]:
+                formdict[ "functionBodys" ] += getattr( templates, mc+"_body" ) % formdict
+                call += getattr( templates, mc+"_call" )
+            formdict[ key ] = call
+        elif code[ "mc" ][ kind ]:
+            formdict[ key ] += templates.StartMCBlock + templates.Indent( code[ "mc" ][ kind ] ) + templates.CloseMCBlock
     
+    # The processing of the event is repeated for every systematic variation
+    formdict[ "eventProcessing" ] = templates.eventProcessing % formdict
+    if variations:
+        formdict[ "eventProcessing" ] = templates.variation_Loop % { "processing":templates.Indent( formdict[ "eventProcessing" ] ),
+                                                                     "variationEnd":templates.Indent( features[ "variationEnd" ] ) }
+        if create_output:
+            formdict[ "outputVariableConnections" ] = templates.variation_OutputLoop % dict( formdict,
+                declarations=templates.Indent( formdict[ "outputVariableConnections" ] ) )
     
     # Some printouts:
     print "CreateSource:: Cycle name     =", className
@@ -284,7 +1000,7 @@ def CreateSource( className, sourceName = "", namespace = "", varlist = [], crea
         ns_body = templates.namespace % { "namespace":namespace, "body":templates.Indent( body ) }
     else:
         ns_body = body
-    full_contents = templates.source_Frame % { "body":ns_body, "fullClassName":fullClassName, "header":include }
+    full_contents = templates.source_Frame % { "body":ns_body, "fullClassName":fullClassName, "header":include, "sourceIncludes":features[ "sourceIncludes" ] }
     
     
     # Write the source file:
@@ -294,6 +1010,172 @@ def CreateSource( className, sourceName = "", namespace = "", varlist = [], crea
     return
 
 
+## @short Function creating the benchmark driver of a cycle
+#
+# The driver is a program running BeginInputFile and ExecuteEvent of the cycle
+# over the first entries of a file, without sframe_main, and printing the
+# time and the bytes read per event. It is not part of the library of the
+# package, and is compiled by hand.
+#
+# @param className Name of the analysis cycle
+# @param benchmarkName Name of the source file of the driver
+# @param namespace Optional parameter with the name of the namespace to use
+# @param header Name of the header of the cycle
+# @param analysis Name of the analysis package
+# @param varlist List of variables of the cycle
+# @param options The CycleOptions of the cycle
+# @param kwargs Unused.
+def CreateBenchmark( className, benchmarkName, namespace = "", header = "", analysis = "MyAnalysis", varlist = [], options = None, **kwargs ):
+    import filesystem, os
+    if os.path.dirname( benchmarkName ) and not os.path.exists( os.path.dirname( benchmarkName ) ):
+        os.makedirs( os.path.dirname( benchmarkName ) )
+    options = options or CycleOptions()
+    fullClassName = className
+    if namespace:
+        fullClassName = namespace + "::" + className
+    # With blocks, the passes are repeated without their bulk reads
+    features = FeatureCode( { "class":className, "namespace":namespace, "fullClassName":fullClassName }, varlist, options )
+    body = templates.benchmark_Body % { "class":className, "blockComparison":features[ "blockComparison" ] }
+    if namespace:
+        body = templates.namespace % { "namespace":namespace, "body":templates.Indent( body ) }
+    
+    print "CreateBenchmark:: File name   = " + benchmarkName
+    Backup( benchmarkName )
+    output = open( benchmarkName, "w" )
+    output.write( templates.benchmark_Frame % { "class":className, "fullClassName":fullClassName, "body":body, "analysis":analysis,
+                                                "benchmarkName":benchmarkName,
+                                                "header":filesystem.relpath( header, os.path.dirname( benchmarkName ) ) } )
+    output.close()
+    return
+
+## @short Function selecting the input variables that are read a block of entries at a time
+#
+# These are the variables of basic types, except for the booleans, whose
+# buffers couldn't be used in vectorized loops, the sizes of the arrays, which
+# have to be read together with their arrays, and the MC variables.
+#
+# @param varlist List of "Variable" objects of the cycle
+def BlockVariables( varlist ):
+    sizes = set( [ var.count for var in varlist if var.count ] )
+    return [ var for var in varlist if not var.commented and not var.pointer and not var.shape and not var.mc
+             and var.name not in sizes and CleanType( var.typename ) not in ( "bool", "Bool_t" ) ]
+
+## @short Function selecting the input variables that get a read counter
+#
+# @param varlist List of "Variable" objects of the cycle
+def ReadCounterVariables( varlist ):
+    return [ var for var in varlist if not var.commented ]
+
+## @short Function creating the code writing the variable list of the read variables
+#
+# Every variable without reads is written commented out, except for the
+# sizes of the arrays that were read, and for the MC variables if no
+# simulated input data was read. The variants of the systematic variations
+# are read through their nominal variables.
+#
+# @param varlist List of "Variable" objects of the cycle
+def UsedVariableLines( varlist ):
+    counters = dict( [ ( var.name, i ) for i, var in enumerate( ReadCounterVariables( varlist ) ) ] )
+    lines = ""
+    for var in varlist:
+        declaration = var.VarlistDeclaration().rstrip().replace( "\\", "\\\\" ).replace( "\"", "\\\"" )
+        if var.commented:
+            lines += "    file << \"%s\" << std::endl;\n" % declaration
+            continue
+        conditions = [ "m_cycleReads[ %d ] > 0" % counters[ ( var.nominal or var ).name ] ]
+        conditions += [ "m_cycleReads[ %d ] > 0" % counters[ ( array.nominal or array ).name ] for array in varlist if array.count == var.name and array.name in counters ]
+        if var.mc:
+            conditions.append( "! m_readsMC" )
+        lines += "    file << ( %s ? \"\" : \"//\" ) << \"%s\" << std::endl;\n" % ( " || ".join( conditions ), declaration )
+    return lines
+
+## @short The places in ExecuteEvent and BeginInputFile where the monitors add their code
+#
+# The code at the start and the end of binding the branches, and at the start of
+# an event, after reading, after the rejection by the selection, after clearing,
+# after the user code, at the end of every systematic variation and at the end
+# of an event.
+PhaseHooks = [ "connectStart", "connectEnd", "eventStart", "readEnd", "rejection", "clearEnd", "userEnd", "variationEnd", "eventEnd" ]
+
+## @short Function finding the systematic variations among the input variables
+#
+# A variable is the variant of another one in a systematic variation, if the
+# name of the other one is its name with the match of one of the patterns
+# removed, and both have the same type. The match, without the separators
+# around it, is the name of the variation. The variants are marked with their
+# variation and their nominal variable. Returns the names of the variations,
+# in the order of their first variants.
+#
+# @param varlist The list of variables of the cycle, which is modified in place
+# @param patterns Comma separated regular expressions of the variations, like "_JES_(up|down)"
+def FindVariations( varlist, patterns ):
+    expressions = []
+    for pattern in patterns.split( "," ):
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        try:
+            expressions.append( re.compile( pattern ) )
+        except re.error:
+            print >>sys.stderr, "ERROR: Not a valid expression for the systematic variations:", pattern
+            sys.exit(-1)
+    byname = dict( [ ( var.name, var ) for var in varlist if not var.commented ] )
+    variations = []
+    # The patterns that found a variant, the others are pointed out
+    found = set()
+    for var in varlist:
+        if var.commented:
+            continue
+        for expression in expressions:
+            match = expression.search( var.name )
+            if not match or not match.group( 0 ):
+                continue
+            variation = match.group( 0 ).strip( "_." )
+            nominal = byname.get( var.name[ :match.start() ] + var.name[ match.end(): ] )
+            if not nominal or nominal.variation or not variation:
+                print >>sys.stderr, "WARNING: No nominal variable found for \"%s\", it is read as a variable of its own" % var.name
+            elif ( nominal.typename, nominal.pointer, nominal.shape, nominal.mc ) != ( var.typename, var.pointer, var.shape, var.mc ):
+                print >>sys.stderr, "WARNING: \"%s\" differs from its nominal variable \"%s\", it is read as a variable of its own" % ( var.name, nominal.name )
+            else:
+                var.variation = variation
+                var.nominal = nominal
+                found.add( expression.pattern )
+                if variation not in variations:
+                    variations.append( variation )
+            break
+    for expression in expressions:
+        if expression.pattern not in found:
+            print >>sys.stderr, "WARNING: The systematic variation \"%s\" matches no variant of a variable" % expression.pattern
+    return variations
+
+## @short Function creating the code exchanging the variables of the systematic variations
+#
+# Returns the cases of SwapVariation, the checks of the branches of every
+# variation and the names of the variations, for variation_FunctionBody.
+#
+# @param varlist List of "Variable" objects of the cycle
+# @param variations Names of the systematic variations
+# @param branches Prefix of the input variables of the branches struct
+def VariationCode( varlist, variations, branches ):
+    cases = ""
+    checks = ""
+    for index, variation in enumerate( variations ):
+        swaps = ""
+        for var in varlist:
+            if var.variation != variation:
+                continue
+            if var.shape:
+                # The arrays are exchanged element by element
+                first = "[0]" * len( var.shape )
+                swaps += templates.variation_ArraySwap % { "nominal":"&%s%s%s" % ( branches, var.nominal.cname, first ),
+                                                           "variant":"&%s%s%s" % ( branches, var.cname, first ), "size":var.Size() }
+            else:
+                swaps += templates.variation_Swap % { "nominal":branches + var.nominal.cname, "variant":branches + var.cname }
+            checks += templates.variation_Check % { "name":var.name, "index":index + 1 }
+        cases += templates.variation_Case % { "index":index + 1, "variation":variation, "swaps":swaps }
+    names = ",\n".join( [ "        \"%s\"" % name for name in [ "nominal" ] + variations ] )
+    return { "cases":cases, "checks":checks, "names":names }
+
 ## @short Function adding link definitions for rootcint
 #
 # Each new analysis cycle has to declare itself in a so called "LinkDef
@@ -308,7 +1190,11 @@ def CreateSource( className, sourceName = "", namespace = "", varlist = [], crea
 # @param className Name of the analysis cycle. Can contain the namespace name.
 # @param linkdefName  Optional parameter with the LinkDef file name
 # @param namespace  Optional parameter with the name of the namespace to use
+# @param varlist  Optional parameter with a list of "Variable" objects to be used by the cycle
 # @param kwargs Unused.
+#
+# Returns the set of container types for which the cycle relies on the dictionaries
+# in libSFrameMetaTools.
 def AddLinkDef( className, linkdefName = "LinkDef.h" , namespace = "", varlist = [], **kwargs):
     
     cycleName = className
@@ -317,9 +1203,10 @@ def AddLinkDef( className, linkdefName = "LinkDef.h" , namespace = "", varlist =
     
     new_lines = "#pragma link C++ class %s+;\n" %  cycleName
     
-    # Find all object-like variable types and make pragma lines for them
-    # This is unnecessary for many simple vectors, but since it doesn't
-    # do any harm, We might as well include it for all object types
+    # Find all stl container types that are actually connected and make pragma lines for them.
+    # The branch buffers themselves are not part of the dictionary of the cycle, and
+    # other object types bring their dictionaries along in their own libraries.
+    # Requesting them here would only duplicate dictionaries that ROOT already has.
     ignores=set([CleanType("vector<int>"), 
                 CleanType("vector<float>"),
                 CleanType("vector<short>"),
@@ -330,11 +1217,21 @@ def AddLinkDef( className, linkdefName = "LinkDef.h" , namespace = "", varlist =
     if os.path.exists( linkdefName ):
         for match in re.finditer("""#pragma link C\+\+ class (?P<type>.*?)\+;""",open(linkdefName).read()):
             ignores.add(CleanType(match.group("type")))
+    # The types that libSFrameMetaTools has dictionaries for are not built again
+    shared = SharedDictionaryTypes()
+    shared_used = set()
     types = set()
     for var in varlist:
-        if var.pointer:
-            if var.typename not in ignores:
-                types.add( var.typename )
+        if var.pointer and not var.commented and Is_stl_like( var.typename ):
+            typename = CleanType( var.typename )
+            if typename in ignores:
+                continue
+            if typename in shared:
+                shared_used.add( typename )
+            else:
+                types.add( typename )
+    if shared_used:
+        print "AddLinkDef:: Using the dictionaries in libSFrameMetaTools for:", ", ".join( sorted( shared_used ) )
     
     for typename in types:
         new_lines += "#pragma link C++ class %s+;\n" % typename
@@ -366,7 +1263,7 @@ def AddLinkDef( className, linkdefName = "LinkDef.h" , namespace = "", varlist =
         output = open( linkdefName, "w" )
         output.write( templates.LinkDef %{ "new_lines":new_lines } )
     
-    return
+    return shared_used
 
 
 ## @short Function creating a configuration file for the new cycle
@@ -385,8 +1282,17 @@ def AddLinkDef( className, linkdefName = "LinkDef.h" , namespace = "", varlist =
 # @param rootfile  Optional parameter with the name of an input root-file
 # @param treename  Optional parameter with the name of the input tree
 # @param outtree  Optional parameter with the name of the output tree if desired
+# @param shared_dictionaries  Optional parameter for whether the cycle needs the dictionaries in libSFrameMetaTools
+# @param inputFiles  Optional parameter with a list of "InputFile" objects to use instead of rootfile
+# @param postfix  Optional parameter with a postfix for the output file names
+# @param proof  Optional parameter for whether to run on PROOF-Lite
+# @param proof_workers  Optional parameter with the number of PROOF-Lite workers. Chosen automatically if 0.
+# @param userItems  Optional parameter with a list of ( name, value ) pairs of further UserConfig items
+# @param rollover  Optional parameter for whether the cycle splits its output file into parts
+# @param variations  Optional parameter with the names of the systematic variations, which get their own output trees
+# @param inputDataComment  Optional parameter with a comment to put in front of the InputData
 # @param kwargs Unused.
-def CreateConfig( className, configName = "" , namespace = "", analysis = "MyAnalysis", rootfile = "my/root/file.root", treename = "InTreeName", outtree = "", dataType="DATA", **kwargs):
+def CreateConfig( className, configName = "" , namespace = "", analysis = "MyAnalysis", rootfile = "my/root/file.root", treename = "InTreeName", outtree = "", dataType="DATA", shared_dictionaries=False, inputFiles=[], postfix="", proof=False, proof_workers=0, userItems=[], rollover=False, variations=[], inputDataComment="", **kwargs):
     # Construct the file name if it has not been specified:
     if configName == "":
         configName = className + "_config.xml"
@@ -426,9 +1332,15 @@ def CreateConfig( className, configName = "" , namespace = "", analysis = "MyAna
                 node.setAttribute( "Name", "lib" + analysis )
                 newnode=node.cloneNode(deep=True)
                 newnode.setAttribute( "Name", "libSFrameMetaTools" )
-                JobConfiguration.insertBefore(dom.createComment(" Uncomment if you want to use compiled features of SFrameMetaTools: "), node)
-                JobConfiguration.insertBefore(dom.createComment(newnode.toxml()), node)
-                # JobConfiguration.insertBefore(newnode,node)
+                if shared_dictionaries:
+                    JobConfiguration.insertBefore(dom.createComment(" Provides the dictionaries of the stl containers used by the cycle: "), node)
+                    JobConfiguration.insertBefore(newnode,node)
+                elif proof:
+                    JobConfiguration.insertBefore(dom.createComment(" Compiled features of SFrameMetaTools, also loaded on the PROOF workers: "), node)
+                    JobConfiguration.insertBefore(newnode,node)
+                else:
+                    JobConfiguration.insertBefore(dom.createComment(" Uncomment if you want to use compiled features of SFrameMetaTools: "), node)
+                    JobConfiguration.insertBefore(dom.createComment(newnode.toxml()), node)
         
         #Find the SFrameUser package and change it to ours
         for node in dom.getElementsByTagName( "Package" ):
@@ -436,9 +1348,15 @@ def CreateConfig( className, configName = "" , namespace = "", analysis = "MyAna
                 node.setAttribute( "Name", analysis + ".par" )
                 newnode=node.cloneNode(deep=True)
                 newnode.setAttribute( "Name", "SFrameMetaTools.par" )
-                JobConfiguration.insertBefore(dom.createComment(" Uncomment if you want to use compiled features of SFrameMetaTools: "), node)
-                JobConfiguration.insertBefore(dom.createComment(newnode.toxml()), node)
-                # JobConfiguration.insertBefore(newnode,node)
+                if shared_dictionaries:
+                    JobConfiguration.insertBefore(dom.createComment(" Provides the dictionaries of the stl containers used by the cycle: "), node)
+                    JobConfiguration.insertBefore(newnode,node)
+                elif proof:
+                    JobConfiguration.insertBefore(dom.createComment(" Compiled features of SFrameMetaTools, also loaded on the PROOF workers: "), node)
+                    JobConfiguration.insertBefore(newnode,node)
+                else:
+                    JobConfiguration.insertBefore(dom.createComment(" Uncomment if you want to use compiled features of SFrameMetaTools: "), node)
+                    JobConfiguration.insertBefore(dom.createComment(newnode.toxml()), node)
                 
         
         nodes = dom.getElementsByTagName( "Cycle" )
@@ -447,51 +1365,74 @@ def CreateConfig( className, configName = "" , namespace = "", analysis = "MyAna
         cycle = nodes[ 0 ]
         cycle.setAttribute( "Name", cycleName )
         cycle.setAttribute( "RunMode", "LOCAL" )
+        if proof:
+            nworkers, packetFraction = ProofSettings( inputFiles, proof_workers )
+            print "CreateConfig:: PROOF-Lite with %d workers" % nworkers
+            cycle.setAttribute( "RunMode", "PROOF" )
+            cycle.setAttribute( "ProofServer", "lite://" )
+            cycle.setAttribute( "ProofNodes", str( nworkers ) )
+        if postfix:
+            cycle.setAttribute( "PostFix", postfix )
         
         #Remove all but one input data
-        while len( dom.getElementsByTagName( "InputData" ) ) > 1:
-            cycle.removeChild( dom.getElementsByTagName( "InputData" )[ -1 ] )
-        inputData = dom.getElementsByTagName( "InputData" )[ 0 ]
+        inputData = KeepFirstElement( cycle, "InputData" )
         
         for i in range( inputData.attributes.length ):
             inputData.removeAttribute( inputData.attributes.item( 0 ).name )
         
-        inputData.setAttribute( "Lumi", "1.0" )
+        if inputDataComment:
+            cycle.insertBefore( dom.createComment( " %s " % inputDataComment ), inputData )
+        if inputFiles:
+            # The input files may only be a part of the whole dataset
+            inputData.setAttribute( "Lumi", "%.6g" % sum( [ f.lumi for f in inputFiles ] ) )
+        else:
+            inputData.setAttribute( "Lumi", "1.0" )
         inputData.setAttribute( "Version", "V1" )
         inputData.setAttribute( "Type", dataType )
         # inputData.setAttribute( "Cacheable", "False" )
         # inputData.setAttribute( "NEventsMax", "-1" )
         # inputData.setAttribute( "NEventsSkip", "0" )
+        if len( inputFiles ) == 1 and inputFiles[ 0 ].nmax >= 0:
+            # A range of entries of a single file, see SplitInputFile
+            inputData.setAttribute( "NEventsMax", str( inputFiles[ 0 ].nmax ) )
+            inputData.setAttribute( "NEventsSkip", str( inputFiles[ 0 ].skip ) )
         
         # Remove all but one input files
-        while len( inputData.getElementsByTagName( "In" ) ) > 1:
-            inputData.removeChild( inputData.getElementsByTagName( "In" )[ -1 ] )
-        In = inputData.getElementsByTagName( "In" )[ 0 ]
+        In = KeepFirstElement( inputData, "In" )
         
         In.setAttribute( "Lumi", "1.0" )
-        In.setAttribute( "FileName", rootfile )
+        if inputFiles:
+            # The list of files can be very long. It is written directly into the output file.
+            In.setAttribute( "FileName", InputFilesMarker )
+        else:
+            In.setAttribute( "FileName", rootfile )
         
         # Remove all but one input trees
-        while len( inputData.getElementsByTagName( "InputTree" ) ) > 1:
-            inputData.removeChild( inputData.getElementsByTagName( "InputTree" )[ -1 ] )
-        InputTree = inputData.getElementsByTagName( "InputTree" )[ 0 ]
+        InputTree = KeepFirstElement( inputData, "InputTree" )
         
         InputTree.setAttribute( "Name", treename )
         
         # Remove the MetadataOutputTrees
-        while len( inputData.getElementsByTagName( "MetadataOutputTree" ) ):
-            inputData.removeChild( inputData.getElementsByTagName( "MetadataOutputTree" )[ 0 ] )
+        for node in inputData.getElementsByTagName( "MetadataOutputTree" ):
+            inputData.removeChild( node )
         
         # Remove all but one output Trees
-        while len( inputData.getElementsByTagName( "OutputTree" ) )>1:
-            inputData.removeChild( inputData.getElementsByTagName( "OutputTree" )[ -1 ] )
-        outtreenode = inputData.getElementsByTagName( "OutputTree" )[ 0 ]
+        outtreenode = KeepFirstElement( inputData, "OutputTree" )
         
         if not outtree:
             # No output is desired, remove this node
             inputData.removeChild( outtreenode )
         else:
             outtreenode.setAttribute( "Name", outtree )
+            # Record the names of the output files, for the configuration of the next cycle
+            pattern = OutputFilePattern( cycle.getAttribute( "OutputDirectory" ), cycleName, inputData, postfix, rollover )
+            inputData.insertBefore( dom.createComment( " %s %s " % ( OutputFilesTag, pattern ) ), outtreenode )
+            # Every systematic variation has its own output tree
+            following = outtreenode.nextSibling
+            for variation in variations:
+                variationnode = outtreenode.cloneNode( deep=True )
+                variationnode.setAttribute( "Name", "%s_%s" % ( outtree, variation ) )
+                inputData.insertBefore( variationnode, following )
         
         nodes = cycle.getElementsByTagName( "UserConfig" )
         # We expect one UserConfig section
@@ -499,13 +1440,24 @@ def CreateConfig( className, configName = "" , namespace = "", analysis = "MyAna
         UserConfig = nodes[ 0 ]
         
         # Remove all but one item
-        while len( UserConfig.getElementsByTagName( "Item" ) ) > 1:
-            UserConfig.removeChild( UserConfig.getElementsByTagName( "Item" )[ -1 ] )
-        Item = UserConfig.getElementsByTagName( "Item" )[ 0 ]
+        Item = KeepFirstElement( UserConfig, "Item" )
         
         Item.setAttribute( "Name", "InTreeName" )
         Item.setAttribute( "Value", treename )
         
+        if proof:
+            newItem = Item.cloneNode( deep=True )
+            newItem.setAttribute( "Name", "ProofPacketAsAFraction" )
+            newItem.setAttribute( "Value", str( packetFraction ) )
+            UserConfig.appendChild( newItem )
+        
+        # The further properties of the cycle chosen at its creation
+        for name, value in userItems:
+            newItem = Item.cloneNode( deep=True )
+            newItem.setAttribute( "Name", name )
+            newItem.setAttribute( "Value", str( value ) )
+            UserConfig.appendChild( newItem )
+        
     except AssertionError:
         # If any exceptions were raised, the FirstCycle_config.xml file
         # has probably changed. In that case this function should be 
@@ -518,10 +1470,154 @@ def CreateConfig( className, configName = "" , namespace = "", analysis = "MyAna
     # Use some regexp to get rid of those
     text = re.sub( """(?<=\n)([ \t]*\n)+""", "", dom.toprettyxml( encoding ="UTF-8" ) )
     outfile =open( configName, "w" )
-    outfile.write( text )
+    if inputFiles:
+        WriteInputFiles( outfile, text, inputFiles )
+    else:
+        outfile.write( text )
     outfile.close()
     return
 
+## @short Marker of the comment with the output files in the configuration
+OutputFilesTag = "OutputFiles:"
+
+## @short Function to get the glob pattern of the output files of an input data
+#
+# SFrame names the output file of an input data after the cycle, the type and the
+# version of the input data, and the postfix of the cycle. A cycle that splits
+# its output adds "_partN" to the name of every part.
+#
+# @param directory The output directory of the cycle
+# @param cycleName Full name of the cycle
+# @param inputData The InputData node of the configuration
+# @param postfix The postfix of the output file names
+# @param rollover Whether the output is split into parts
+def OutputFilePattern( directory, cycleName, inputData, postfix, rollover ):
+    pattern = "%s%s.%s.%s%s" % ( directory, cycleName, inputData.getAttribute( "Type" ), inputData.getAttribute( "Version" ), postfix )
+    if rollover:
+        return pattern + "_part*.root"
+    return pattern + ".root"
+
+## @short Function to read the output files recorded in a configuration
+#
+# Returns the glob patterns of the output files that CreateConfig recorded in the
+# configuration of a cycle, in the order of its input data.
+#
+# @param configName Name of the configuration file
+def ReadOutputFilePatterns( configName ):
+    return re.findall( "<!-- %s (.*?) -->" % OutputFilesTag, open( configName ).read() )
+
+## @short Place holder for the list of input files in the configuration
+InputFilesMarker = "@SFRAME_META_TOOLS_INPUT_FILES@"
+
+## @short Function to write a configuration with a long list of input files
+#
+# Building tens of thousands of In nodes in the DOM and pretty-printing them is slow.
+# Instead, the small configuration text is split at the In node that holds the place
+# holder, and the In nodes are streamed into the output file in between.
+#
+# @param outfile Open file to write to
+# @param text The configuration text with the place holder
+# @param inputFiles List of "InputFile" objects
+def WriteInputFiles( outfile, text, inputFiles ):
+    from xml.sax.saxutils import quoteattr
+    match = re.search( """\n(?P<indent>[ \t]*)<In [^\n]*%s[^\n]*\n""" % InputFilesMarker, text )
+    outfile.write( text[ :match.start() + 1 ] )
+    for f in inputFiles:
+        outfile.write( """%s<In FileName=%s Lumi="%.6g"/>\n""" % ( match.group( "indent" ), quoteattr( f.name ), f.lumi ) )
+    outfile.write( text[ match.end(): ] )
+
+
+## @short Function to decide how many ranges to split each large file into
+#
+# Every range of a large file is a job of its own, and the whole files share the
+# remaining jobs. Starting from ranges of at most the mean job size, ranges are
+# merged as long as this reduces the estimated size of the largest job.
+# Returns the number of ranges for each large file.
+#
+# @param large List of the weights of the files to split
+# @param whole List of the weights of the files to keep whole
+# @param njobs Total number of jobs
+def SplitCounts( large, whole, njobs ):
+    target = float( sum( large ) + sum( whole ) ) / njobs
+    counts = [ int( math.ceil( weight / target ) ) for weight in large ]
+    
+    def Largest( counts ):
+        largest = max( [ 0 ] + [ float( weight ) / n for weight, n in zip( large, counts ) ] )
+        if whole:
+            nleft = njobs - sum( counts )
+            if nleft < 1:
+                return float( "inf" )
+            largest = max( largest, float( sum( whole ) ) / nleft, max( whole ) )
+        return largest
+    
+    while True:
+        options = [ counts[ :i ] + [ counts[ i ] - 1 ] + counts[ i+1: ] for i in range( len( counts ) ) if counts[ i ] > 1 ]
+        if not options:
+            break
+        best = min( options, key=Largest )
+        if Largest( best ) >= Largest( counts ):
+            break
+        counts = best
+    return counts
+
+## @short Function creating one configuration file per job
+#
+# The input files are distributed over njobs jobs such that every job has about
+# the same number of entries or compressed bytes to process, see BalanceJobs.
+# Each job gets its own configuration file, and a postfix for its output files.
+#
+# With split_files, files that are larger than a job are split into ranges of entries
+# by SplitInputFile. Since NEventsSkip and NEventsMax apply to a whole InputData,
+# each range is a job of its own, and the remaining files go into the other jobs.
+#
+# @param njobs Number of jobs to split the input files into
+# @param split_by What to balance the jobs in: "entries" or "bytes"
+# @param split_files Whether to split files that are larger than a job
+# @param configName Name of the configuration file of the whole dataset
+# @param inputFiles List of "InputFile" objects
+# @param treename Name of the input tree
+# @param kwargs Passed on to CreateConfig.
+def CreateJobConfigs( njobs, split_by = "entries", split_files = False, configName = "", inputFiles = [], treename = "InTreeName", **kwargs ):
+    def Weight( f ):
+        if split_by == "bytes":
+            return f.zipbytes
+        return f.entries
+    
+    wholeFiles = inputFiles
+    ranges = []
+    target = float( sum( [ Weight( f ) for f in inputFiles ] ) ) / njobs
+    if split_files and target:
+        largeFiles = [ f for f in inputFiles if Weight( f ) > target ]
+        wholeFiles = [ f for f in inputFiles if Weight( f ) <= target ]
+        nranges = SplitCounts( [ Weight( f ) for f in largeFiles ], [ Weight( f ) for f in wholeFiles ], njobs )
+        for f, n in zip( largeFiles, nranges ):
+            ranges += SplitInputFile( f, n, treename )
+        if ranges:
+            print "Job splitting:: Splitting %d large files into %d ranges of entries" % ( len( inputFiles ) - len( wholeFiles ), len( ranges ) )
+    
+    items = wholeFiles + ranges
+    weights = [ Weight( f ) for f in items ]
+    jobs = []
+    if wholeFiles:
+        jobs = [ job for job in BalanceJobs( weights[ :len( wholeFiles ) ], max( 1, njobs - len( ranges ) ) ) if job ]
+    jobs += [ [ len( wholeFiles ) + i ] for i in range( len( ranges ) ) ]
+    if len( jobs ) != njobs:
+        print >>sys.stderr, "WARNING: Writing %d configs instead of %d" % ( len( jobs ), njobs )
+    
+    for i, job in enumerate( jobs ):
+        postfix = "_job%d" % i
+        # Every job gets the Lumi of the whole dataset, so that SFrame weights its events like those
+        # of a single job over all the files, and the outputs of all the jobs add up to the dataset
+        jobFiles = [ items[ index ] for index in job ]
+        share = sum( [ f.lumi for f in jobFiles ] ) or 1.0
+        jobFiles = [ InputFile( f.name, f.entries, f.zipbytes, f.lumi / share, f.skip, f.nmax ) for f in jobFiles ]
+        comment = ( "Job %d of %d. The Lumi is the one of the whole dataset, so the events are weighted like in a "
+                    "single job over all the files. Add up the outputs of the jobs as they are, like with hadd, and "
+                    "don't weight them again by the Lumi of each job." % ( i + 1, len( jobs ) ) )
+        CreateConfig( configName = re.sub( "_config\.xml$", postfix + "_config.xml", configName ),
+                      inputFiles = jobFiles, postfix = postfix, treename = treename, inputDataComment = comment, **kwargs )
+    PrintJobBalance( weights, jobs, split_by )
+
 
 ## @short Function to add a JobConfig file to the analysis
 #
@@ -549,6 +1645,79 @@ def AddJobConfig( config_directory, **kwargs):
     print "Using a copy of", oldfile
 
 
+## @short Function making sure that the counters of the variable-length arrays are read
+#
+# A variable-length array can only be used together with its counter. Counters
+# that are commented out in the list of variables are switched on, and missing
+# ones are added as Int_t variables in front of their first array.
+#
+# @param varlist The list of variables of the cycle, which is modified in place
+def AddArrayCounters( varlist ):
+    byname = dict( [ ( var.name, var ) for var in varlist ] )
+    for var in list( varlist ):
+        if not var.count or var.commented:
+            continue
+        counter = byname.get( var.count )
+        if not counter:
+            print >>sys.stderr, "WARNING: Adding the counter \"%s\" of the array \"%s\" as Int_t" % ( var.count, var.name )
+            counter = BranchObject.Variable( name=var.count, typename="Int_t" )
+            counter.typelength = var.typelength
+            counter.namelength = var.namelength
+            varlist.insert( varlist.index( var ), counter )
+            byname[ var.count ] = counter
+        elif counter.commented:
+            print >>sys.stderr, "WARNING: Using the counter \"%s\" of the array \"%s\"" % ( var.count, var.name )
+            counter.commented = ""
+
+## @short Function translating a selection into C++ code of the cycle
+#
+# The selection is a C++ expression, in which the variables are given by the
+# names of their branches. These are replaced by the names of the members of the
+# cycle. The variables are marked with a "selection" attribute, so that their
+# branches are read before the others. Commented variables are switched on, and
+# the counters of arrays are read along with them. Names that are not variables
+# are kept as they are if they are called like functions.
+# Returns the C++ expression.
+#
+# @param selection The selection expression, like "el_n>0 && met>20000"
+# @param varlist The list of variables of the cycle, which is modified in place
+def CompileSelection( selection, varlist ):
+    byname = dict( [ ( var.name, var ) for var in varlist ] )
+    unknown = []
+    
+    def Replace( match ):
+        name = match.group( "name" )
+        # Members and methods of the variables are no variables themselves
+        if re.search( r"(->|\.|::)\s*$", selection[ :match.start() ] ):
+            return name
+        rest = ""
+        while name not in byname and "." in name:
+            name, member = name.rsplit( ".", 1 )
+            rest = "." + member + rest
+        var = byname.get( name )
+        if not var:
+            if not re.match( r"\s*(\(|::)", selection[ match.end(): ] ) and name not in ( "true", "false" ):
+                unknown.append( name )
+            return match.group( "name" )
+        for used in [ var, byname.get( var.count ) ]:
+            if not used:
+                continue
+            if used.commented:
+                print >>sys.stderr, "WARNING: Using the variable \"%s\" of the selection" % used.name
+                used.commented = ""
+            if used.mc:
+                print >>sys.stderr, "WARNING: The MC variable \"%s\" of the selection is not read for data" % used.name
+            used.selection = True
+        return var.cname + rest
+    
+    # Skip over numbers like 2e4f, so that their suffixes are not taken for names
+    expression = re.sub( r"(?P<number>\b[0-9][0-9a-zA-Z_.]*)|(?P<name>\b[a-zA-Z_][a-zA-Z0-9_.]*)",
+                         lambda match: match.group( "number" ) or Replace( match ), selection )
+    if unknown:
+        print >>sys.stderr, "ERROR: Unknown variables in the selection:", ", ".join( unknown )
+        sys.exit(-1)
+    return expression
+
 ## @short Function to obtain the name of the analysis
 #
 # The name of the analysis can be obtained in one of three ways:
@@ -615,15 +1784,39 @@ def GetAnalysisName():
 # @param varlist Optional parameter with a filename for a list of desired variable declarations
 # @param outtree Optional parameter with the name of the output TTree
 # @param analysis Optional parameter with the name of analysis package
-def CreateCycle( cycleName, linkdef = "", rootfile = "", treename = "", varlist = "", outtree = "", analysis = "", mctags="mc_,truth", functions=False ):
+# @param pch Optional parameter for whether to use a precompiled header for the package
+# @param files Optional parameter with glob patterns, or a file list, of the input files for the config
+# @param nproc Optional parameter with the number of processes used to read the input files
+# @param njobs Optional parameter with the number of jobs to split the input files into
+# @param split_by Optional parameter with what to balance the jobs in: "entries" or "bytes"
+# @param split_files Optional parameter for whether to split files that are larger than a job
+# @param proof_workers Optional parameter with the number of PROOF-Lite workers. Chosen automatically if 0.
+# @param decompose Optional parameter for whether to read the members of the objects in the tree as variables of their own
+# @param compression Optional parameter with the compression of the output tree, like lz4:4
+# @param tune_baskets Optional parameter for whether to derive the basket sizes of the output branches from the input
+# @param systematics Optional parameter with comma separated regular expressions of the systematic variations of the branch names
+# @param settings Optional parameters with the settings of the features of the cycle, see CycleOptions
+def CreateCycle( cycleName, linkdef = "", rootfile = "", treename = "", varlist = "", outtree = "", analysis = "", mctags="mc_,truth", functions=False, pch=False, files = "", nproc = 0, njobs = 0, split_by = "entries", split_files = False, proof_workers = 0, decompose = False, compression = "", tune_baskets = False, systematics = "", **settings ):
     
     namespace, className = SplitCycleName( cycleName )
+    options = CycleOptions( create_output = bool( outtree ), functions = True, outtree = outtree, **settings )
         
     # Make sure analysis is set
     if not analysis:
         analysis = GetAnalysisName()
         print "Using analysis name \"%s\"" % analysis
     
+    # Expand the list of input files. The first one is used like the rootfile if none was given.
+    input_files = []
+    if files:
+        input_files = ExpandInputFiles( files )
+        if not input_files:
+            print >>sys.stderr, "ERROR: No input files found for \"%s\"" % files
+            sys.exit(-1)
+        print "Using %d input files" % len( input_files )
+        if not rootfile:
+            rootfile = input_files[ 0 ]
+    
     #First we take care of all the variables that the user may want to have read in.
     # If treename wasn't given, it can be read from the rootfile if it exits.
     if not treename:
@@ -636,7 +1829,8 @@ def CreateCycle( cycleName, linkdef = "", rootfile = "", treename = "", varlist
     if varlist:
         cycle_variables = BranchObject.ReadVariableSelection( varlist )
     elif rootfile:
-        cycle_variables = TTreeReader.ReadVars( rootfile, treename )
+        cycle_variables = TTreeReader.ReadVars( rootfile, treename, decompose )
+    AddArrayCounters( cycle_variables )
     
     # The list of input variables is now contained in cycle_variables
     # if this list is empty, the effect of this class should be identical to that of the old CycleCreators
@@ -668,6 +1862,54 @@ def CreateCycle( cycleName, linkdef = "", rootfile = "", treename = "", varlist
     else:
         dataType="DATA"
     
+    # The variants of the variables in the systematic variations
+    if systematics:
+        options.variations = FindVariations( cycle_variables, systematics )
+        if options.variations:
+            print "Found %d systematic variations: %s" % ( len( options.variations ), ", ".join( options.variations ) )
+        else:
+            print >>sys.stderr, "WARNING: No systematic variations found for \"%s\"" % systematics
+    
+    # Get the number of entries of every input file for the config
+    inputFiles = []
+    if input_files:
+        infos = TTreeReader.GetTreeInfoList( input_files, treename, nproc )
+        inputFiles = [ InputFile( name, entries, zipbytes ) for name, ( entries, zipbytes ) in zip( input_files, infos ) ]
+        if TTreeReader.ROOT:
+            empty = [ f.name for f in inputFiles if not f.entries ]
+            if empty:
+                print >>sys.stderr, "WARNING: Leaving out %d input files without entries, like \"%s\"" % ( len( empty ), empty[ 0 ] )
+            inputFiles = [ f for f in inputFiles if f.entries ]
+        # The Lumi of each file is its share of the entries, so that all files add up to 1.0.
+        # If the numbers of entries are unknown, all files get the same share.
+        total = sum( [ f.entries for f in inputFiles ] )
+        for f in inputFiles:
+            if total:
+                f.lumi = float( f.entries ) / total
+            else:
+                f.lumi = 1.0 / len( inputFiles )
+        print "Found %d entries in %d input files" % ( total, len( inputFiles ) )
+    
+    # The settings of the output tree
+    options.tune_output = bool( compression or options.auto_flush or tune_baskets )
+    if options.tune_output and not outtree:
+        print >>sys.stderr, "WARNING: The output settings are only used with an output tree, see -o"
+        options.tune_output = False
+    options.compression = compression and ParseCompression( compression ) or ( -1, 0 )
+    if options.tune_output and tune_baskets:
+        options.basketSizes = OutputBasketSizes( cycle_variables, TTreeReader.GetBranchSizes( rootfile, treename ), options.auto_flush )
+        if not options.basketSizes:
+            print >>sys.stderr, "WARNING: No branch sizes found, the output branches keep the default basket size"
+    
+    # Splitting the output file into parts
+    options.rollover = options.max_output_size > 0 or options.max_output_entries > 0
+    if options.rollover and not outtree:
+        print >>sys.stderr, "WARNING: The output file is only split with an output tree, see -o"
+        options.rollover = False
+    if options.rollover and options.variations:
+        print >>sys.stderr, "WARNING: The output file is not split with systematic variations, only their nominal tree would be"
+        options.rollover = False
+    
     #From now on rootfile is only used in the config file:
     if not rootfile:
         rootfile ="your/input/file.root"
@@ -709,26 +1951,75 @@ def CreateCycle( cycleName, linkdef = "", rootfile = "", treename = "", varlist
     
     
     # All options seem to be in order. Generate the code.
-    options = dict()
-    options[ "className" ]=className
-    options[ "namespace" ] = namespace
-    options[ "varlist" ] = cycle_variables
-    options[ "create_output" ] = bool( outtree )
-    options[ "headerName" ] = include_dir + className + ".h"
-    options[ "linkdefName" ] = linkdef
-    options[ "sourceName" ] = src_dir + className + ".cxx"
-    options[ "configName" ] = config_dir + className + "_config.xml"
-    options[ "analysis" ] = analysis
-    options[ "rootfile" ] = rootfile
-    options[ "dataType" ] = dataType
-    options[ "treename" ] = treename
-    options[ "outtree" ] = outtree
-    options[ "config_directory" ] = config_dir
-    options[ "functions" ] = True #functions
-    options[ "header" ] = CreateHeader( **options )
-    AddLinkDef( **options )
-    CreateSource( **options )
-    CreateConfig( **options )
-    AddJobConfig( **options )
+    arguments = dict()
+    arguments[ "className" ]=className
+    arguments[ "namespace" ] = namespace
+    arguments[ "varlist" ] = cycle_variables
+    arguments[ "options" ] = options
+    arguments[ "headerName" ] = include_dir + className + ".h"
+    arguments[ "linkdefName" ] = linkdef
+    arguments[ "sourceName" ] = src_dir + className + ".cxx"
+    arguments[ "configName" ] = config_dir + className + "_config.xml"
+    arguments[ "analysis" ] = analysis
+    arguments[ "rootfile" ] = rootfile
+    arguments[ "dataType" ] = dataType
+    arguments[ "treename" ] = treename
+    arguments[ "outtree" ] = outtree
+    arguments[ "inputFiles" ] = inputFiles
+    arguments[ "proof" ] = options.proof
+    arguments[ "proof_workers" ] = proof_workers
+    arguments[ "rollover" ] = options.rollover
+    arguments[ "variations" ] = options.variations
+    arguments[ "benchmarkName" ] = "bench/" + className + "_Benchmark.cxx"
+    # Properties of the cycle that are written into the UserConfig of the configuration
+    userItems = []
+    if options.implicit_mt >= 0:
+        userItems.append( ( "ImplicitMTThreads", options.implicit_mt ) )
+    if options.tune_output:
+        userItems.append( ( "OutputCompressionAlgorithm", options.compression[ 0 ] ) )
+        userItems.append( ( "OutputCompressionLevel", options.compression[ 1 ] ) )
+        userItems.append( ( "OutputAutoFlush", options.auto_flush ) )
+    if options.block_size > 0:
+        userItems.append( ( "BlockSize", options.block_size ) )
+        if options.count_reads:
+            print >>sys.stderr, "WARNING: The read counters don't see the reads of the block buffers in ExecuteBlock"
+    if options.count_reads:
+        userItems.append( ( "UsedVariablesFile", options.used_variables or className + "_used_variables.C" ) )
+    if options.memory > 0:
+        userItems.append( ( "MemoryCheckInterval", options.memory ) )
+        userItems.append( ( "MemoryAlarmMB", options.memory_alarm ) )
+    if options.progress > 0:
+        userItems.append( ( "ProgressInterval", options.progress ) )
+        userItems.append( ( "ProgressOutput", options.progress_output ) )
+    if options.selection and cycle_variables:
+        options.selection_expression = CompileSelection( options.selection, cycle_variables )
+    elif options.selection:
+        print >>sys.stderr, "WARNING: The selection is only applied with input variables, see -v and -r"
+    # The variants of the variables of the selection are read with them
+    for var in cycle_variables:
+        if var.nominal and var.nominal.selection:
+            var.selection = True
+    if options.variations and outtree:
+        userItems.append( ( "OutTreeName", outtree ) )
+    if options.rollover:
+        userItems.append( ( "OutTreeName", outtree ) )
+        userItems.append( ( "OutputMaxFileSize", options.max_output_size ) )
+        userItems.append( ( "OutputMaxEntries", options.max_output_entries ) )
+    arguments[ "userItems" ] = userItems
+    arguments[ "config_directory" ] = config_dir
+    if pch:
+        # The name is fixed by the rules in the SFrame Makefile
+        arguments[ "pchName" ] = include_dir + analysis + "_PCH.h"
+        CreatePCHHeader( **arguments )
+    arguments[ "header" ] = CreateHeader( **arguments )
+    arguments[ "shared_dictionaries" ] = bool( AddLinkDef( **arguments ) )
+    CreateSource( **arguments )
+    if options.benchmark:
+        CreateBenchmark( **arguments )
+    if njobs > 1 and inputFiles:
+        CreateJobConfigs( njobs, split_by, split_files, **arguments )
+    else:
+        CreateConfig( **arguments )
+    AddJobConfig( **arguments )
     print "Please indent the code using your favourite formatter like 'Artistic Style' (astyle)."
     return
@@ -23,7 +23,8 @@ header_Body = """
  *  @author Put your name here
  * @version $Revision: 173 $
  */
-class %(class)-s : public SCycleBase {
+class %(class)-s : public SCycleBase
+%(branchesBase)s{
 
 public:
     /// Default constructor
@@ -59,49 +60,288 @@ private:
     // Put all your private variables here
     //
     string InTreeName;
-    
+    /// Whether the current input data is real data, set once in BeginInputData
+    bool isdata;
+%(configDeclarations)s
+    // Macro adding the functions for dictionary generation
+    ClassDef( %(fullClassName)s, 1 );
+
+}; // class %(class)-s
+"""
+
+## @short Template for the includes of the holder of the branch buffers
+#
+# They are included at file scope, outside of the namespace of the cycle.
+branches_HeaderIncludes = """
+#if !defined(__CINT__) && !defined(__CLING__)
+// ROOT include(s) for the branch buffers:
+#include <TFile.h>
+#include <TTree.h>
+#include <TBranch.h>
+#include <TLeaf.h>
+#include <TObjArray.h>
+#include <TString.h>
+#include <cstring>
+#endif // !__CINT__ && !__CLING__
+
+"""
+
+## @short Template for the holder of the branch buffers
+#
+# This string is used by CreateHeader to declare the variables that are connected
+# to the input and output trees. The holder is hidden from rootcint, so that no
+# dictionary or streamer code is generated for the branch buffers. The cycle
+# inherits the variables from it, so they are used exactly like normal members.
+branches_Body = """
+#if !defined(__CINT__) && !defined(__CLING__)
+/**
+ *    @short Branch buffers of %(class)s
+ *
+ *          The variables connected to the input and output trees.
+ *          There is no dictionary for this struct on purpose.
+ *
+ *          The input variables are bound to the branches of every new input
+ *          file through the cached index of their branch, as long as the
+ *          branch found there has the name and the type of the variable. Only
+ *          the others are looked up by name. The objects of the pointer
+ *          variables are created once and reused.
+ *          The branches of the variables used by the selection are read
+ *          separately, before all the others. The data members of split
+ *          objects are read without their objects, through the MakeClass
+ *          mode of only their own branches.
+ */
+struct %(class)-s_Branches%(branchesOutputBase)s {
+
+    /// Marks a variable whose branch was not found in the last look-up by name
+    static const Int_t kUnknownBranch = -2;
+
+    %(class)-s_Branches()
+        : m_inputTree( 0 ), m_branchIndices( %(nInputVariables)d, kUnknownBranch ), m_branchTypes( %(nInputVariables)d ),
+          m_selectionSlots( %(nInputVariables)d, false ), m_memberSlots( %(nInputVariables)d, false ),
+          m_optionalSlots( %(nInputVariables)d, false ) {
+%(inputVariableInitialisations)s%(selectionSlots)s%(memberSlots)s%(optionalSlots)s    }
+
+    ~%(class)-s_Branches() {
+%(inputVariableDeletions)s    }
+
+    /// Starts binding the input variables to the tree of a new input file
+    void PrepareBranchBindings( TTree* tree ) {
+        m_inputTree = tree;
+        m_boundBranches.clear();
+        m_selectionBranches.clear();
+    }
+
+    /// Binds an object variable, creating the object the first time
+    template< typename T >
+    void BindBranch( size_t slot, const char* name, T*& variable ) throw( SError ) {
+        if( ! variable ) variable = new T();
+        BindAddress( slot, name, &variable );
+    }
+
+    /// Binds a variable of a basic type
+    template< typename T >
+    void BindBranch( size_t slot, const char* name, T& variable ) throw( SError ) {
+        BindAddress( slot, name, &variable );
+    }
+
+    /// Binds an array buffer of the given number of elements, starting at first
+    template< typename T >
+    void BindArray( size_t slot, const char* name, T* first, Int_t size ) throw( SError ) {
+        TBranch* branch = BindAddress( slot, name, first );
+        if( ! branch ) return;
+        // The buffer has to hold the longest array of the file. Skipping the file
+        // would silently lose its events, so the cycle stops instead.
+        TLeaf* leaf = static_cast< TLeaf* >( branch->GetListOfLeaves()->UncheckedAt( 0 ) );
+        Int_t length = leaf->GetLenStatic();
+        if( leaf->GetLeafCount() ) length *= leaf->GetLeafCount()->GetMaximum();
+        if( length > size ) {
+            TFile* file = m_inputTree->GetCurrentFile();
+            throw SError( TString::Format( "The array %%s has up to %%d elements in %%s, but its buffer only %%d. "
+                                           "Enlarge the buffer in the header of the cycle.",
+                                           name, length, file ? file->GetName() : m_inputTree->GetName(), size ).Data(),
+                          SError::StopExecution );
+        }
+    }
+
+    /// Reads the bound branches, except for those of the selection, for the current entry of the input tree
+    void ReadBoundBranches() throw( SError ) {
+        ReadBranches( m_boundBranches );
+    }
+
+    /// Reads the bound branches of the selection for the current entry of the input tree
+    void ReadSelectionBranches() throw( SError ) {
+        ReadBranches( m_selectionBranches );
+    }
+%(blockBindings)s
     // Input Variables
 %(inputVariableDeclarations)s
-
+%(arrayAccessors)s
     //Output Variables
 %(outputVariableDeclarations)s
+private:
+    /// Binds a variable through the cached index of its branch, or by name
+    ///
+    /// The index is the position of the first leaf of the branch in the list of
+    /// all the leaves of the tree, so that sub-branches of split objects are
+    /// found without a look-up by name as well. Only the bound variables are
+    /// checked, by the name of their branch and the type of its first leaf, so
+    /// a new file costs no string work for the branches that the cycle doesn't
+    /// read. A branch that moved or changed its type is looked up by name, like
+    /// in the first file. Returns the bound branch, or 0
+    /// for an optional variable whose branch is missing. A variable that can't
+    /// be bound otherwise, because its branch is missing or has another type,
+    /// stops the cycle, so that its value isn't silently left stale.
+    template< typename T >
+    TBranch* BindAddress( size_t slot, const char* name, T* address ) throw( SError ) {
+        TBranch* branch = 0;
+        TObjArray* leaves = m_inputTree->GetListOfLeaves();
+        const Int_t index = m_branchIndices[ slot ];
+        if( index >= 0 && index < leaves->GetEntriesFast() ) {
+            TLeaf* leaf = static_cast< TLeaf* >( leaves->UncheckedAt( index ) );
+            branch = leaf->GetBranch();
+            if( ! HasName( branch, name ) || m_branchTypes[ slot ] != leaf->GetTypeName() ) branch = 0;
+        }
+        if( branch ) {
+            if( m_memberSlots[ slot ] ) DecomposeBranch( branch );
+            branch->SetAddress( address );
+        } else {
+            // The full look-up by name, with the type checks of ROOT
+            if( m_memberSlots[ slot ] ) DecomposeBranch( m_inputTree->GetBranch( name ) );
+            if( m_inputTree->SetBranchAddress( name, address, &branch ) < 0 ) branch = 0;
+            m_branchIndices[ slot ] = kUnknownBranch;
+            if( branch && branch->GetListOfLeaves()->GetEntriesFast() ) {
+                TLeaf* leaf = static_cast< TLeaf* >( branch->GetListOfLeaves()->UncheckedAt( 0 ) );
+                m_branchIndices[ slot ] = leaves->IndexOf( leaf );
+                m_branchTypes[ slot ] = leaf->GetTypeName();
+            }
+        }
+        if( branch ) {
+            ( m_selectionSlots[ slot ] ? m_selectionBranches : m_boundBranches ).push_back( branch );
+        } else if( ! m_optionalSlots[ slot ] ) {
+            TFile* file = m_inputTree->GetCurrentFile();
+            throw SError( TString::Format( "Can't bind the variable of the branch %%s in %%s. The branch is missing, "
+                                           "or its type differs from the variable in the header of the cycle.",
+                                           name, file ? file->GetName() : m_inputTree->GetName() ).Data(),
+                          SError::StopExecution );
+        }
+        return branch;
+    }
 
-    // Macro adding the functions for dictionary generation
-    ClassDef( %(fullClassName)s, 1 );
+    /// Whether a branch has the given name, which may start with the name of its split object
+    static bool HasName( TBranch* branch, const char* name ) {
+        const size_t length = strlen( name );
+        const size_t branchLength = strlen( branch->GetName() );
+        if( length == branchLength ) return ! strcmp( name, branch->GetName() );
+        return length > branchLength && name[ length - branchLength - 1 ] == '.' &&
+            ! strcmp( name + length - branchLength, branch->GetName() );
+    }
 
-}; // class %(class)-s
+    /// Switches the branch of a data member and the branches of its split objects to MakeClass mode
+    ///
+    /// Like in the code of TTree::MakeClass, these branches then read the data
+    /// members into separate variables, without constructing the objects. The
+    /// other branches of the tree, like the collections of objects, are still
+    /// read through their objects.
+    static void DecomposeBranch( TBranch* branch ) {
+        if( ! branch ) return;
+        TBranch* mother = branch->GetMother();
+        for( TBranch* parent = branch; parent; parent = ( parent == mother ? 0 : mother->GetSubBranch( parent ) ) ) {
+            parent->SetMakeClass( kTRUE );
+        }
+    }
+
+    /// Reads some of the bound branches for the current entry of the input tree
+    void ReadBranches( const std::vector< TBranch* >& branches ) throw( SError ) {
+        if( ! m_inputTree ) return;
+        const Long64_t entry = m_inputTree->GetReadEntry();
+        for( std::vector< TBranch* >::const_iterator br = branches.begin(); br != branches.end(); ++br ) {
+            if( ( *br )->GetEntry( entry ) < 0 ) {
+                throw SError( ( TString( "Failed to read branch " ) + ( *br )->GetName() ).Data(), SError::SkipFile );
+            }
+        }
+    }
+
+    /// The tree of the current input file
+    TTree* m_inputTree;
+    /// Index of the first leaf of the branch of every input variable in the list of leaves
+    std::vector< Int_t > m_branchIndices;
+    /// Type of the first leaf of the branch of every input variable
+    std::vector< TString > m_branchTypes;
+    /// Whether every input variable is used by the selection
+    std::vector< bool > m_selectionSlots;
+    /// Whether every input variable is a data member of a split object
+    std::vector< bool > m_memberSlots;
+    /// Whether every input variable may have no branch in a file
+    std::vector< bool > m_optionalSlots;
+    /// The branches bound in the current input file, except for those of the selection
+    std::vector< TBranch* > m_boundBranches;
+    /// The branches of the selection bound in the current input file
+    std::vector< TBranch* > m_selectionBranches;
+%(blockMembers)s
+}; // struct %(class)-s_Branches
+#endif // !__CINT__ && !__CLING__
+"""
+branches_Base = """#if !defined(__CINT__) && !defined(__CLING__)
+    , private %(class)-s_Branches
+#endif // !__CINT__ && !__CLING__
 """
 
+## @short Templates for the functions handling the variables
+#
+# The variables are connected, declared, cleared and filled by separate functions
+# for the variables that are always present and for the MC-only variables. The
+# type of the input data is only looked at once in BeginInputData, which decides
+# whether the MC functions are called at all.
 ConnectInputVariables_declaration="""   
     /// Function to connect the input variables to the input tree
     virtual void ConnectInputVariables( const SInputData& ) throw( SError );
     """
 ConnectInputVariables_body="""
-void %(class)-s::ConnectInputVariables( const SInputData& id ) throw( SError ){
-
-    bool isdata = id.GetType().Contains("data",TString::kIgnoreCase);
+void %(class)-s::ConnectInputVariables( const SInputData& ) throw( SError ){
 
 %(inputVariableConnections)s
 }
 """
 ConnectInputVariables_call="    ConnectInputVariables(id);\n"
 
+ConnectMCInputVariables_declaration="""   
+    /// Function to connect the MC-only input variables to the input tree
+    virtual void ConnectMCInputVariables( const SInputData& ) throw( SError );
+    """
+ConnectMCInputVariables_body="""
+void %(class)-s::ConnectMCInputVariables( const SInputData& ) throw( SError ){
+
+%(mcInputVariableConnections)s
+}
+"""
+ConnectMCInputVariables_call="    if( !isdata ) ConnectMCInputVariables(id);\n"
+
 DeclareOutputVariables_declaration="""   
-    /// Function to connect the input variables to the input tree
+    /// Function to declare the output variables to the output tree
     virtual void DeclareOutputVariables( const SInputData& ) throw( SError );
     """
 DeclareOutputVariables_body="""
-void %(class)-s::DeclareOutputVariables( const SInputData& id ) throw( SError ){
-
-    bool isdata = id.GetType().Contains("data",TString::kIgnoreCase);
+void %(class)-s::DeclareOutputVariables( const SInputData& ) throw( SError ){
 
 %(outputVariableConnections)s
 }
 """
 DeclareOutputVariables_call="    DeclareOutputVariables(id);\n"
 
+DeclareMCOutputVariables_declaration="""   
+    /// Function to declare the MC-only output variables to the output tree
+    virtual void DeclareMCOutputVariables( const SInputData& ) throw( SError );
+    """
+DeclareMCOutputVariables_body="""
+void %(class)-s::DeclareMCOutputVariables( const SInputData& ) throw( SError ){
+
+%(mcOutputVariableConnections)s
+}
+"""
+DeclareMCOutputVariables_call="    if( !isdata ) DeclareMCOutputVariables(id);\n"
+
 ClearOutputVariables_declaration="""   
-    /// Function to connect the input variables to the input tree
+    /// Function to clear the output variables before each event
     virtual void ClearOutputVariables() throw( SError );
     """
 ClearOutputVariables_body="""
@@ -111,8 +351,83 @@ void %(class)-s::ClearOutputVariables() throw( SError ){
 """
 ClearOutputVariables_call="    ClearOutputVariables();\n"
 
+ClearMCOutputVariables_declaration="""   
+    /// Function to clear the MC-only output variables before each event
+    virtual void ClearMCOutputVariables() throw( SError );
+    """
+ClearMCOutputVariables_body="""
+void %(class)-s::ClearMCOutputVariables() throw( SError ){
+%(mcOutputVariableClearing)s
+}
+"""
+ClearMCOutputVariables_call="    if( !isdata ) ClearMCOutputVariables();\n"
+
+FillOutputVariables_declaration="""   
+    /// Function to copy the input variables to the output variables
+    virtual void FillOutputVariables() throw( SError );
+    """
+FillOutputVariables_body="""
+void %(class)-s::FillOutputVariables() throw( SError ){
+%(outputVariableFilling)s
+}
+"""
+FillOutputVariables_call="    FillOutputVariables();\n"
+
+FillMCOutputVariables_declaration="""   
+    /// Function to copy the MC-only input variables to the output variables
+    virtual void FillMCOutputVariables() throw( SError );
+    """
+FillMCOutputVariables_body="""
+void %(class)-s::FillMCOutputVariables() throw( SError ){
+%(mcOutputVariableFilling)s
+}
+"""
+FillMCOutputVariables_call="    if( !isdata ) FillMCOutputVariables();\n"
+
 StartMCBlock="    if(!isdata) {\n"
 CloseMCBlock="    }\n"
+
+## @short Template for the accessor of the length of a variable-length array
+arrayAccessor = """    /// Number of elements of %(cname)s in the current entry
+    %(commented)sInt_t %(cname)s_size() const { return %(countcname)s; }
+"""
+
+## @short Code using the branch bindings of the branches struct
+#
+# Only cycles with input variables have a branches struct.
+bindings_Setup = """    PrepareBranchBindings( %(inputTree)s );
+"""
+bindings_Reading = """    ReadBoundBranches();
+"""
+
+## @short Code applying the selection given at the creation of the cycle
+#
+# Only the branches of the selection are read before it is applied. Events
+# failing it are skipped with SError::SkipEvent, which is how SFrame keeps an
+# event out of the output trees.
+selection_Slot = """        m_selectionSlots[ %(slot)d ] = true;
+"""
+selection_Reading = """    // The selection: %(selection)s
+    ReadSelectionBranches();
+    if( ! ( %(expression)s ) ) {
+%(rejection)s        throw SError( SError::SkipEvent );
+    }
+"""
+
+## @short Code marking an input variable whose branch may be missing in a file
+#
+# These are the variants of the systematic variations, which CheckVariations
+# replaces by the nominal values in the files without them.
+optional_Slot = """        m_optionalSlots[ %(slot)d ] = true;
+"""
+
+## @short Code marking an input variable as a data member of a split object
+#
+# The branches of these variables, and those of their split objects, are
+# switched to MakeClass mode, so that the members are read without the objects.
+member_Slot = """        m_memberSlots[ %(slot)d ] = true;
+"""
+
 ## @short Template for a header file
 #
 # This string is used by CreateHeader to create a header file
@@ -125,7 +440,7 @@ header_Frame = """// Dear emacs, this is -*- c++ -*-
 #include \"core/include/SCycleBase.h\"
 #include <vector>
 #include <string>
-using namespace std;
+%(headerIncludes)susing namespace std;
 
 %(body)s
 
@@ -133,6 +448,26 @@ using namespace std;
 
 """
 
+## @short Template for the precompiled header of a package
+#
+# This string is used by CreatePCHHeader to create the header that is precompiled
+# once by the SFrame Makefile and included first into every source of the package.
+pch_Header = """// Dear emacs, this is -*- c++ -*-
+#ifndef %(capanalysis)-s_PCH_H
+#define %(capanalysis)-s_PCH_H
+
+// Precompiled header of the %(analysis)s package.
+// It is compiled once for the whole package and included first into every source.
+// Only put headers here that rarely change, since every cycle depends on them.
+
+// SFrame include(s):
+#include \"core/include/SCycleBase.h\"
+#include <vector>
+#include <string>
+
+#endif // %(capanalysis)-s_PCH_H
+"""
+
 ## @short Template for the body of a source file
 #
 # This string is used by CreateSource to create the body of a source file
@@ -140,8 +475,9 @@ source_Body = """
 %(class)-s::%(class)-s()
     : SCycleBase() {
     
+    isdata = false;
     DeclareProperty("InTreeName", InTreeName );
-    SetLogName( GetName() );
+%(propertyDeclarations)s    SetLogName( GetName() );
 }
 
 %(class)-s::~%(class)-s() {
@@ -149,70 +485,73 @@ source_Body = """
 }
 
 void %(class)-s::BeginCycle() throw( SError ) {
-
+%(beginCycleSetup)s
     return;
 
 }
 
 void %(class)-s::EndCycle() throw( SError ) {
-
+%(cycleEnd)s
     return;
 
 }
 
 void %(class)-s::BeginMasterInputData( const SInputData& ) throw( SError ) {
-
+%(masterInputDataSetup)s
     return;
 }
 
-void %(class)-s::EndMasterInputData( const SInputData& ) throw( SError ) {
+void %(class)-s::EndMasterInputData( const SInputData&%(endMasterInputDataId)s ) throw( SError ) {
 
 	  // You can do fitting here.
-    return;
+%(masterInputDataEnd)s    return;
 
 }
 
 void %(class)-s::BeginInputData( const SInputData& id ) throw( SError ) {
 
-    bool isdata = id.GetType().Contains("data",TString::kIgnoreCase);
-
+    // Decide once per input data whether it is real data
+    isdata = id.GetType().Contains("data",TString::kIgnoreCase);
+%(inputDataSetup)s
 %(outputVariableConnections)s
     return;
 
 }
 
 void %(class)-s::EndInputData( const SInputData& ) throw( SError ) {
-
+%(inputDataEnd)s
     return;
 
 }
 
 void %(class)-s::BeginInputFile( const SInputData& id ) throw( SError ) {
 
-    bool isdata = id.GetType().Contains("data",TString::kIgnoreCase);
-
-%(inputVariableConnections)s
+%(connectStart)s%(bindingsSetup)s%(blockSetup)s%(variationSetup)s%(inputVariableConnections)s%(connectEnd)s
     return;
 
 }
 
-void %(class)-s::ExecuteEvent( const SInputData& id, Double_t /*weight*/ ) throw( SError ) {
-
-    bool isdata = id.GetType().Contains("data",TString::kIgnoreCase);
-
-%(outputVariableClearing)s
+void %(class)-s::ExecuteEvent( const SInputData& /*id*/, Double_t /*weight*/ ) throw( SError ) {
 
-    // The main part of your analysis goes here
-    
-%(outputVariableFilling)s
+%(eventStart)s%(variationRestore)s%(blockReading)s%(selectionReading)s%(bindingsReading)s%(readEnd)s%(eventProcessing)s%(eventEnd)s
 
     return;
 
 }
 
-%(functionBodys)s
+%(executeBlock)s%(functionBodys)s
 """
 
+## @short Template for the processing of an event after reading it
+#
+# This string is used by CreateSource for the part of ExecuteEvent that is
+# repeated for every systematic variation.
+eventProcessing = """%(outputVariableClearing)s%(clearEnd)s
+
+    // The main part of your analysis goes here
+    
+%(userEnd)s%(outputVariableFilling)s"""
+
 ## @short Template for the frame of a source file
 #
 # This string is used by CreateSource to create a source file
@@ -220,12 +559,1474 @@ void %(class)-s::ExecuteEvent( const SInputData& id, Double_t /*weight*/ ) throw
 source_Frame = """
 // Local include(s):
 #include \"%(header)s\"
-
+%(sourceIncludes)s
 ClassImp( %(fullClassName)s );
 
 %(body)s
 """
 
+## @short Templates for running on PROOF
+#
+# These strings are used by CreateHeader and CreateSource when the cycle is
+# created for running on PROOF-Lite. The packetizer setting is a UserConfig item
+# that CreateConfig adapts to the input files.
+proof_ConfigDeclarations = """
+    /// Packetizer setting for PROOF, applied in BeginMasterInputData
+    int ProofPacketAsAFraction;
+"""
+proof_PropertyDeclarations = """    ProofPacketAsAFraction = 0;
+    DeclareProperty("ProofPacketAsAFraction", ProofPacketAsAFraction );
+"""
+proof_MasterInputDataSetup = """
+    // Adapt the PROOF packetizer to the size of the input files
+    if( gProof && ProofPacketAsAFraction > 0 ) {
+        gProof->SetParameter( "PROOF_PacketAsAFraction", ProofPacketAsAFraction );
+    }
+"""
+proof_Includes = """
+// ROOT include(s):
+#include <TProof.h>
+"""
+
+## @short Code setting up the implicit multithreading of ROOT
+#
+# ROOT can decompress and compress the baskets of different branches in parallel.
+# The PROOF workers don't run BeginCycle, so the setup is repeated in BeginInputData.
+mt_ConfigDeclarations = """
+    /// Threads of the implicit multithreading of ROOT, 0 for all the cores, negative for none
+    int ImplicitMTThreads;
+"""
+mt_PropertyDeclarations = """    ImplicitMTThreads = %(implicit_mt)d;
+    DeclareProperty("ImplicitMTThreads", ImplicitMTThreads );
+"""
+mt_FunctionDeclaration = """
+    /// Function enabling the implicit multithreading of ROOT once per process
+    void SetupImplicitMT();
+"""
+mt_BeginCycleSetup = """
+    SetupImplicitMT();
+"""
+mt_InputDataSetup = """    // The PROOF workers don't run BeginCycle
+    SetupImplicitMT();
+"""
+mt_FunctionBody = """
+void %(class)-s::SetupImplicitMT() {
+
+#if ROOT_VERSION_CODE >= ROOT_VERSION( 6, 10, 0 )
+    if( ImplicitMTThreads < 0 || ROOT::IsImplicitMTEnabled() ) return;
+    Int_t threads = ImplicitMTThreads;
+    if( ! threads ) {
+        SysInfo_t info;
+        gSystem->GetSysInfo( &info );
+        threads = info.fCpus;
+    }
+    // The workers of PROOF-Lite share the cores of the machine
+    if( gProofServ && gProofServ->GetGroupSize() > 1 ) {
+        threads = std::max( 1, threads / gProofServ->GetGroupSize() );
+    }
+    if( threads > 1 ) {
+        // The cycle reads its bound branches one by one, not through TTree::GetEntry, so
+        // their deserialisation stays serial. Only the unzipping of the baskets in the
+        // cache and the writing of the output tree use the threads.
+        ROOT::EnableImplicitMT( threads );
+        TTreeCacheUnzip::SetParallelUnzip( TTreeCacheUnzip::kEnable );
+        m_logger << INFO << "Using implicit multithreading with " << threads << " threads "
+                 << "for unzipping the input and writing the output" << SLogger::endmsg;
+    }
+#else
+    if( ImplicitMTThreads >= 0 ) {
+        m_logger << WARNING << "Implicit multithreading needs ROOT 6.10 or newer" << SLogger::endmsg;
+    }
+#endif // ROOT_VERSION_CODE
+}
+"""
+mt_Includes = """
+// ROOT include(s) for the implicit multithreading:
+#include <RVersion.h>
+#include <TROOT.h>
+#include <TSystem.h>
+#include <TProofServ.h>
+#include <TTreeCacheUnzip.h>
+#include <algorithm>
+"""
+
+## @short Code applying the compression, basket size and AutoFlush settings to the output tree
+output_ConfigDeclarations = """
+    /// Compression algorithm of the output branches (ROOT::ECompressionAlgorithm), negative to keep the default
+    int OutputCompressionAlgorithm;
+    /// Compression level of the output branches
+    int OutputCompressionLevel;
+    /// AutoFlush of the output tree, entries if positive, compressed bytes if negative, 0 to keep the default
+    int OutputAutoFlush;
+"""
+output_PropertyDeclarations = """    OutputCompressionAlgorithm = %(algorithm)d;
+    DeclareProperty("OutputCompressionAlgorithm", OutputCompressionAlgorithm );
+    OutputCompressionLevel = %(level)d;
+    DeclareProperty("OutputCompressionLevel", OutputCompressionLevel );
+    OutputAutoFlush = %(auto_flush)d;
+    DeclareProperty("OutputAutoFlush", OutputAutoFlush );
+"""
+output_FunctionDeclaration = """
+    /// Function applying the output settings to a newly declared branch
+    void TuneOutputBranch( TBranch* branch, Int_t basketSize );
+"""
+output_FunctionBody = """
+void %(class)-s::TuneOutputBranch( TBranch* branch, Int_t basketSize ) {
+
+    if( ! branch ) return;
+    if( OutputCompressionAlgorithm >= 0 ) {
+        branch->SetCompressionSettings( 100 * OutputCompressionAlgorithm + OutputCompressionLevel );
+    }
+    // A basket size of 0 keeps the default
+    if( basketSize > 0 ) branch->SetBasketSize( basketSize );
+    if( OutputAutoFlush && branch->GetTree()->GetAutoFlush() != OutputAutoFlush ) {
+        branch->GetTree()->SetAutoFlush( OutputAutoFlush );
+    }
+}
+"""
+output_Includes = """
+// ROOT include(s) for the output settings:
+#include <TBranch.h>
+#include <TTree.h>
+"""
+
+## @short Code splitting the output file into parts of a limited size
+#
+# SFrame writes all the output of an input data into one file, which it owns,
+# so TTree::ChangeFile can't be used on its output tree. Instead the output tree
+# is moved into a file of the cycle in BeginInputData. At the start of every
+# event, so after SFrame filled the previous one, the tree is written and moved
+# into a new file, if it is at a cluster boundary and one more cluster would
+# take the current file over the limits. The parts are named like the output
+# file with "_partN" added. The other objects, like the histograms, stay in the
+# file of SFrame, together with an empty output tree.
+rollover_HeaderIncludes = """
+// ROOT include(s) for splitting the output file:
+#include <TFile.h>
+#include <TTree.h>
+
+"""
+rollover_ConfigDeclarations = """
+    /// Name of the output tree, which is split into the parts
+    string OutTreeName;
+    /// Maximal size of an output file in megabytes, 0 for no limit
+    int OutputMaxFileSize;
+    /// Maximal number of entries of an output file, 0 for no limit
+    int OutputMaxEntries;
+    /// Function moving the output tree into the first part of the input data
+    void StartOutputParts( const SInputData& id ) throw( SError );
+    /// Function moving the output tree into a new part, if one more cluster would not fit
+    void RollOutputPart() throw( SError );
+    /// Function writing the last part, and giving the output tree back to SFrame
+    void EndOutputParts();
+    /// Function creating a new part
+    TFile* OpenOutputPart() throw( SError );
+    /// The output tree and the directory of SFrame that it belongs to
+    TTree* m_partTree; //!
+    TDirectory* m_partOrigin; //!
+    /// The current part, and its number
+    TFile* m_partFile; //!
+    Int_t m_partIndex; //!
+    /// The name of the output file of SFrame without ".root", and the name of this process
+    TString m_partBase, m_partWorker; //!
+    /// Bytes in the current part at the last cluster boundary
+    Long64_t m_partLastBytes; //!
+"""
+rollover_PropertyDeclarations = """    DeclareProperty("OutTreeName", OutTreeName );
+    OutputMaxFileSize = %(max_size)d;
+    DeclareProperty("OutputMaxFileSize", OutputMaxFileSize );
+    OutputMaxEntries = %(max_entries)d;
+    DeclareProperty("OutputMaxEntries", OutputMaxEntries );
+    m_partTree = 0;
+    m_partFile = 0;
+"""
+rollover_InputDataSetup = """
+    // Write the output tree into parts of the configured size
+    StartOutputParts( id );
+"""
+rollover_InputDataEnd = """
+    EndOutputParts();
+"""
+rollover_Hooks = {
+    "eventStart":"    if( m_partFile ) RollOutputPart();\n" }
+rollover_FunctionBody = """
+void %(class)-s::StartOutputParts( const SInputData& id ) throw( SError ) {
+
+    m_partTree = 0;
+    m_partFile = 0;
+    if( OutputMaxFileSize <= 0 && OutputMaxEntries <= 0 ) return;
+    m_partTree = GetOutputTree( OutTreeName.c_str() );
+    if( ! m_partTree ) {
+        throw SError( "Can't find the output tree to split", SError::SkipInputData );
+    }
+    m_partOrigin = m_partTree->GetDirectory();
+
+    // The name that SFrame gives to the output file of the input data. The
+    // workers of PROOF write their own parts, told apart by their ordinal.
+    m_partBase = GetConfig().GetOutputDirectory();
+    m_partBase += GetName();
+    m_partBase += ".";
+    m_partBase += id.GetType();
+    m_partBase += ".";
+    m_partBase += id.GetVersion();
+    m_partBase += GetConfig().GetPostFix();
+    m_partWorker = "";
+    if( gProofServ ) {
+        m_partWorker = "_w";
+        m_partWorker += gProofServ->GetOrdinal();
+    }
+    m_partIndex = 0;
+    m_partFile = OpenOutputPart();
+    m_partTree->SetDirectory( m_partFile );
+}
+
+void %(class)-s::RollOutputPart() throw( SError ) {
+
+    // The baskets of the tree are only all written at the boundaries of the
+    // clusters. Before the first one the AutoFlush is not known yet.
+    const Long64_t entries = m_partTree->GetEntries();
+    const Long64_t cluster = m_partTree->GetAutoFlush();
+    if( cluster <= 0 || ! entries || entries %% cluster ) return;
+    const Long64_t bytes = m_partFile->GetEND();
+    const Long64_t clusterBytes = bytes - m_partLastBytes;
+    m_partLastBytes = bytes;
+    const Bool_t full = ( OutputMaxEntries > 0 && entries + cluster > OutputMaxEntries ) ||
+        ( OutputMaxFileSize > 0 && bytes + clusterBytes > OutputMaxFileSize * 1024. * 1024. );
+    if( ! full ) return;
+
+    m_partFile->cd();
+    m_partTree->Write( "", TObject::kOverwrite );
+    ++m_partIndex;
+    TFile* next = OpenOutputPart();
+    m_partTree->Reset();
+    m_partTree->SetDirectory( next );
+    m_partFile->Close();
+    delete m_partFile;
+    m_partFile = next;
+}
+
+void %(class)-s::EndOutputParts() {
+
+    if( ! m_partFile ) return;
+    // An event skipped after a new part was opened can leave it empty
+    const Bool_t empty = m_partIndex && ! m_partTree->GetEntries();
+    if( ! empty ) {
+        m_partFile->cd();
+        m_partTree->Write( "", TObject::kOverwrite );
+    }
+    const TString name = m_partFile->GetName();
+    m_partTree->Reset();
+    m_partTree->SetDirectory( m_partOrigin );
+    m_partFile->Close();
+    delete m_partFile;
+    m_partFile = 0;
+    if( empty ) {
+        gSystem->Unlink( name );
+        --m_partIndex;
+    }
+    m_logger << INFO << "Wrote the output tree into " << m_partIndex + 1 << " files "
+             << m_partBase << "_part*.root" << SLogger::endmsg;
+}
+
+TFile* %(class)-s::OpenOutputPart() throw( SError ) {
+
+    // The parts are compressed like the output file of SFrame
+    TFile* origin = m_partTree->GetCurrentFile();
+    const TString name = TString::Format( "%%s_part%%d%%s.root", m_partBase.Data(), m_partIndex, m_partWorker.Data() );
+    TFile* part = new TFile( name, "RECREATE", origin ? origin->GetTitle() : "",
+                             origin ? origin->GetCompressionSettings() : 1 );
+    if( part->IsZombie() ) {
+        delete part;
+        throw SError( "Can't create a part of the output file", SError::SkipInputData );
+    }
+    m_partLastBytes = part->GetEND();
+    return part;
+}
+"""
+rollover_Includes = """
+// ROOT include(s) for splitting the output file:
+#include <TFile.h>
+#include <TTree.h>
+#include <TSystem.h>
+#include <TProofServ.h>
+"""
+
+## @short Code timing the phases of the processing
+#
+# The time spent binding the branches, reading them, clearing the output
+# variables, in the user code, copying into the output variables and in SFrame
+# between the events, where it fills the output tree, is summed up per input
+# data. The sums, with the number of events as their entries, and a histogram
+# of the processing time of the events are booked into the output, so that
+# PROOF merges them from all the workers. Events that the user code skips with
+# an SError have no user, copy and SFrame time.
+timing_HeaderIncludes = """
+// ROOT include(s) for the timing:
+#include <TH1.h>
+
+"""
+timing_ConfigDeclarations = """
+    /// Phases of the processing that are timed
+    enum TimingPhase { kTimingConnect = 0, kTimingRead, kTimingClear, kTimingUser, kTimingCopy, kTimingSFrame, kTimingPhases };
+    /// Function adding the time since mark to a phase, and moving mark to now
+    void TimePhase( TimingPhase phase, Double_t& mark );
+    /// Function timing the last phase of an event, and the whole event
+    void TimeEvent( TimingPhase phase, Double_t start, Double_t& mark );
+    /// Function adding the time in SFrame since the end of the last event, at the start of the next step
+    void TimeSFrame( Double_t start );
+    /// Function writing a table of the time spent in the phases into the log
+    void PrintTiming( const TString& title, const Double_t* timing, Double_t events, SMsgType type );
+    /// Seconds spent in every phase in the current input data
+    Double_t m_timing[ kTimingPhases ]; //!
+    /// Events processed in the current input data, including the skipped ones
+    Double_t m_timingEvents; //!
+    /// Times of the start and of the end of the last event, or of the binding of the branches
+    Double_t m_timingLastStart, m_timingLastEnd; //!
+    /// Seconds spent in every phase in all the input data, on the master
+    Double_t m_cycleTiming[ kTimingPhases ]; //!
+    /// Events processed in all the input data, on the master
+    Double_t m_cycleEvents; //!
+    /// Histogram of the seconds spent in every phase
+    TH1* m_phaseTiming; //!
+    /// Histogram of the processing time of the events
+    TH1* m_eventLatency; //!
+"""
+timing_PropertyDeclarations = """    m_phaseTiming = 0;
+    m_eventLatency = 0;
+    m_cycleEvents = m_timingEvents = 0;
+    m_timingLastStart = m_timingLastEnd = 0;
+    for( Int_t i = 0; i < kTimingPhases; ++i ) m_timing[ i ] = m_cycleTiming[ i ] = 0;
+"""
+timing_InputDataSetup = """    // The timing of the phases, merged from all the workers
+    for( Int_t i = 0; i < kTimingPhases; ++i ) m_timing[ i ] = 0;
+    m_timingEvents = m_timingLastStart = m_timingLastEnd = 0;
+    m_phaseTiming = Book( TH1D( "PhaseTiming", "Time spent in the phases;;Time [s]", kTimingPhases, 0., kTimingPhases ), "Timing" );
+    for( Int_t i = 0; i < kTimingPhases; ++i ) m_phaseTiming->GetXaxis()->SetBinLabel( i + 1, kTimingPhaseNames[ i ] );
+    m_eventLatency = Book( TH1D( "EventLatency", "Processing time of the events;log_{10}( time / #mus );Events", 80, -1., 7. ), "Timing" );
+"""
+timing_InputDataEnd = """
+    // Store the timing of this process, for merging, with the number of events as the entries
+    for( Int_t i = 0; i < kTimingPhases; ++i ) m_phaseTiming->SetBinContent( i + 1, m_timing[ i ] );
+    m_phaseTiming->SetEntries( m_timingEvents );
+    PrintTiming( "Timing of this process", m_timing, m_timingEvents, DEBUG );
+"""
+timing_MasterInputDataEnd = """
+    // The timing merged from all the workers
+    try {
+        TH1* phases = Retrieve< TH1 >( "PhaseTiming", "Timing" );
+        Double_t timing[ kTimingPhases ];
+        for( Int_t i = 0; i < kTimingPhases; ++i ) {
+            timing[ i ] = phases->GetBinContent( i + 1 );
+            m_cycleTiming[ i ] += timing[ i ];
+        }
+        m_cycleEvents += phases->GetEntries();
+        PrintTiming( "Timing of " + id.GetType() + " " + id.GetVersion(), timing, phases->GetEntries(), INFO );
+    } catch( const SError& ) {
+        m_logger << WARNING << "No timing found for the input data" << SLogger::endmsg;
+    }
+"""
+timing_CycleEnd = """
+    PrintTiming( "Timing of the cycle", m_cycleTiming, m_cycleEvents, INFO );
+"""
+timing_Hooks = {
+    "connectStart":"    Double_t timingMark = TimingNow();\n    TimeSFrame( timingMark );\n",
+    "connectEnd":"    TimePhase( kTimingConnect, timingMark );\n    m_timingLastEnd = timingMark;\n",
+    "eventStart":"    const Double_t timingStart = TimingNow();\n    Double_t timingMark = timingStart;\n    TimeSFrame( timingStart );\n    ++m_timingEvents;\n",
+    "readEnd":"    TimePhase( kTimingRead, timingMark );\n",
+    "rejection":"        TimeEvent( kTimingRead, timingStart, timingMark );\n",
+    "clearEnd":"    TimePhase( kTimingClear, timingMark );\n",
+    "userEnd":"    TimePhase( kTimingUser, timingMark );\n",
+    "variationEnd":"    TimePhase( kTimingCopy, timingMark );\n",
+    "eventEnd":"    TimeEvent( kTimingCopy, timingStart, timingMark );\n" }
+timing_FunctionBody = """
+void %(class)-s::TimePhase( TimingPhase phase, Double_t& mark ) {
+
+    const Double_t now = TimingNow();
+    m_timing[ phase ] += now - mark;
+    mark = now;
+}
+
+void %(class)-s::TimeEvent( TimingPhase phase, Double_t start, Double_t& mark ) {
+
+    TimePhase( phase, mark );
+    m_timingLastEnd = mark;
+    // Nothing is booked when the benchmark driver runs the cycle
+    if( m_eventLatency ) m_eventLatency->Fill( log10( 1e6 * ( mark - start ) ) );
+}
+
+void %(class)-s::TimeSFrame( Double_t start ) {
+
+    // After an event that the user code skipped, the end of the event is unknown
+    if( m_timingLastEnd > 0 && m_timingLastEnd >= m_timingLastStart ) m_timing[ kTimingSFrame ] += start - m_timingLastEnd;
+    m_timingLastStart = start;
+}
+
+void %(class)-s::PrintTiming( const TString& title, const Double_t* timing, Double_t events, SMsgType type ) {
+
+    Double_t total = 0;
+    for( Int_t i = 0; i < kTimingPhases; ++i ) total += timing[ i ];
+    m_logger << type << title << ", " << events << " events:" << SLogger::endmsg;
+    for( Int_t i = 0; i < kTimingPhases; ++i ) {
+        m_logger << type << TString::Format( "  %%-8s %%10.3f s %%6.1f %%%% %%10.2f us/event", kTimingPhaseNames[ i ], timing[ i ],
+                                             total > 0 ? 100. * timing[ i ] / total : 0., events > 0 ? 1e6 * timing[ i ] / events : 0. )
+                 << SLogger::endmsg;
+    }
+}
+"""
+timing_Includes = """
+// ROOT include(s) for the timing:
+#include <TH1.h>
+
+// System include(s):
+#include <cmath>
+#include <time.h>
+
+// The cycles of a unity build share these helpers
+#ifndef SFRAME_META_TOOLS_TIMING
+#define SFRAME_META_TOOLS_TIMING
+/// Names of the timed phases, in the order of TimingPhase
+static const char* const kTimingPhaseNames[] = { "Connect", "Read", "Clear", "User", "Copy", "SFrame" };
+
+/// Monotonic time in seconds, cheap enough to be taken several times per event
+static Double_t TimingNow() {
+
+    timespec now;
+    clock_gettime( CLOCK_MONOTONIC, &now );
+    return now.tv_sec + 1e-9 * now.tv_nsec;
+}
+#endif // SFRAME_META_TOOLS_TIMING
+"""
+
+## @short Code writing live progress records
+#
+# Every process appends a record as a JSON line to a file, or sends it to a UNIX
+# datagram socket, every ProgressInterval seconds. The sframe_progress script
+# combines the records of all the processes.
+progress_ConfigDeclarations = """
+    /// Seconds between the progress records, 0 for none
+    int ProgressInterval;
+    /// File to append the progress records to, or "unix:" and the path of a datagram socket
+    string ProgressOutput;
+    /// Function opening the progress output at the beginning of an input data
+    void StartProgress( const SInputData& id );
+    /// Function writing a progress record
+    void ReportProgress( Bool_t done );
+    /// Descriptor of the progress output, negative if not open
+    int m_progressFd; //!
+    /// Type and version of the current input data
+    TString m_progressInput; //!
+    /// Identifier of the run, shared by all the processes of one PROOF session
+    TString m_progressRun; //!
+    /// Entries of the input data, and processed by this process
+    Long64_t m_progressTotal, m_progressEntries; //!
+    /// Entries processed and bytes read up to the last record
+    Long64_t m_progressLastEntries, m_progressLastBytes; //!
+    /// Times of the start, the last and the next record
+    Double_t m_progressStart, m_progressLast, m_progressNext; //!
+"""
+progress_PropertyDeclarations = """    ProgressInterval = %(interval)d;
+    DeclareProperty("ProgressInterval", ProgressInterval );
+    ProgressOutput = "%(output)s";
+    DeclareProperty("ProgressOutput", ProgressOutput );
+    m_progressFd = -1;
+    m_progressTotal = m_progressEntries = m_progressLastEntries = m_progressLastBytes = 0;
+    m_progressStart = m_progressLast = m_progressNext = 0;
+"""
+progress_InputDataSetup = """    StartProgress( id );
+"""
+progress_InputDataEnd = """
+    ReportProgress( kTRUE );
+"""
+progress_Hooks = {
+    "eventStart":"    ++m_progressEntries;\n    if( m_progressFd >= 0 && ProgressNow() >= m_progressNext ) ReportProgress( kFALSE );\n" }
+progress_FunctionBody = """
+void %(class)-s::StartProgress( const SInputData& id ) {
+
+    if( ProgressInterval <= 0 ) return;
+    m_progressInput = id.GetType() + "." + id.GetVersion();
+    m_progressTotal = id.GetEventsTotal();
+    m_progressEntries = m_progressLastEntries = 0;
+    m_progressLastBytes = TFile::GetFileBytesRead();
+    m_progressStart = m_progressLast = ProgressNow();
+    m_progressNext = m_progressStart + ProgressInterval;
+    // The records of earlier runs in the same file are told apart by the run
+    if( gProofServ ) m_progressRun = gProofServ->GetTopSessionTag();
+    else m_progressRun = TString::Format( "%%s:%%d:%%.0f", gSystem->HostName(), gSystem->GetPid(), m_progressStart );
+    if( m_progressFd >= 0 ) return;
+
+    // All the processes of the machine write to the same place by default
+    TString output = ProgressOutput.c_str();
+    if( output.IsNull() ) output = TString::Format( "%%s/%%s_progress.jsonl", gSystem->TempDirectory(), GetName() );
+    if( output.BeginsWith( "unix:" ) ) {
+        sockaddr_un address;
+        memset( &address, 0, sizeof( address ) );
+        address.sun_family = AF_UNIX;
+        strncpy( address.sun_path, output.Data() + 5, sizeof( address.sun_path ) - 1 );
+        m_progressFd = socket( AF_UNIX, SOCK_DGRAM, 0 );
+        if( m_progressFd >= 0 && connect( m_progressFd, ( sockaddr* ) &address, sizeof( address ) ) < 0 ) {
+            close( m_progressFd );
+            m_progressFd = -1;
+        }
+        // A slow reader must not hold up the cycle
+        if( m_progressFd >= 0 ) fcntl( m_progressFd, F_SETFL, fcntl( m_progressFd, F_GETFL ) | O_NONBLOCK );
+    } else {
+        // Appending a whole line at once keeps the lines of the processes apart
+        m_progressFd = open( output.Data(), O_WRONLY | O_APPEND | O_CREAT, 0644 );
+    }
+    if( m_progressFd < 0 ) {
+        m_logger << WARNING << "Can't write the progress records to " << output << SLogger::endmsg;
+        return;
+    }
+    m_logger << INFO << "Writing progress records to " << output << SLogger::endmsg;
+}
+
+void %(class)-s::ReportProgress( Bool_t done ) {
+
+    if( m_progressFd < 0 ) return;
+    const Double_t now = ProgressNow();
+    const Long64_t bytes = TFile::GetFileBytesRead();
+    const Double_t interval = std::max( now - m_progressLast, 1e-3 );
+    const Double_t rate = ( m_progressEntries - m_progressLastEntries ) / interval;
+    const Double_t mbps = ( bytes - m_progressLastBytes ) / interval / ( 1024. * 1024. );
+    // The workers of PROOF are expected to process equal shares of the input data
+    Double_t share = m_progressTotal;
+    if( gProofServ && gProofServ->GetGroupSize() > 1 ) share /= gProofServ->GetGroupSize();
+    const Double_t eta = ( rate > 0 && share > m_progressEntries ) ? ( share - m_progressEntries ) / rate : 0.;
+    const TString record =
+        TString::Format( "{\\"cycle\\":%%s,\\"input\\":%%s,\\"run\\":%%s,\\"host\\":%%s,\\"pid\\":%%d,\\"worker\\":%%s,"
+                         "\\"entries\\":%%lld,\\"total\\":%%lld,\\"rate\\":%%.1f,\\"mbps\\":%%.2f,\\"eta\\":%%.0f,"
+                         "\\"elapsed\\":%%.1f,\\"time\\":%%.1f,\\"done\\":%%s}\\n",
+                         ProgressString( GetName() ).Data(), ProgressString( m_progressInput ).Data(),
+                         ProgressString( m_progressRun ).Data(), ProgressString( gSystem->HostName() ).Data(), gSystem->GetPid(),
+                         ProgressString( gProofServ ? gProofServ->GetOrdinal() : "0" ).Data(),
+                         ( long long ) m_progressEntries, ( long long ) m_progressTotal, rate, mbps, eta,
+                         now - m_progressStart, now, done ? "true" : "false" );
+    // A record that can't be written right now is dropped
+    const ssize_t written = write( m_progressFd, record.Data(), record.Length() );
+    ( void ) written;
+    m_progressLast = now;
+    m_progressLastEntries = m_progressEntries;
+    m_progressLastBytes = bytes;
+    m_progressNext = now + ProgressInterval;
+    if( done ) {
+        close( m_progressFd );
+        m_progressFd = -1;
+    }
+}
+"""
+progress_Includes = """
+// ROOT include(s) for the progress records:
+#include <TFile.h>
+#include <TSystem.h>
+#include <TProofServ.h>
+
+// System include(s):
+#include <algorithm>
+#include <cstring>
+#include <fcntl.h>
+#include <sys/socket.h>
+#include <sys/time.h>
+#include <sys/un.h>
+#include <unistd.h>
+
+// The cycles of a unity build share this helper
+#ifndef SFRAME_META_TOOLS_PROGRESS
+#define SFRAME_META_TOOLS_PROGRESS
+/// Time since the epoch in seconds, cheap enough to be taken for every event
+static Double_t ProgressNow() {
+
+    timeval now;
+    gettimeofday( &now, 0 );
+    return now.tv_sec + 1e-6 * now.tv_usec;
+}
+
+/// A string quoted for the progress records, with its quotes, backslashes and control characters escaped
+static TString ProgressString( const char* text ) {
+
+    TString result = "\\"";
+    for( const char* c = text; c && *c; ++c ) {
+        if( *c == '"' || *c == '\\\\' ) {
+            result += '\\\\';
+            result += *c;
+        } else if( static_cast< unsigned char >( *c ) < 0x20 ) {
+            result += TString::Format( "\\\\u%04x", static_cast< unsigned char >( *c ) );
+        } else {
+            result += *c;
+        }
+    }
+    result += '"';
+    return result;
+}
+#endif // SFRAME_META_TOOLS_PROGRESS
+"""
+
+## @short Code monitoring the memory usage
+#
+# Every MemoryCheckInterval events, the growth of the heap is attributed to the
+# phases of the event, the resident memory is compared to the alarm level, and
+# the capacities of the output vectors are checked. Binding the branches of a
+# new file is always monitored. The summary goes into the log in EndInputData.
+memory_ConfigDeclarations = """
+    /// Events between the samples of the memory usage, 0 for none
+    int MemoryCheckInterval;
+    /// Growth of the resident memory in MB that raises an alarm in the log, 0 for none
+    int MemoryAlarmMB;
+    /// Phases of the processing that the growth of the heap is attributed to
+    enum MemoryPhase { kMemoryConnect = 0, kMemoryRead, kMemoryClear, kMemoryUser, kMemoryFill, kMemoryPhases };
+    /// Function starting the memory monitor for a new input data
+    void StartMemoryMonitor( const SInputData& id );
+    /// Function attributing the growth of the heap since the last step to a phase
+    void MemoryStep( MemoryPhase phase );
+    /// Function ending a sampled event, with the checks of the resident memory and the output vectors
+    void EndMemorySample( MemoryPhase phase );
+    /// Function writing the summary of the memory usage into the log
+    void PrintMemory();
+    /// Type and version of the current input data
+    TString m_memoryInput; //!
+    /// Whether the current event is sampled
+    Bool_t m_memorySampling; //!
+    /// Events of the current input data
+    Long64_t m_memoryEvents; //!
+    /// Heap usage at the last step, in bytes
+    Long64_t m_memoryMark; //!
+    /// Growth of the heap in every phase, in bytes
+    Long64_t m_memoryGrowth[ kMemoryPhases ]; //!
+    /// Resident memory at the start, the last sample, the maximum and the next alarm level, in kB
+    Long64_t m_rssStart, m_rssLast, m_rssMax, m_rssAlarm; //!
+    /// Largest capacity of every monitored output vector
+    std::vector< Long64_t > m_outputCapacities; //!
+"""
+memory_PropertyDeclarations = """    MemoryCheckInterval = %(interval)d;
+    DeclareProperty("MemoryCheckInterval", MemoryCheckInterval );
+    MemoryAlarmMB = %(alarm)d;
+    DeclareProperty("MemoryAlarmMB", MemoryAlarmMB );
+    m_memorySampling = kFALSE;
+    m_memoryEvents = m_memoryMark = 0;
+    m_rssStart = m_rssLast = m_rssMax = m_rssAlarm = 0;
+    for( Int_t i = 0; i < kMemoryPhases; ++i ) m_memoryGrowth[ i ] = 0;
+    m_outputCapacities.assign( %(ncontainers)d, 0 );
+"""
+memory_InputDataSetup = """    StartMemoryMonitor( id );
+"""
+memory_InputDataEnd = """
+    PrintMemory();
+"""
+memory_Hooks = {
+    "connectStart":"    const Long64_t memoryMark = HeapUsage();\n",
+    "connectEnd":"    m_memoryGrowth[ kMemoryConnect ] += HeapUsage() - memoryMark;\n",
+    "eventStart":"    m_memorySampling = MemoryCheckInterval > 0 && ++m_memoryEvents % MemoryCheckInterval == 0;\n"
+                 "    if( m_memorySampling ) m_memoryMark = HeapUsage();\n",
+    "readEnd":"    if( m_memorySampling ) MemoryStep( kMemoryRead );\n",
+    "rejection":"        if( m_memorySampling ) EndMemorySample( kMemoryRead );\n",
+    "clearEnd":"    if( m_memorySampling ) MemoryStep( kMemoryClear );\n",
+    "userEnd":"    if( m_memorySampling ) MemoryStep( kMemoryUser );\n",
+    "variationEnd":"    if( m_memorySampling ) MemoryStep( kMemoryFill );\n",
+    "eventEnd":"    if( m_memorySampling ) EndMemorySample( kMemoryFill );\n" }
+memory_CapacityUpdate = """    m_outputCapacities[ %(index)d ] = std::max( m_outputCapacities[ %(index)d ], Long64_t( out_%(cname)s.capacity() ) );
+"""
+memory_CapacityReport = """
+    // The outer buffers of the output vectors
+    static const char* const names[] = { %(names)s };
+    const Long64_t sizes[] = { %(sizes)s };
+    m_logger << INFO << "Largest capacity of the output vectors:" << SLogger::endmsg;
+    for( size_t i = 0; i < m_outputCapacities.size(); ++i ) {
+        m_logger << INFO << TString::Format( "  %%-30s %%10lld elements %%12.1f kB", names[ i ], ( long long ) m_outputCapacities[ i ],
+                                             m_outputCapacities[ i ] * sizes[ i ] / 1024. ) << SLogger::endmsg;
+    }
+"""
+memory_FunctionBody = """
+void %(class)-s::StartMemoryMonitor( const SInputData& id ) {
+
+    m_memoryInput = id.GetType() + "." + id.GetVersion();
+    m_memoryEvents = 0;
+    for( Int_t i = 0; i < kMemoryPhases; ++i ) m_memoryGrowth[ i ] = 0;
+    m_rssStart = m_rssLast = m_rssMax = ResidentMemory();
+    m_rssAlarm = m_rssStart + 1024 * Long64_t( MemoryAlarmMB );
+}
+
+void %(class)-s::MemoryStep( MemoryPhase phase ) {
+
+    const Long64_t now = HeapUsage();
+    m_memoryGrowth[ phase ] += now - m_memoryMark;
+    m_memoryMark = now;
+}
+
+void %(class)-s::EndMemorySample( MemoryPhase phase ) {
+
+    MemoryStep( phase );
+    m_rssLast = ResidentMemory();
+    m_rssMax = std::max( m_rssMax, m_rssLast );
+    if( MemoryAlarmMB > 0 && m_rssLast > m_rssAlarm ) {
+        m_logger << WARNING << "The resident memory grew by " << ( m_rssLast - m_rssStart ) / 1024 << " MB to "
+                 << m_rssLast / 1024 << " MB in " << m_memoryEvents << " events of " << m_memoryInput << SLogger::endmsg;
+        while( m_rssAlarm < m_rssLast ) m_rssAlarm += 1024 * Long64_t( MemoryAlarmMB );
+    }
+%(capacityUpdates)s}
+
+void %(class)-s::PrintMemory() {
+
+    if( MemoryCheckInterval <= 0 ) return;
+    static const char* const phases[ kMemoryPhases ] = { "Connect", "Read", "Clear", "User", "Fill" };
+    m_rssLast = ResidentMemory();
+    m_rssMax = std::max( m_rssMax, m_rssLast );
+    m_logger << INFO << "Resident memory in " << m_memoryInput << ": " << m_rssStart / 1024 << " MB at the start, "
+             << m_rssLast / 1024 << " MB at the end, at most " << m_rssMax / 1024 << " MB" << SLogger::endmsg;
+    m_logger << INFO << "Growth of the heap while binding the branches and in every " << MemoryCheckInterval
+             << "th event:" << SLogger::endmsg;
+    for( Int_t i = 0; i < kMemoryPhases; ++i ) {
+        m_logger << INFO << TString::Format( "  %%-8s %%+10.3f MB", phases[ i ], m_memoryGrowth[ i ] / ( 1024. * 1024. ) ) << SLogger::endmsg;
+    }
+%(capacityReport)s}
+"""
+memory_Includes = """
+// ROOT include(s) for the memory monitor:
+#include <TSystem.h>
+
+// System include(s):
+#include <algorithm>
+#include <cstdlib>
+#ifdef __GLIBC__
+#include <malloc.h>
+#endif // __GLIBC__
+
+// The cycles of a unity build share these helpers
+#ifndef SFRAME_META_TOOLS_MEMORY
+#define SFRAME_META_TOOLS_MEMORY
+/// Resident memory of the process in kB
+static Long64_t ResidentMemory() {
+
+    ProcInfo_t info;
+    gSystem->GetProcInfo( &info );
+    return info.fMemResident;
+}
+
+/// Bytes allocated on the heap, or the resident memory where malloc can't tell
+static Long64_t HeapUsage() {
+
+#if defined( __GLIBC__ ) && ( __GLIBC__ > 2 || ( __GLIBC__ == 2 && __GLIBC_MINOR__ >= 33 ) )
+    const struct mallinfo2 info = mallinfo2();
+    return Long64_t( info.uordblks ) + Long64_t( info.hblkhd );
+#elif defined( __GLIBC__ )
+    const struct mallinfo info = mallinfo();
+    return Long64_t( ( unsigned int ) info.uordblks ) + Long64_t( ( unsigned int ) info.hblkhd );
+#else
+    return 1024 * ResidentMemory();
+#endif // __GLIBC__
+}
+#endif // SFRAME_META_TOOLS_MEMORY
+"""
+
+## @short Code counting the reads of the input variables
+#
+# The cycle hides every input variable of its branches struct behind a
+# ReadCounter of the same name, which the code of the cycle reads the variable
+# through. The generated code reading and copying the variables uses the ones
+# of the struct directly, so only the reads of the user code are counted. At
+# the end of the cycle the variable list is written with the variables that
+# were never read commented out.
+readCounter_HeaderIncludes = """
+// ROOT include(s) for the read counters:
+#include <TH1.h>
+
+#if !defined(__CINT__) && !defined(__CLING__)
+// The cycles of a package share the read counters
+#ifndef SFRAME_META_TOOLS_READ_COUNTER
+#define SFRAME_META_TOOLS_READ_COUNTER
+/**
+ *    @short Number of reads of an input variable
+ */
+struct ReadCounterBase {
+    ReadCounterBase() : m_name( 0 ), m_reads( 0 ) {}
+    /// Name of the variable
+    const char* m_name;
+    /// Reads of the variable since the last reset
+    mutable Long64_t m_reads;
+};
+
+/**
+ *    @short Input variable that counts its reads
+ *
+ *          Converts to the variable it watches wherever it is used, and
+ *          counts every such use. Calls to templates that need the exact type
+ *          of the variable have to convert it explicitly, like int( el_n ).
+ */
+template< typename T >
+class ReadCounter : public ReadCounterBase {
+public:
+    ReadCounter() : m_variable( 0 ) {}
+    /// Sets the variable whose reads are counted
+    void Watch( T& variable, const char* name ) { m_variable = &variable; m_name = name; }
+    /// Reads the variable
+    operator T&() const { ++m_reads; return *m_variable; }
+    /// Reads a member of the object of a pointer variable
+    T& operator->() const { ++m_reads; return *m_variable; }
+private:
+    T* m_variable;
+};
+#endif // SFRAME_META_TOOLS_READ_COUNTER
+#endif // !__CINT__ && !__CLING__
+
+"""
+readCounter_ConfigDeclarations = """
+    /// Name of the variable list written with the unread variables commented out
+    string UsedVariablesFile;
+    /// Function writing the variable list with the unread variables commented out
+    void WriteUsedVariables();
+#if !defined(__CINT__) && !defined(__CLING__)
+    // The input variables, counting their reads
+%(readCounters)s    /// The read counters of all the input variables
+    std::vector< ReadCounterBase* > m_readCounters; //!
+#endif // !__CINT__ && !__CLING__
+    /// Reads of every input variable in the whole cycle
+    std::vector< Double_t > m_cycleReads; //!
+    /// Whether the cycle read simulated input data
+    Bool_t m_readsMC; //!
+    /// Reads of the input variables, merged from all the workers
+    TH1* m_variableReads; //!
+"""
+readCounter_Declaration = """    ReadCounter< %(type)s > %(cname)s; //!
+"""
+readCounter_Watch = """    %(cname)s.Watch( %(class)s_Branches::%(cname)s, "%(cname)s" );
+    m_readCounters.push_back( &%(cname)s );
+"""
+readCounter_PropertyDeclarations = """    UsedVariablesFile = "%(file)s";
+    DeclareProperty("UsedVariablesFile", UsedVariablesFile );
+    m_readsMC = kFALSE;
+    m_variableReads = 0;
+%(watches)s    m_cycleReads.assign( m_readCounters.size(), 0. );
+"""
+readCounter_InputDataSetup = """    // The reads of the input variables, merged from all the workers
+    m_variableReads = Book( TH1D( "VariableReads", "Reads of the input variables;;Reads", m_readCounters.size(), 0., m_readCounters.size() ), "ReadCounters" );
+    for( size_t i = 0; i < m_readCounters.size(); ++i ) {
+        m_readCounters[ i ]->m_reads = 0;
+        m_variableReads->GetXaxis()->SetBinLabel( i + 1, m_readCounters[ i ]->m_name );
+    }
+"""
+readCounter_InputDataEnd = """
+    // Store the reads of this process, for merging
+    for( size_t i = 0; i < m_readCounters.size(); ++i ) m_variableReads->SetBinContent( i + 1, m_readCounters[ i ]->m_reads );
+"""
+readCounter_MasterInputDataEnd = """
+    // The reads merged from all the workers
+    try {
+        TH1* reads = Retrieve< TH1 >( "VariableReads", "ReadCounters" );
+        for( size_t i = 0; i < m_cycleReads.size(); ++i ) m_cycleReads[ i ] += reads->GetBinContent( i + 1 );
+        if( ! id.GetType().Contains( "data", TString::kIgnoreCase ) ) m_readsMC = kTRUE;
+    } catch( const SError& ) {
+        m_logger << WARNING << "No read counters found for the input data" << SLogger::endmsg;
+    }
+"""
+readCounter_CycleEnd = """
+    WriteUsedVariables();
+"""
+readCounter_FunctionBody = """
+void %(class)-s::WriteUsedVariables() {
+
+    if( UsedVariablesFile.empty() ) return;
+    std::ofstream file( UsedVariablesFile.c_str() );
+    if( ! file ) {
+        m_logger << ERROR << "Could not write the used variables into " << UsedVariablesFile << SLogger::endmsg;
+        return;
+    }
+    size_t used = 0;
+    for( size_t i = 0; i < m_cycleReads.size(); ++i ) if( m_cycleReads[ i ] > 0 ) ++used;
+    file << "// The input variables of %(class)s, with the ones that were not read commented out" << std::endl;
+    file << "// " << used << " of " << m_cycleReads.size() << " variables were read" << std::endl;
+    if( ! m_readsMC ) file << "// No simulated input data was read, so the MC variables are kept" << std::endl;
+    // The array sizes of the arrays that were read are kept as well
+%(declarations)s
+    m_logger << INFO << used << " of " << m_cycleReads.size() << " input variables were read, the variable list "
+             << "without the others is " << UsedVariablesFile << SLogger::endmsg;
+}
+"""
+readCounter_Includes = """
+// System include(s) for the read counters:
+#include <fstream>
+"""
+
+## @short Code reading the flat variables a block of entries at a time
+#
+# The variables of basic types are read branch by branch for a block of
+# entries, into one buffer per variable, before the first event of the block.
+# The values are copied from whole baskets read with the bulk I/O of ROOT,
+# or read entry by entry where that isn't possible.
+# ExecuteBlock gets the buffers for vectorizable loops, and ExecuteEvent still
+# sees the values of its entry in the usual variables.
+block_Struct = """
+#if !defined(__CINT__) && !defined(__CLING__)
+/**
+ *    @short Flat input variables of %(class)s for a block of entries
+ *
+ *          One contiguous buffer per variable, with the values of all the
+ *          entries of the block, for the loops of ExecuteBlock.
+ */
+struct %(class)-s_Block {
+
+    %(class)-s_Block() : first( 0 ), size( 0 ) {}
+
+    /// The first entry of the block in the input tree
+    Long64_t first;
+    /// Number of entries in the block
+    Int_t size;
+
+%(blockBuffers)s
+}; // struct %(class)-s_Block
+#endif // !__CINT__ && !__CLING__
+"""
+block_Buffer = """    std::vector< %(type)s > %(cname)s;
+"""
+block_HeaderIncludes = """
+#if !defined(__CINT__) && !defined(__CLING__)
+// ROOT include(s) for reading blocks of entries in bulk:
+#include <RVersion.h>
+#include <TBufferFile.h>
+#include <TMath.h>
+#include <cstring>
+#endif // !__CINT__ && !__CLING__
+
+"""
+block_Bindings = """
+    /// Binds a variable that is read a block of entries at a time, instead of with the other bound branches
+    template< typename T >
+    void BindBlockBranch( size_t slot, const char* name, T& variable ) throw( SError ) {
+        TBranch* branch = BindAddress( slot, name, &variable );
+        if( branch ) ( m_selectionSlots[ slot ] ? m_selectionBranches : m_boundBranches ).pop_back();
+        if( m_blockBranches.size() <= slot ) {
+            m_blockBranches.resize( slot + 1, 0 );
+            m_bulkFirst.resize( slot + 1 );
+            m_bulkValues.resize( slot + 1 );
+        }
+        m_blockBranches[ slot ] = branch;
+        m_bulkFirst[ slot ] = kNoBasket;
+        m_bulkValues[ slot ].clear();
+    }
+
+    /// Reads the entries of a block into the buffer of a variable bound by BindBlockBranch
+    template< typename T >
+    void ReadBlockBranch( size_t slot, T& variable, std::vector< T >& buffer, Long64_t first, Int_t size ) throw( SError ) {
+        buffer.resize( size );
+        TBranch* branch = slot < m_blockBranches.size() ? m_blockBranches[ slot ] : 0;
+        if( ! branch ) return;
+        // The values are copied from whole baskets read in bulk
+        Int_t done = 0;
+        while( done < size && ReadBulkBasket( slot, branch, sizeof( T ), first + done ) ) {
+            const Long64_t offset = first + done - m_bulkFirst[ slot ];
+            const Long64_t count = Long64_t( m_bulkValues[ slot ].size() / sizeof( T ) );
+            const Int_t copied = Int_t( std::min( Long64_t( size - done ), count - offset ) );
+            std::memcpy( &buffer[ done ], &m_bulkValues[ slot ][ offset * sizeof( T ) ], copied * sizeof( T ) );
+            done += copied;
+        }
+        // The branches that can't be read in bulk are read entry by entry
+        for( Int_t i = done; i < size; ++i ) {
+            if( branch->GetEntry( first + i ) < 0 ) {
+                throw SError( ( TString( "Failed to read branch " ) + branch->GetName() ).Data(), SError::SkipFile );
+            }
+            buffer[ i ] = variable;
+        }
+    }
+
+    /// Makes the basket of a branch with an entry the one of its slot, false if it can't be read in bulk
+    bool ReadBulkBasket( size_t slot, TBranch* branch, size_t typeSize, Long64_t entry ) {
+        Long64_t& basketFirst = m_bulkFirst[ slot ];
+        if( basketFirst == kNoBulkRead || ! m_bulkReads ) return false;
+        if( basketFirst >= 0 && entry >= basketFirst &&
+            entry < basketFirst + Long64_t( m_bulkValues[ slot ].size() / typeSize ) ) return true;
+#if ROOT_VERSION_CODE >= ROOT_VERSION( 6, 16, 0 )
+        // Only single leaves of the type of the variable are read in bulk,
+        // starting at the first entry of a basket
+        TObjArray* leaves = branch->GetListOfLeaves();
+        if( leaves->GetEntriesFast() == 1 &&
+            static_cast< TLeaf* >( leaves->UncheckedAt( 0 ) )->GetLenType() == Int_t( typeSize ) ) {
+            const Long64_t basket = TMath::BinarySearch( Long64_t( branch->GetWriteBasket() + 1 ), branch->GetBasketEntry(), entry );
+            const Long64_t start = basket >= 0 ? branch->GetBasketEntry()[ basket ] : 0;
+            const Int_t count = branch->GetBulkRead().GetBulkEntries( start, m_bulkBuffer );
+            if( count > 0 && entry < start + count ) {
+                const char* values = m_bulkBuffer.GetCurrent();
+                m_bulkValues[ slot ].assign( values, values + count * typeSize );
+                basketFirst = start;
+                return true;
+            }
+        }
+#endif // ROOT_VERSION_CODE
+        basketFirst = kNoBulkRead;
+        return false;
+    }
+
+    /// The current entry of the input tree
+    Long64_t InputEntry() const { return m_inputTree ? m_inputTree->GetReadEntry() : -1; }
+    /// Number of entries of the input tree
+    Long64_t InputEntries() const { return m_inputTree ? m_inputTree->GetEntries() : 0; }
+    /// The first entry after the cluster of the input tree with an entry
+    Long64_t InputClusterEnd( Long64_t entry ) {
+        if( ! m_inputTree ) return entry + 1;
+        TTree::TClusterIterator clusters = m_inputTree->GetClusterIterator( entry );
+        clusters();
+        return clusters.GetNextEntry();
+    }
+    /// The read cache of the input tree, if it has one
+    TFileCacheRead* InputCache() const {
+        TFile* file = m_inputTree ? m_inputTree->GetCurrentFile() : 0;
+        return file ? file->GetCacheRead( m_inputTree ) : 0;
+    }
+
+    /// Whether the blocks are read in bulk where possible, switched off to compare in the benchmark
+    bool m_bulkReads;
+"""
+block_Members = """    /// The branches of the variables read a block of entries at a time, by their slot
+    std::vector< TBranch* > m_blockBranches;
+    /// Marks a slot without a basket, or whose branch can't be read in bulk
+    static const Int_t kNoBasket = -1, kNoBulkRead = -2;
+    /// The first entry of the basket read in bulk for every slot, and its values
+    std::vector< Long64_t > m_bulkFirst;
+    std::vector< std::vector< char > > m_bulkValues;
+    /// Buffer that the baskets are read into in bulk
+    struct BulkBuffer : public TBufferFile {
+        BulkBuffer() : TBufferFile( TBuffer::kWrite, 32 * 1024 ) {}
+    } m_bulkBuffer;
+"""
+block_ConfigDeclarations = """
+    /// Entries read at a time into the buffers of the flat input variables
+    int BlockSize;
+#if !defined(__CINT__) && !defined(__CLING__)
+    /// Function for vectorizable loops over a block of entries, called before the events of the block
+    void ExecuteBlock( const %(class)s_Block& block ) throw( SError );
+    /// Function reading the block of entries starting at first
+    void ReadBlock( Long64_t first ) throw( SError );
+    /// The flat input variables of the current block of entries
+    %(class)s_Block m_block; //!
+#endif // !__CINT__ && !__CLING__
+    /// Index of the current event in the current block
+    Int_t BlockIndex() const { return m_blockIndex; }
+    /// Index of the current event in the current block
+    Int_t m_blockIndex; //!
+"""
+block_PropertyDeclarations = """    BlockSize = %(size)d;
+    DeclareProperty("BlockSize", BlockSize );
+    m_blockIndex = 0;
+    m_bulkReads = true;
+"""
+block_Setup = """    // The block of the previous file is not valid anymore
+    m_block.size = 0;
+"""
+block_Reading = """    // The flat variables are read a block of entries at a time
+    const Long64_t entry = InputEntry();
+    if( entry < m_block.first || entry >= m_block.first + m_block.size ) {
+        ReadBlock( entry );
+        ExecuteBlock( m_block );
+    }
+    m_blockIndex = Int_t( entry - m_block.first );
+%(unpacking)s"""
+block_Unpacking = """    %(branches)s%(cname)s = m_block.%(cname)s[ m_blockIndex ];
+"""
+block_Read = """    ReadBlockBranch( %(slot)d, %(branches)s%(cname)s, m_block.%(cname)s, m_block.first, m_block.size );
+"""
+block_Execute = """void %(class)-s::ExecuteBlock( const %(class)s_Block& block ) throw( SError ) {
+
+    // Vectorizable loops over the entries of the block go here, like
+    //
+    //   for( Int_t i = 0; i < block.size; ++i ) m_values[ i ] = block.%(example)s[ i ] * 2;
+    //
+    // with ExecuteEvent using the result of its entry, m_values[ BlockIndex() ].
+    // A block doesn't go past the PROOF packet or the entries selected for the
+    // job, but events skipped by the selection are still in it, so only compute
+    // results per entry here.
+
+    return;
+
+}
+
+"""
+block_FunctionBody = """
+void %(class)-s::ReadBlock( Long64_t first ) throw( SError ) {
+
+    m_block.first = first;
+    // The block ends with the entries that this process reads, which TTree::Process
+    // and the PROOF packets set as the range of the tree cache
+    Long64_t end = InputEntries();
+    TTreeCache* cache = dynamic_cast< TTreeCache* >( InputCache() );
+    if( cache && Long64_t( cache->GetEntryMax() ) > first ) end = std::min( end, Long64_t( cache->GetEntryMax() ) );
+    // The block doesn't go past the cluster of its first entry either, so that
+    // the baskets of all its branches are read together
+    end = std::min( end, InputClusterEnd( first ) );
+    m_block.size = Int_t( std::min( Long64_t( std::max( BlockSize, 1 ) ), end - first ) );
+%(blockReads)s}
+"""
+block_Includes = """
+// System include(s) for reading blocks of entries:
+#include <algorithm>
+
+// ROOT include(s) for reading blocks of entries:
+#include <TTreeCache.h>
+"""
+
+## @short Code of the benchmark driver, running the event loop without sframe_main
+#
+# The driver is a friend of the cycle, which hands the input tree to the cycle
+# and calls BeginInputFile and ExecuteEvent directly, without the input data,
+# the output and the configuration of SFrame.
+benchmark_ConfigDeclarations = """
+    /// The benchmark driver, running the cycle without sframe_main
+    friend struct %(class)s_Benchmark;
+    /// The input tree of the benchmark driver, or the one of SFrame
+    TTree* InputTree() { return m_benchmarkTree ? m_benchmarkTree : GetInputTree( InTreeName.c_str() ); }
+    /// Input tree given by the benchmark driver
+    TTree* m_benchmarkTree; //!
+"""
+benchmark_PropertyDeclarations = """    m_benchmarkTree = 0;
+"""
+benchmark_Body = """/**
+ *    @short Benchmark of the event loop of %(class)s
+ *
+ *          Runs BeginInputFile and ExecuteEvent over the first entries of a
+ *          file, without sframe_main. The first pass warms up the caches,
+ *          the passes after it are timed.
+ */
+struct %(class)s_Benchmark {
+
+    /// Runs the events once, returning the real time and the bytes read from the file
+    static Double_t Pass( %(class)s& cycle, TFile* file, TTree* tree, const SInputData& id, Long64_t entries,
+                          Long64_t& bytes, Long64_t& skipped ) {
+        const Long64_t start = file->GetBytesRead();
+        skipped = 0;
+        TStopwatch watch;
+        watch.Start();
+        for( Long64_t entry = 0; entry < entries; ++entry ) {
+            tree->LoadTree( entry );
+            try {
+                cycle.ExecuteEvent( id, 1. );
+            } catch( const SError& error ) {
+                if( error.request() != SError::SkipEvent ) throw;
+                ++skipped;
+            }
+        }
+        watch.Stop();
+        bytes = file->GetBytesRead() - start;
+        return watch.RealTime();
+    }
+
+    /// Runs the benchmark with the arguments of the command line
+    static int Run( int argc, char* argv[] ) {
+
+        if( argc < 2 ) {
+            std::cerr << "Usage: " << argv[ 0 ] << " FILE [ENTRIES] [PASSES] [TREE] [data|mc]" << std::endl;
+            return 1;
+        }
+        %(class)s cycle;
+        const Long64_t maxEntries = argc > 2 ? atoll( argv[ 2 ] ) : 10000;
+        const Int_t passes = std::max( argc > 3 ? atoi( argv[ 3 ] ) : 5, 1 );
+        const TString treeName = argc > 4 ? argv[ 4 ] : cycle.InTreeName.c_str();
+        cycle.isdata = argc > 5 && std::string( argv[ 5 ] ) == "data";
+
+        TFile* file = TFile::Open( argv[ 1 ] );
+        if( ! file || file->IsZombie() ) {
+            std::cerr << "Could not open " << argv[ 1 ] << std::endl;
+            return 1;
+        }
+        TTree* tree = dynamic_cast< TTree* >( file->Get( treeName ) );
+        if( ! tree ) {
+            std::cerr << "No tree " << treeName << " in " << argv[ 1 ] << std::endl;
+            return 1;
+        }
+        const Long64_t entries = std::min( tree->GetEntries(), maxEntries );
+
+        SInputData id( "Benchmark" );
+        id.SetType( cycle.isdata ? "data" : "mc" );
+        id.SetVersion( "Benchmark" );
+        cycle.m_benchmarkTree = tree;
+        cycle.BeginInputFile( id );
+
+        // The first pass warms up the caches
+        Long64_t bytes = 0, skipped = 0;
+        Pass( cycle, file, tree, id, entries, bytes, skipped );
+        std::vector< Double_t > times;
+        for( Int_t i = 0; i < passes; ++i ) times.push_back( Pass( cycle, file, tree, id, entries, bytes, skipped ) );
+        std::sort( times.begin(), times.end() );
+
+        const Double_t events = std::max( entries, Long64_t( 1 ) );
+        std::cout << "%(class)s: " << entries << " entries of " << argv[ 1 ] << ", " << skipped << " skipped, "
+                  << passes << " passes" << std::endl;
+        std::cout << TString::Format( "  %%10.1f ns/event fastest pass", 1e9 * times.front() / events ) << std::endl;
+        std::cout << TString::Format( "  %%10.1f ns/event median pass", 1e9 * times[ times.size() / 2 ] / events ) << std::endl;
+        std::cout << TString::Format( "  %%10.1f bytes/event read from the file", bytes / events ) << std::endl;
+%(blockComparison)s        file->Close();
+        return 0;
+    }
+
+}; // struct %(class)s_Benchmark
+"""
+benchmark_BlockComparison = """
+        // The same passes with the blocks read entry by entry, for the gain of the bulk reads
+        cycle.m_bulkReads = false;
+        cycle.BeginInputFile( id );
+        Pass( cycle, file, tree, id, entries, bytes, skipped );
+        times.clear();
+        for( Int_t i = 0; i < passes; ++i ) times.push_back( Pass( cycle, file, tree, id, entries, bytes, skipped ) );
+        std::sort( times.begin(), times.end() );
+        std::cout << "Without the bulk reads of the blocks:" << std::endl;
+        std::cout << TString::Format( "  %%10.1f ns/event fastest pass", 1e9 * times.front() / events ) << std::endl;
+        std::cout << TString::Format( "  %%10.1f ns/event median pass", 1e9 * times[ times.size() / 2 ] / events ) << std::endl;
+"""
+benchmark_Frame = """// Benchmark of the event loop of %(fullClassName)s, without sframe_main
+//
+// Compile it in the directory of the package, after the package itself, with
+//
+//   g++ -O2 -o %(class)s_Benchmark %(benchmarkName)s -I. -I$SFRAME_DIR `root-config --cflags --libs` -L$SFRAME_LIB_PATH -lSFrameCore -l%(analysis)s
+//
+// and run it with
+//
+//   ./%(class)s_Benchmark FILE [ENTRIES] [PASSES] [TREE] [data|mc]
+//
+// Only BeginInputFile and ExecuteEvent are called. Nothing is booked or
+// written, so code that needs the output of SFrame doesn't work here.
+
+// ROOT include(s):
+#include <TFile.h>
+#include <TTree.h>
+#include <TStopwatch.h>
+#include <TString.h>
+
+// SFrame include(s):
+#include "core/include/SInputData.h"
+#include "core/include/SError.h"
+
+// Local include(s):
+#include \"%(header)s\"
+
+// System include(s):
+#include <algorithm>
+#include <cstdlib>
+#include <iostream>
+#include <string>
+#include <vector>
+
+%(body)s
+int main( int argc, char* argv[] ) {
+
+    try {
+        return %(fullClassName)s_Benchmark::Run( argc, argv );
+    } catch( const SError& error ) {
+        std::cerr << error.what() << std::endl;
+        return 1;
+    }
+}
+"""
+
+## @short Code processing the systematic variations of the input variables
+#
+# The branches of all the variations are read once per event. The analysis is
+# then run once per variation, with the values of the variation exchanged into
+# the nominal input variables, and the output variables exchanged with the
+# ones of the output tree of the variation. SFrame fills all the output trees
+# after ExecuteEvent, when the cycle holds the nominal variables again.
+variation_HeaderIncludes = """
+// STL include(s) for the systematic variations:
+#include <algorithm>
+
+"""
+variation_OutputStruct = """
+#if !defined(__CINT__) && !defined(__CLING__)
+/**
+ *    @short Output variables of %(class)s
+ *
+ *          The cycle holds the output variables of the nominal variation,
+ *          and one copy of this struct for every systematic variation, which
+ *          is declared to the output tree of the variation.
+ */
+struct %(class)-s_Output {
+
+%(outputVariableDeclarations)s
+    /// Exchanges the values of the output variables with the ones of another variation
+    void SwapOutputVariables( %(class)s_Output& other ) {
+%(outputSwaps)s    }
+
+}; // struct %(class)-s_Output
+#endif // !__CINT__ && !__CLING__
+"""
+variation_OutputSwap = """        std::swap( out_%(cname)s, other.out_%(cname)s );
+"""
+variation_BranchesOutputBase = """ : public %(class)s_Output"""
+variation_ConfigDeclarations = """
+    /// Function switching the variables to the ones of a variation, 0 being the nominal one
+    void SelectVariation( size_t variation );
+    /// Function exchanging the values of the nominal input variables and the ones of a systematic variation
+    void SwapVariation( size_t variation );
+    /// Function checking which systematic variations the tree of a new input file has
+    void CheckVariations( TTree* tree );
+    /// Name of a variation
+    static const char* VariationName( size_t variation );
+    /// Name of the variation that the event is processed for
+    const char* VariationName() const { return VariationName( m_variation ); }
+    /// Whether the event is processed for the nominal values
+    bool IsNominal() const { return ! m_variation; }
+    /// Whether the variation that the event is processed for passed the selection
+    bool PassedSelection() const { return m_variationSelected[ m_variation ]; }
+    /// The variation that the event is processed for
+    size_t m_variation; //!
+    /// The variation whose values the input variables hold
+    size_t m_variationValues; //!
+    /// Whether the branches of every variation are in the current input file
+    std::vector< bool > m_variationInFile; //!
+    /// Whether every variation passed the selection in the current event
+    std::vector< bool > m_variationSelected; //!
+#if !defined(__CINT__) && !defined(__CLING__)
+    /// Number of variations, including the nominal one
+    enum { kVariations = %(nVariations)d };
+#endif // !__CINT__ && !__CLING__
+"""
+variation_OutputDeclarations = """    /// Name of the output tree of the nominal variation, the others add their names to it
+    string OutTreeName;
+    /// Function returning the name of the output tree of a variation
+    TString OutputTreeName( size_t variation ) const;
+#if !defined(__CINT__) && !defined(__CLING__)
+    /// The output variables of a variation, the ones of the cycle for the nominal one
+    %(class)s_Output& VariationOutput( size_t variation );
+    /// The output variables of the systematic variations
+    std::vector< %(class)s_Output > m_variationOutputs; //!
+#endif // !__CINT__ && !__CLING__
+"""
+variation_PropertyDeclarations = """    m_variation = 0;
+    m_variationValues = 0;
+    m_variationInFile.assign( kVariations, true );
+    m_variationSelected.assign( kVariations, true );
+"""
+variation_OutputPropertyDeclarations = """    OutTreeName = "%(outtree)s";
+    DeclareProperty("OutTreeName", OutTreeName );
+    // The output trees keep the addresses of these variables
+    m_variationOutputs.resize( kVariations - 1 );
+"""
+variation_Setup = """    CheckVariations( %(inputTree)s );
+"""
+variation_Restore = """    // Undo the variation left selected by a skipped event
+    SelectVariation( 0 );
+"""
+## @short Code evaluating the selection for every systematic variation
+#
+# The event is kept if any of the variations passes the selection, and
+# PassedSelection() tells the user code whether the current one did.
+variation_SelectionReading = """    // The selection: %(selection)s
+    ReadSelectionBranches();
+    bool selected = false;
+    for( size_t i = 0; i < kVariations; ++i ) {
+        SelectVariation( i );
+        m_variationSelected[ i ] = ( %(expression)s );
+        selected = selected || m_variationSelected[ i ];
+    }
+    SelectVariation( 0 );
+    if( ! selected ) {
+%(rejection)s        throw SError( SError::SkipEvent );
+    }
+"""
+variation_Loop = """    // The event is processed once for every variation, the nominal one last.
+    // VariationName() tells which one the variables hold.
+    for( size_t i = 1; i <= kVariations; ++i ) {
+        SelectVariation( i %% kVariations );
+%(processing)s%(variationEnd)s    }
+"""
+variation_OutputLoop = """    // Every variation has its own output tree, with the names of the nominal branches
+    for( size_t variation = 0; variation < kVariations; ++variation ) {
+        %(class)s_Output& output = VariationOutput( variation );
+        const TString treeName = OutputTreeName( variation );
+%(declarations)s    }
+"""
+variation_DeclareOutputVariables_declaration = """
+#if !defined(__CINT__) && !defined(__CLING__)
+    /// Function to declare the output variables of a variation to its output tree
+    virtual void DeclareOutputVariables( const SInputData&, %(class)s_Output& output, const char* treeName ) throw( SError );
+#endif // !__CINT__ && !__CLING__
+    """
+variation_DeclareOutputVariables_body = """
+void %(class)-s::DeclareOutputVariables( const SInputData&, %(class)s_Output& output, const char* treeName ) throw( SError ){
+
+%(outputVariableConnections)s
+}
+"""
+variation_DeclareOutputVariables_call = "    DeclareOutputVariables( id, output, treeName );\n"
+variation_DeclareMCOutputVariables_declaration = """
+#if !defined(__CINT__) && !defined(__CLING__)
+    /// Function to declare the MC-only output variables of a variation to its output tree
+    virtual void DeclareMCOutputVariables( const SInputData&, %(class)s_Output& output, const char* treeName ) throw( SError );
+#endif // !__CINT__ && !__CLING__
+    """
+variation_DeclareMCOutputVariables_body = """
+void %(class)-s::DeclareMCOutputVariables( const SInputData&, %(class)s_Output& output, const char* treeName ) throw( SError ){
+
+%(mcOutputVariableConnections)s
+}
+"""
+variation_DeclareMCOutputVariables_call = "    if( !isdata ) DeclareMCOutputVariables( id, output, treeName );\n"
+variation_Case = """    case %(index)d: // %(variation)s
+%(swaps)s        break;
+"""
+variation_Swap = """        std::swap( %(nominal)s, %(variant)s );
+"""
+variation_ArraySwap = """        std::swap_ranges( %(nominal)s, %(nominal)s + %(size)d, %(variant)s );
+"""
+variation_Check = """    if( ! tree->GetBranch( "%(name)s" ) ) m_variationInFile[ %(index)d ] = false;
+"""
+variation_SelectOutput = """    // The output variables of the cycle are the ones of the selected variation
+    if( m_variation ) SwapOutputVariables( VariationOutput( m_variation ) );
+    if( variation ) SwapOutputVariables( VariationOutput( variation ) );
+"""
+variation_FunctionBody = """
+void %(class)-s::SelectVariation( size_t variation ) {
+
+    if( variation == m_variation ) return;
+%(selectOutput)s    // A variation missing in the input file keeps the nominal values
+    const size_t values = m_variationInFile[ variation ] ? variation : 0;
+    if( values != m_variationValues ) {
+        if( m_variationValues ) SwapVariation( m_variationValues );
+        if( values ) SwapVariation( values );
+        m_variationValues = values;
+    }
+    m_variation = variation;
+}
+
+void %(class)-s::SwapVariation( size_t variation ) {
+
+    switch( variation ) {
+%(cases)s    default:
+        break;
+    }
+}
+
+void %(class)-s::CheckVariations( TTree* tree ) {
+
+    m_variationInFile.assign( kVariations, true );
+%(checks)s    for( size_t variation = 1; variation < kVariations; ++variation ) {
+        if( ! m_variationInFile[ variation ] ) {
+            m_logger << ( isdata ? DEBUG : WARNING ) << "The input file has no branches of the variation "
+                     << VariationName( variation ) << ", it gets the nominal values" << SLogger::endmsg;
+        }
+    }
+}
+
+const char* %(class)-s::VariationName( size_t variation ) {
+
+    static const char* const names[] = {
+%(names)s
+    };
+    return variation < kVariations ? names[ variation ] : "";
+}
+"""
+variation_OutputFunctionBody = """
+TString %(class)-s::OutputTreeName( size_t variation ) const {
+
+    TString name( OutTreeName.c_str() );
+    if( variation ) name += TString( "_" ) + VariationName( variation );
+    return name;
+}
+
+%(class)s_Output& %(class)-s::VariationOutput( size_t variation ) {
+
+    if( ! variation ) return *this;
+    return m_variationOutputs[ variation - 1 ];
+}
+"""
+variation_Includes = """
+// System include(s) for the systematic variations:
+#include <algorithm>
+"""
+
 ## @short Template for a new LinkDef file
 #
 LinkDef = """// Dear emacs, this is -*- c++ -*-
@@ -83,6 +83,66 @@ def GetTreeName( rootfile, default="TreeName"):
     
     return treename
     
+## @short Function to get the array dimensions of a leaf
+#
+# Returns the list of the dimensions of the leaf and the name of its counter.
+# The first dimension of a variable-length array is the largest value of the
+# counter in the file. Leaves that are not arrays give ( [], "" ).
+#
+# @param leaf The TLeaf to look at
+def GetLeafShape( leaf ):
+    count = leaf.GetLeafCount()
+    if not count and leaf.GetLenStatic() <= 1:
+        return [], ""
+    import re
+    # The title of the leaf has the dimensions, like x[n][4]
+    shape = [ int( n ) for n in re.findall( "\[([0-9]+)\]", leaf.GetTitle() ) ]
+    if reduce( lambda a, b: a*b, shape, 1 ) != leaf.GetLenStatic():
+        shape = [ n for n in [ leaf.GetLenStatic() ] if n > 1 ]
+    if not count:
+        return shape, ""
+    return [ max( count.GetMaximum(), 1 ) ] + shape, count.GetName()
+
+## @short Function to tell whether a branch holds a split object
+#
+# Split collections, like a TClonesArray or a vector of objects, are not
+# counted, their data members would have to be read into arrays.
+#
+# @param branch The TBranch to look at
+def IsSplitObject( branch ):
+    if not isinstance( branch, ROOT.TBranchElement ) or not branch.GetListOfBranches().GetEntries():
+        return False
+    classname = branch.GetClassName()
+    return classname != "TClonesArray" and not classname.startswith( "vector<" )
+
+## @short Function to construct the Variables of the data members of a split object
+#
+# Every sub-branch that is not split any further becomes one variable, named
+# like the sub-branch. Members of basic types are read into plain variables,
+# members that are objects themselves are read through pointers.
+#
+# The sub-branches of an object whose branch name has no trailing dot are
+# named after the members alone, so their names are prefixed with the name of
+# the object, like el.pt, which ROOT finds as well. Otherwise the members of
+# two such objects would get the same names.
+#
+# @param branch The TBranchElement of the split object
+# @param prefix The name of the top-level object the branch belongs to
+def ReadMemberVars( branch, prefix = "" ):
+    varlist = []
+    prefix = ( prefix or branch.GetName() ).rstrip( "." ) + "."
+    for sub in TCollIter( branch.GetListOfBranches() ):
+        name = sub.GetName()
+        if not name.startswith( prefix ):
+            name = prefix + name
+        if sub.GetListOfBranches().GetEntries():
+            varlist += ReadMemberVars( sub, prefix )
+            continue
+        for leaf in TCollIter( sub.GetListOfLeaves() ):
+            pointer = bool( ROOT.TClass.GetClass( leaf.GetTypeName() ) )
+            varlist.append( Variable( name=name, typename=leaf.GetTypeName(), pointer=pointer, title=leaf.GetTitle(), member=True ) )
+    return varlist
+
 ## @short Function to construct a list of Variable instances from a TTree
 #
 # This function reads a TTree from a rootfile and constructs a list of
@@ -91,7 +151,8 @@ def GetTreeName( rootfile, default="TreeName"):
 #
 # @param rootfile Path of the rootfile to read
 # @param treename Name of the TTree to use
-def ReadVars(rootfile, treename ):
+# @param decompose Read the data members of split objects instead of whole objects
+def ReadVars(rootfile, treename, decompose=False ):
     """
     Reads a list of variables from a root-file into a structured 
     format. From there they can be used to create the declarations and connect
@@ -119,9 +180,21 @@ def ReadVars(rootfile, treename ):
     namelength=0
     typelength=0
     for branch in TCollIter( tree.GetListOfBranches() ):
+        if decompose and IsSplitObject( branch ):
+            for var in ReadMemberVars( branch ):
+                varlist.append( var )
+                namelength=max(namelength,var.namelength)
+                typelength=max(typelength,var.typelength)
+            continue
         for leaf in TCollIter( branch.GetListOfLeaves() ):
             pointer = type( leaf ) in (ROOT.TLeafElement, ROOT.TLeafObject)
-            var = Variable( name=leaf.GetName(),typename=leaf.GetTypeName(),pointer=pointer,title=leaf.GetTitle())
+            shape, count = [], ""
+            title = leaf.GetTitle()
+            if not pointer:
+                shape, count = GetLeafShape( leaf )
+                if count:
+                    title = "[%s]" % count
+            var = Variable( name=leaf.GetName(),typename=leaf.GetTypeName(),pointer=pointer,title=title,shape=shape,count=count)
             varlist.append( var )
             namelength=max(namelength,var.namelength)
             typelength=max(typelength,var.typelength)
@@ -145,4 +218,146 @@ def GetNEvents(rootfile,treename):
         print >>sys.stderr, "Could not get tree \"%s\"" % treename
         f.Close()
         return 0
-    return tree.GetEntries()
+    nevents = tree.GetEntries()
+    f.Close()
+    return nevents
+
+## @short Function to get the size of a TTree in a rootfile
+#
+# Returns a tuple of the number of entries and the number of compressed bytes
+# of the tree. Both are 0 if the tree cannot be read.
+#
+# @param rootfile Path of the rootfile to read
+# @param treename Name of the TTree to use
+def GetTreeInfo( rootfile, treename ):
+    if not ROOT:
+        return ( 0, 0 )
+    f = ROOT.TFile.Open( rootfile )
+    if not f:
+        print >>sys.stderr, "Could not open root file \"%s\"" % rootfile
+        return ( 0, 0 )
+    tree = f.Get( treename )
+    if not tree:
+        print >>sys.stderr, "Could not get tree \"%s\"" % treename
+        f.Close()
+        return ( 0, 0 )
+    info = ( tree.GetEntries(), tree.GetZipBytes() )
+    f.Close()
+    return info
+
+## @short Function to get the cluster boundaries of a TTree in a rootfile
+#
+# The baskets of all branches of a tree are flushed together every AutoFlush
+# entries, forming clusters. Splitting the entries of a file between jobs at
+# cluster boundaries makes sure that no basket has to be read by two jobs.
+# Returns the sorted list of the first entries of all clusters, followed by
+# the number of entries. If the tree cannot be read an empty list is returned.
+# Without cluster information every entry is a boundary. These are returned as
+# an xrange, so that the splitting points are found arithmetically, without a
+# list of all the entries of the tree.
+#
+# @param rootfile Path of the rootfile to read
+# @param treename Name of the TTree to use
+def GetClusterBoundaries( rootfile, treename ):
+    if not ROOT:
+        return []
+    f = ROOT.TFile.Open( rootfile )
+    if not f:
+        print >>sys.stderr, "Could not open root file \"%s\"" % rootfile
+        return []
+    tree = f.Get( treename )
+    if not tree:
+        print >>sys.stderr, "Could not get tree \"%s\"" % treename
+        f.Close()
+        return []
+    nentries = tree.GetEntries()
+    boundaries = []
+    if hasattr( tree, "GetClusterIterator" ):
+        it = tree.GetClusterIterator( 0 )
+        start = it()
+        while start < nentries:
+            boundaries.append( start )
+            start = it()
+    elif tree.GetAutoFlush() > 0:
+        # Older ROOT versions only know about a fixed cluster size
+        boundaries = range( 0, nentries, tree.GetAutoFlush() )
+    else:
+        print >>sys.stderr, "WARNING: No cluster information for tree \"%s\" in \"%s\"" % ( treename, rootfile )
+        f.Close()
+        return xrange( nentries + 1 )
+    f.Close()
+    return boundaries + [ nentries ]
+
+## @short Function to get the sizes per entry of all the branches of a TTree
+#
+# Returns a dictionary from the names of the branches, including the sub-branches,
+# to a tuple of the average uncompressed and compressed bytes per entry. The
+# dictionary is empty if the tree cannot be read or has no entries.
+#
+# @param rootfile Path of the rootfile to read
+# @param treename Name of the TTree to use
+def GetBranchSizes( rootfile, treename ):
+    sizes = {}
+    if not ROOT:
+        return sizes
+    f = ROOT.TFile.Open( rootfile )
+    if not f:
+        print >>sys.stderr, "Could not open root file \"%s\"" % rootfile
+        return sizes
+    tree = f.Get( treename )
+    if not tree:
+        print >>sys.stderr, "Could not get tree \"%s\"" % treename
+        f.Close()
+        return sizes
+    entries = float( tree.GetEntries() )
+    branches = list( TCollIter( tree.GetListOfBranches() ) )
+    while entries and branches:
+        branch = branches.pop()
+        sizes[ branch.GetName() ] = ( branch.GetTotBytes( "*" ) / entries, branch.GetZipBytes( "*" ) / entries )
+        branches += list( TCollIter( branch.GetListOfBranches() ) )
+    f.Close()
+    return sizes
+
+# Helper for GetTreeInfoList. Pool.map can only pass one argument.
+def _GetTreeInfo( args ):
+    return GetTreeInfo( *args )
+
+## @short Function to get the sizes of a TTree in many rootfiles in parallel
+#
+# Opening tens of thousands of files one after the other takes a long time, most
+# of which is spent waiting for the file system. This function reads the numbers
+# of entries and compressed bytes with a pool of processes instead.
+# The returned list of tuples has the same order as the list of files.
+#
+# @param rootfiles List of paths of the rootfiles to read
+# @param treename Name of the TTree to use
+# @param nproc Number of parallel processes. Defaults to the number of cores.
+def GetTreeInfoList( rootfiles, treename, nproc=0 ):
+    """
+    Get the number of entries and compressed bytes of the tree named treename for
+    every file in rootfiles. Files that cannot be read give 0 for both.
+    """
+    if not ROOT:
+        return [ ( 0, 0 ) ] * len( rootfiles )
+    
+    import multiprocessing
+    if not nproc:
+        nproc = multiprocessing.cpu_count()
+    nproc = min( nproc, len( rootfiles ) )
+    if nproc <= 1:
+        return [ GetTreeInfo( rootfile, treename ) for rootfile in rootfiles ]
+    
+    print >>sys.stderr, "Reading %d files with %d processes" % ( len( rootfiles ), nproc )
+    pool = multiprocessing.Pool( nproc )
+    try:
+        chunksize = max( 1, len( rootfiles ) / ( 4 * nproc ) )
+        return pool.map( _GetTreeInfo, [ ( rootfile, treename ) for rootfile in rootfiles ], chunksize )
+    finally:
+        pool.close()
+        pool.join()
+
+## @short Function to count the entries of a TTree in many rootfiles in parallel
+#
+# See GetTreeInfoList.
+def GetNEventsList( rootfiles, treename, nproc=0 ):
+    return [ entries for entries, zipbytes in GetTreeInfoList( rootfiles, treename, nproc ) ]
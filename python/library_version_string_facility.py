@@ -14,6 +14,15 @@ called _$(LIBRARY)_version_info.
 
 The makefile will be modified to regenerate this file each time the library is reconstructed.
 
+The makefile will also be given rules to precompile the header $(INCDIR)/$(LIBRARY)_PCH.h,
+if a package has one. sframe_create_full_cycle.py --pch creates this header, and the compiler
+includes it first into every object of the package. The precompiled header is rebuilt whenever
+the ROOT or SFrame installation, or the compiler flags, change.
+
+Finally, packages that set UNITY_BUILD = N in their Makefile are compiled as a unity build.
+The sources are distributed over N unity sources of similar size by "sframe_write_unity_files",
+which include the real sources. The dictionary and version files are compiled separately.
+
 Another program called "sframe_read_version" will be supplied to read the version string from a
 specified library and dump it to the screen.
 
@@ -85,6 +94,53 @@ def recreate_version_file(library,version_file_path):
     file.close()
 
 
+# The variables of the unity build. These have to be set before OLIST is used in any rule.
+unity_variables = """ifneq (,$(UNITY_BUILD))
+ifneq (,$(SFRAME_META_TOOL_DIR))
+UNITY_DIR = $(OBJDIR)/unity
+UNITY_LIST := $(shell sframe_write_unity_files $(LIBRARY) $(UNITY_BUILD) $(UNITY_DIR) $(CPPLIST))
+OLIST := $(patsubst %.$(SrcSuf),%.o,$(notdir $(UNITY_LIST)))
+endif
+endif
+"""
+
+# The rules to compile the unity sources.
+# The dependency files make sure that a unity source is recompiled when any of its parts change.
+unity_rules = """
+# Unity build of the package. Added by SFrame_meta_tools.
+ifneq (,$(UNITY_LIST))
+$(addprefix $(OBJDIR)/,$(OLIST)): $(OBJDIR)/%.o : $(UNITY_DIR)/%.$(SrcSuf)
+\t@echo "Compiling $<"
+\t@mkdir -p $(OBJDIR)
+\t@$(CXX) $(CXXFLAGS) -MMD -MP -MT $@ -MF $(UNITY_DIR)/$*.d -c $< -o $@ $(INCLUDES)
+-include $(UNITY_LIST:.$(SrcSuf)=.d)
+endif
+"""
+
+# The rules to build the precompiled header of a package.
+# The stamp file only changes when the ROOT or SFrame installation or the compiler
+# flags change, and the precompiled header is rebuilt whenever it does.
+# GCC only uses a precompiled header that is included before any other code, so it is
+# given to every object with -include. The header itself is compiled with the flags
+# of the package as they were before that, since the objects pass them on to it.
+pch_rules = """
+# Precompiled header of the package. Added by SFrame_meta_tools.
+ifneq (,$(PCH_HEADER))
+PCH_CXXFLAGS := $(CXXFLAGS)
+PCH_VERSIONS := $(shell root-config --prefix --version) $(SFRAME_DIR) $(CXX) $(CXXFLAGS)
+$(PCH_STAMP): FORCE_PCH_STAMP
+	@mkdir -p $(OBJDIR)
+	@echo "$(PCH_VERSIONS)" | cmp -s - $@ || echo "$(PCH_VERSIONS)" > $@
+$(PCH_FILE): $(PCH_HEADER) $(PCH_STAMP) $(SFRAME_DIR)/core/include/SCycleBase.h
+	@echo "Precompiling header $(PCH_HEADER)"
+	@$(CXX) $(PCH_CXXFLAGS) $(INCLUDES) -x c++-header $(PCH_HEADER) -o $@
+$(addprefix $(OBJDIR)/,$(OLIST)): $(PCH_FILE)
+$(addprefix $(OBJDIR)/,$(OLIST)): CXXFLAGS += -include $(PCH_HEADER)
+.PHONY: FORCE_PCH_STAMP
+FORCE_PCH_STAMP:
+endif
+"""
+
 def modify_sframe_makefile():
     path = os.path.expandvars(SFrame_Makefile_common)
     # make a backup
@@ -101,6 +157,9 @@ def modify_sframe_makefile():
             newfile+="ifeq (,$(SFRAME_META_TOOL_DIR))\n"
             newfile+="VERSION_OBJ =\n"
             newfile+="endif\n"
+            newfile+="PCH_HEADER = $(wildcard $(INCDIR)/$(LIBRARY)_PCH.h)\n"
+            newfile+="PCH_FILE = $(PCH_HEADER:.h=.h.gch)\n"
+            newfile+="PCH_STAMP = $(OBJDIR)/$(LIBRARY)_PCH.stamp\n"
         elif line =='\t@echo "Making shared library: $(SHLIBFILE)"\n':
             newfile+=line
             newfile+="ifneq (,$(SFRAME_META_TOOL_DIR))\n"
@@ -111,18 +170,69 @@ def modify_sframe_makefile():
             newfile+=line.replace("$(addprefix $(OBJDIR)/,$(OLIST))","$(addprefix $(OBJDIR)/,$(OLIST) $(VERSION_OBJ))")
         elif line == "SKIPCPPLIST = $(DICTFILE)\n":
             newfile+= "SKIPCPPLIST = $(DICTFILE) $(VERSION_FILE)\n"
+        elif re.match(r"OLIST\s*:?=",line):
+            newfile+=line
+            newfile+=unity_variables
         elif line.startswith("INCLUDES +="):
             newfile+=line.strip()+" -I$(SFRAME_META_TOOL_DIR)/ \n"
         elif line.startswith("distclean:"):
             newfile+=line
             newfile+="\t@rm -f $(VERSION_FILE)\n"
+            newfile+="\t@rm -f $(PCH_FILE) $(PCH_STAMP)\n"
+            newfile+="\t@rm -rf $(OBJDIR)/unity\n"
         else:
             newfile+=line
+    newfile+=unity_rules
+    newfile+=pch_rules
     print "Writing modified",path
     file = open(path,"w")
     file.write(newfile)
     file.close()
 
+def write_unity_files(library,n,unity_dir,sources):
+    """
+    Distribute the sources over n unity sources in unity_dir and return their paths.
+    The sources are balanced by size, largest first. As long as the list of sources
+    doesn't change, the existing distribution is kept, so that editing a source only
+    recompiles its own unity source. Files are only rewritten if their content changes.
+    """
+    sources = sorted(set([os.path.abspath(src) for src in sources]))
+    if not sources:
+        return []
+    n = max(1,min(int(n),len(sources)))
+    suffix = os.path.splitext(sources[0])[1]
+    paths = [os.path.join(unity_dir,"%s_unity_%d%s"%(library,i,suffix)) for i in range(n)]
+    
+    # Try to reuse the existing distribution
+    groups = []
+    for path in paths:
+        if os.path.exists(path):
+            groups.append(re.findall(r'#include "(.*)"',open(path).read()))
+    if len(groups)!=n or sorted(sum(groups,[]))!=sources:
+        groups = [[] for path in paths]
+        sizes = [0]*n
+        for src in sorted(sources,key=lambda src:(-os.path.getsize(src),src)):
+            i = sizes.index(min(sizes))
+            groups[i].append(src)
+            sizes[i]+=os.path.getsize(src)
+    
+    if not os.path.exists(unity_dir):
+        os.makedirs(unity_dir)
+    for path,group in zip(paths,groups):
+        text ="\n//AUTO-GENERATED UNITY BUILD SOURCE.\n//Written by sframe_write_unity_files in SFrame_meta_tools.\n\n"
+        text+="".join(['#include "%s"\n'%src for src in sorted(group)])
+        if not os.path.exists(path) or open(path).read()!=text:
+            file = open(path,"w")
+            file.write(text)
+            file.close()
+    
+    # Remove the leftovers of a larger unity build
+    import glob
+    for path in glob.glob(os.path.join(unity_dir,"%s_unity_*"%library)):
+        if os.path.splitext(path)[0] not in [os.path.splitext(p)[0] for p in paths]:
+            os.remove(path)
+    return paths
+
 def get_version_info(lib_path):
     name=re.sub(r".*lib(.*).so.*",r"\g<1>",lib_path)
     
@@ -0,0 +1,104 @@
+## @package test_CycleUsage
+#    @short Tests of the static analysis of the variables used by a cycle
+#
+# The cycles are generated by CreateHeader and CreateSource, so that the tests
+# follow the code that they generate. Run all the tests from the top directory
+# with
+#
+# <code>
+#  $ python -m unittest discover -s test
+# </code>
+
+import os, sys, shutil, tempfile, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "python" ) )
+import BranchObject, CycleUsage, FullCycleCreators
+
+## @short Marks the place of the user code in the generated ExecuteEvent
+UserCodeMarker = "// The main part of your analysis goes here"
+
+class CycleUsageTest( unittest.TestCase ):
+    
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join( self.directory, "Ana.cxx" )
+        self.header = os.path.join( self.directory, "Ana.h" )
+    
+    def tearDown( self ):
+        shutil.rmtree( self.directory )
+    
+    ## @short Generates the cycle, with the user code in ExecuteEvent, and returns the used variables
+    def Analyse( self, userCode, declarations = [ "int el_n;", "float met;", "vector<float> *el_pt;", "Int_t njet;",
+                                                  "float jet_e[50]; //[njet]", "float weight;" ], systematics = "", **options ):
+        varlist = [ BranchObject.Variable.ReadFromString( line ) for line in declarations ]
+        if systematics:
+            options[ "variations" ] = FullCycleCreators.FindVariations( varlist, systematics )
+        options = FullCycleCreators.CycleOptions( create_output = True, **options )
+        stdout = sys.stdout
+        sys.stdout = open( os.devnull, "w" )
+        try:
+            FullCycleCreators.CreateHeader( "Ana", self.header, varlist = varlist, options = options )
+            FullCycleCreators.CreateSource( "Ana", self.source, varlist = varlist, header = self.header, options = options )
+        finally:
+            sys.stdout = stdout
+        code = open( self.source ).read()
+        self.assertTrue( UserCodeMarker in code )
+        open( self.source, "w" ).write( code.replace( UserCodeMarker, userCode ) )
+        className, variables = CycleUsage.AnalyseCycle( self.source )
+        self.assertEqual( className, "Ana" )
+        return sorted( [ name for name, cname, used in variables if used ] )
+    
+    def testGeneratedCodeDoesNotCount( self ):
+        self.assertEqual( self.Analyse( "" ), [] )
+    
+    def testUsedVariables( self ):
+        self.assertEqual( self.Analyse( "if( el_n > 1 && met > 20000. ) return;" ), [ "el_n", "met" ] )
+    
+    def testCommentsAndStrings( self ):
+        userCode = """// if( el_n > 1 ) return;
+    /* met > 20000.
+       && weight > 0 */
+    m_logger << DEBUG << "el_pt" << SLogger::endmsg;"""
+        self.assertEqual( self.Analyse( userCode ), [] )
+    
+    def testSwitchedOffCode( self ):
+        userCode = """#if 0
+    if( el_n > 1 ) return;
+#ifdef DEBUG_MET
+    std::cout << met;
+#endif
+#else
+    if( weight < 0 ) return;
+#endif"""
+        self.assertEqual( self.Analyse( userCode ), [ "weight" ] )
+    
+    def testMacros( self ):
+        # The names in the definitions of macros count, as the macros may be used anywhere
+        userCode = """#define LEADING_PT ( el_pt->size() ? el_pt->at( 0 ) : 0. )
+    if( LEADING_PT < 25000. ) return;"""
+        self.assertEqual( self.Analyse( userCode ), [ "el_pt" ] )
+    
+    def testArraySize( self ):
+        self.assertEqual( self.Analyse( "if( jet_e[ 0 ] > 1000. ) return;" ), [ "jet_e", "njet" ] )
+    
+    def testVariantsOfUsedVariables( self ):
+        declarations = [ "float met;", "float met_JES_up;", "float met_JES_down;", "int el_n;", "int el_n_JES_up;" ]
+        self.assertEqual( self.Analyse( "if( met > 20000. ) return;", declarations, systematics = "_JES_(up|down)", outtree = "T" ),
+                          [ "met", "met_JES_down", "met_JES_up" ] )
+    
+    def testOtherFilesOfThePackage( self ):
+        open( os.path.join( self.directory, "AnaHelpers.cxx" ), "w" ).write(
+            "double Ana::Weight() const {\n    return weight;\n}\ndouble Other::Met() const { return met; }\n" )
+        self.assertEqual( self.Analyse( "" ), [ "weight" ] )
+    
+    def testCommentOutUnused( self ):
+        self.Analyse( "if( met > 20000. ) return;" )
+        self.assertTrue( CycleUsage.CommentOutUnused( self.source, set( [ "el_n", "el_pt" ] ) ) > 0 )
+        self.assertTrue( os.path.exists( self.source + ".backup" ) )
+        className, variables = CycleUsage.AnalyseCycle( self.source )
+        self.assertEqual( sorted( [ name for name, cname, used in variables ] ), [ "jet_e", "met", "njet", "weight" ] )
+        for line in open( self.source ):
+            if "el_n" in line or "el_pt" in line:
+                self.assertTrue( line.lstrip().startswith( "//" ), line )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,326 @@
+## @package test_FullCycleCreators
+#    @short Tests of the functions of FullCycleCreators that don't need ROOT
+#
+# Run all the tests from the top directory with
+#
+# <code>
+#  $ python -m unittest discover -s test
+# </code>
+
+import os, sys, shutil, tempfile, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "python" ) )
+import FullCycleCreators
+
+class ExpandInputFilesTest( unittest.TestCase ):
+    
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.files = []
+        for name in [ "b.root", "a.root", "c.root", "other.txt" ]:
+            path = os.path.join( self.directory, name )
+            open( path, "w" ).write( "root" )
+            self.files.append( path )
+    
+    def tearDown( self ):
+        shutil.rmtree( self.directory )
+    
+    def Path( self, name ):
+        return os.path.join( self.directory, name )
+    
+    def testGlobSorted( self ):
+        self.assertEqual( FullCycleCreators.ExpandInputFiles( self.Path( "*.root" ) ),
+                          [ self.Path( "a.root" ), self.Path( "b.root" ), self.Path( "c.root" ) ] )
+    
+    def testSeveralPatterns( self ):
+        files = FullCycleCreators.ExpandInputFiles( "%s, %s," % ( self.Path( "c.root" ), self.Path( "[ab].root" ) ) )
+        self.assertEqual( files, [ self.Path( "c.root" ), self.Path( "a.root" ), self.Path( "b.root" ) ] )
+    
+    def testSingleRootFile( self ):
+        # A ROOT file is no list of files, even though it exists
+        self.assertEqual( FullCycleCreators.ExpandInputFiles( self.Path( "a.root" ) ), [ self.Path( "a.root" ) ] )
+    
+    def testFileList( self ):
+        filelist = self.Path( "files.txt" )
+        open( filelist, "w" ).write( "# The dataset\n/data/x.root\n\n  /data/y.root  \n#/data/z.root\n" )
+        self.assertEqual( FullCycleCreators.ExpandInputFiles( filelist ), [ "/data/x.root", "/data/y.root" ] )
+    
+    def testNoMatch( self ):
+        self.assertEqual( FullCycleCreators.ExpandInputFiles( self.Path( "*.nothing" ) ), [] )
+    
+    def testOutputFilesOfConfigs( self ):
+        config = self.Path( "Ana_config.xml" )
+        open( config, "w" ).write( "<JobConfiguration>\n<!-- %s %s -->\n<!-- %s %s -->\n</JobConfiguration>\n" %
+                                   ( FullCycleCreators.OutputFilesTag, self.Path( "[ab].root" ),
+                                     FullCycleCreators.OutputFilesTag, self.Path( "c.root" ) ) )
+        self.assertEqual( FullCycleCreators.ExpandInputFiles( self.Path( "*_config.xml" ) ),
+                          [ self.Path( "a.root" ), self.Path( "b.root" ), self.Path( "c.root" ) ] )
+
+class WriteInputFilesTest( unittest.TestCase ):
+    
+    def testStreamedInFileNames( self ):
+        import StringIO
+        text = """<InputData>\n    <In FileName="%s" Lumi="1.0"/>\n    <InputTree Name="T"/>\n</InputData>\n""" % FullCycleCreators.InputFilesMarker
+        output = StringIO.StringIO()
+        FullCycleCreators.WriteInputFiles( output, text, [ FullCycleCreators.InputFile( "a.root", lumi=0.5 ),
+                                                          FullCycleCreators.InputFile( "b&\"c\".root", lumi=2 ) ] )
+        self.assertEqual( output.getvalue(), """<InputData>\n"""
+                          """    <In FileName="a.root" Lumi="0.5"/>\n"""
+                          """    <In FileName='b&amp;"c".root' Lumi="2"/>\n"""
+                          """    <InputTree Name="T"/>\n</InputData>\n""" )
+
+class BalanceJobsTest( unittest.TestCase ):
+    
+    def testLargestFirst( self ):
+        jobs = FullCycleCreators.BalanceJobs( [ 5, 8, 3, 4, 7, 3 ], 3 )
+        self.assertEqual( sorted( sum( jobs, [] ) ), range( 6 ) )
+        self.assertEqual( jobs, [ [ 1, 5 ], [ 2, 4 ], [ 0, 3 ] ] )
+    
+    def testMoreJobsThanItems( self ):
+        self.assertEqual( FullCycleCreators.BalanceJobs( [ 10, 20 ], 4 ), [ [ 1 ], [ 0 ], [], [] ] )
+    
+    def testUnknownWeights( self ):
+        # Without weights, the ties go to the jobs with the fewest items
+        jobs = FullCycleCreators.BalanceJobs( [ 0 ] * 7, 3 )
+        self.assertEqual( sorted( [ len( job ) for job in jobs ] ), [ 2, 2, 3 ] )
+    
+    def testNoItems( self ):
+        self.assertEqual( FullCycleCreators.BalanceJobs( [], 2 ), [ [], [] ] )
+
+class CreateJobConfigsTest( unittest.TestCase ):
+    
+    ## @short Records the calls of CreateConfig instead of writing the configs
+    def setUp( self ):
+        self.configs = []
+        self.createConfig = FullCycleCreators.CreateConfig
+        FullCycleCreators.CreateConfig = lambda **kwargs: self.configs.append( kwargs )
+    
+    def tearDown( self ):
+        FullCycleCreators.CreateConfig = self.createConfig
+    
+    def Files( self, entries ):
+        total = float( sum( entries ) )
+        return [ FullCycleCreators.InputFile( "f%d.root" % i, n, n * 10, n / total ) for i, n in enumerate( entries ) ]
+    
+    def testJobs( self ):
+        FullCycleCreators.CreateJobConfigs( 2, configName = "config/Ana_config.xml", inputFiles = self.Files( [ 40, 30, 20, 10 ] ) )
+        self.assertEqual( [ config[ "configName" ] for config in self.configs ], [ "config/Ana_job0_config.xml", "config/Ana_job1_config.xml" ] )
+        self.assertEqual( [ config[ "postfix" ] for config in self.configs ], [ "_job0", "_job1" ] )
+        self.assertEqual( [ [ f.name for f in config[ "inputFiles" ] ] for config in self.configs ],
+                          [ [ "f0.root", "f3.root" ], [ "f1.root", "f2.root" ] ] )
+        self.assertTrue( self.configs[ 1 ][ "inputDataComment" ].startswith( "Job 2 of 2." ) )
+    
+    def testEveryJobHasTheWholeLumi( self ):
+        FullCycleCreators.CreateJobConfigs( 3, configName = "config/Ana_config.xml", inputFiles = self.Files( [ 50, 30, 15, 5 ] ) )
+        for config in self.configs:
+            self.assertAlmostEqual( sum( [ f.lumi for f in config[ "inputFiles" ] ] ), 1.0 )
+    
+    def testMoreJobsThanFiles( self ):
+        FullCycleCreators.CreateJobConfigs( 5, configName = "config/Ana_config.xml", inputFiles = self.Files( [ 10, 20 ] ) )
+        self.assertEqual( len( self.configs ), 2 )
+        self.assertEqual( sorted( [ f.name for config in self.configs for f in config[ "inputFiles" ] ] ), [ "f0.root", "f1.root" ] )
+        self.assertTrue( self.configs[ 0 ][ "inputDataComment" ].startswith( "Job 1 of 2." ) )
+    
+    def testBalancedByBytes( self ):
+        files = self.Files( [ 10, 10, 10 ] )
+        files[ 0 ].zipbytes = 1000
+        FullCycleCreators.CreateJobConfigs( 2, split_by = "bytes", configName = "config/Ana_config.xml", inputFiles = files )
+        self.assertEqual( sorted( [ [ f.name for f in config[ "inputFiles" ] ] for config in self.configs ] ),
+                          [ [ "f0.root" ], [ "f1.root", "f2.root" ] ] )
+
+class SplitCountsTest( unittest.TestCase ):
+    
+    def testOnlyLargeFiles( self ):
+        self.assertEqual( FullCycleCreators.SplitCounts( [ 100 ], [], 4 ), [ 4 ] )
+    
+    def testJobsLeftForTheWholeFiles( self ):
+        # Splitting the large files into more ranges would leave no job for the small one
+        self.assertEqual( FullCycleCreators.SplitCounts( [ 100, 60 ], [ 10 ], 5 ), [ 2, 2 ] )
+    
+    def testNoGainFromMoreRanges( self ):
+        # The whole files limit the longest job, so the large file isn't split further
+        self.assertEqual( FullCycleCreators.SplitCounts( [ 100 ], [ 50, 50 ], 3 ), [ 2 ] )
+    
+    def testEmptyWholeFiles( self ):
+        self.assertEqual( FullCycleCreators.SplitCounts( [ 100 ], [ 0, 0 ], 4 ), [ 3 ] )
+
+class SplitInputFileTest( unittest.TestCase ):
+    
+    ## @short Gives the cluster boundaries of the test instead of reading them from the file
+    def setUp( self ):
+        self.boundaries = []
+        self.getClusterBoundaries = FullCycleCreators.TTreeReader.GetClusterBoundaries
+        FullCycleCreators.TTreeReader.GetClusterBoundaries = lambda rootfile, treename: self.boundaries
+    
+    def tearDown( self ):
+        FullCycleCreators.TTreeReader.GetClusterBoundaries = self.getClusterBoundaries
+    
+    def Split( self, boundaries, nranges ):
+        self.boundaries = boundaries
+        inputFile = FullCycleCreators.InputFile( "large.root", boundaries and boundaries[ -1 ], 1000, 0.5 )
+        return FullCycleCreators.SplitInputFile( inputFile, nranges, "T" )
+    
+    def testClusterAligned( self ):
+        ranges = self.Split( [ 0, 30, 60, 90, 120 ], 2 )
+        self.assertEqual( [ ( r.skip, r.nmax ) for r in ranges ], [ ( 0, 60 ), ( 60, 60 ) ] )
+        self.assertEqual( [ r.zipbytes for r in ranges ], [ 500, 500 ] )
+        self.assertAlmostEqual( sum( [ r.lumi for r in ranges ] ), 0.5 )
+    
+    def testClosestBoundary( self ):
+        ranges = self.Split( [ 0, 10, 45, 100 ], 2 )
+        self.assertEqual( [ ( r.skip, r.nmax ) for r in ranges ], [ ( 0, 45 ), ( 45, 55 ) ] )
+    
+    def testFewerClustersThanRanges( self ):
+        # No range is left empty
+        ranges = self.Split( [ 0, 50, 100 ], 4 )
+        self.assertEqual( [ ( r.skip, r.nmax ) for r in ranges ], [ ( 0, 50 ), ( 50, 50 ) ] )
+    
+    def testEmptyClusters( self ):
+        ranges = self.Split( [ 0, 0, 40, 40, 80 ], 2 )
+        self.assertEqual( [ ( r.skip, r.nmax ) for r in ranges ], [ ( 0, 40 ), ( 40, 40 ) ] )
+    
+    def testWithoutClusters( self ):
+        # Every entry is a boundary then
+        ranges = self.Split( xrange( 11 ), 3 )
+        self.assertEqual( [ ( r.skip, r.nmax ) for r in ranges ], [ ( 0, 3 ), ( 3, 3 ), ( 6, 4 ) ] )
+    
+    def testUnreadableOrEmptyFile( self ):
+        for boundaries in ( [], [ 0 ] ):
+            ranges = self.Split( boundaries, 2 )
+            self.assertEqual( [ ( r.skip, r.nmax ) for r in ranges ], [ ( 0, -1 ) ] )
+
+## @short Function reading a list of variables from their declarations
+def Varlist( *lines ):
+    import BranchObject
+    return [ BranchObject.Variable.ReadFromString( line ) for line in lines ]
+
+class CompileSelectionTest( unittest.TestCase ):
+    
+    def setUp( self ):
+        self.varlist = Varlist( "int el_n;", "//float met;", "vector<float> *el_pt;", "float jet_e[50]; //[njet]",
+                                "//Int_t njet;", "float el.eta;", "float weight;" )
+        self.byname = dict( [ ( var.name, var ) for var in self.varlist ] )
+    
+    def testVariablesMarked( self ):
+        expression = FullCycleCreators.CompileSelection( "el_n>0 && met>2e4f", self.varlist )
+        self.assertEqual( expression, "el_n>0 && met>2e4f" )
+        self.assertEqual( [ var.name for var in self.varlist if var.selection ], [ "el_n", "met" ] )
+        self.assertEqual( self.byname[ "met" ].commented, "" )
+    
+    def testArrayCounterRead( self ):
+        FullCycleCreators.CompileSelection( "jet_e[0]>1000.", self.varlist )
+        self.assertTrue( self.byname[ "njet" ].selection )
+        self.assertEqual( self.byname[ "njet" ].commented, "" )
+    
+    def testMembersAndFunctions( self ):
+        expression = FullCycleCreators.CompileSelection( "el_pt->size()>1 && TMath::Abs(el.eta)<2.5 && std::max(el_n,1)>0 && true",
+                                                         self.varlist )
+        self.assertEqual( expression, "el_pt->size()>1 && TMath::Abs(el_eta)<2.5 && std::max(el_n,1)>0 && true" )
+        self.assertFalse( self.byname[ "weight" ].selection )
+    
+    def testUnknownVariable( self ):
+        self.assertRaises( SystemExit, FullCycleCreators.CompileSelection, "el_n>0 && mu_n>0", self.varlist )
+
+class UsedVariableLinesTest( unittest.TestCase ):
+    
+    def setUp( self ):
+        self.varlist = Varlist( "Int_t njet;", "float jet_e[50]; //[njet]", "//float met;", "float mc_w;", "float met2;",
+                                "float met2_JES_up;" )
+        self.varlist[ 3 ].mc = 1
+        self.varlist[ 5 ].nominal = self.varlist[ 4 ]
+        self.lines = FullCycleCreators.UsedVariableLines( self.varlist ).splitlines()
+    
+    def testCountersOfTheConnectedVariables( self ):
+        self.assertEqual( [ var.name for var in FullCycleCreators.ReadCounterVariables( self.varlist ) ],
+                          [ "njet", "jet_e", "mc_w", "met2", "met2_JES_up" ] )
+    
+    def testCommentedVariableKept( self ):
+        self.assertEqual( self.lines[ 2 ].strip(), """file << "// float met;" << std::endl;""" )
+    
+    def testArraySizeKeptWithTheArray( self ):
+        self.assertTrue( "m_cycleReads[ 0 ] > 0 || m_cycleReads[ 1 ] > 0 ?" in self.lines[ 0 ] )
+        self.assertTrue( "( m_cycleReads[ 1 ] > 0 ?" in self.lines[ 1 ] )
+    
+    def testMCVariableKeptWithoutMC( self ):
+        self.assertTrue( "( m_cycleReads[ 2 ] > 0 || ! m_readsMC ?" in self.lines[ 3 ] )
+    
+    def testVariantReadThroughItsNominal( self ):
+        self.assertTrue( "( m_cycleReads[ 3 ] > 0 ?" in self.lines[ 5 ] )
+    
+    def testQuotedDeclaration( self ):
+        varlist = Varlist( 'float pt; // "calibrated" \\ raw' )
+        self.assertTrue( r'<< "float pt; // \"calibrated\" \\ raw" <<' in FullCycleCreators.UsedVariableLines( varlist ) )
+
+class FindVariationsTest( unittest.TestCase ):
+    
+    def setUp( self ):
+        self.varlist = Varlist( "float met;", "float met_JES_up;", "float met_JES_down;", "int el_n;", "double el_n_JES_up;",
+                                "float jet_pt_MUON_up;", "//float mu_pt;", "float mu_pt_MUON_up;" )
+        self.byname = dict( [ ( var.name, var ) for var in self.varlist ] )
+        self.stderr = sys.stderr
+        sys.stderr = open( os.devnull, "w" )
+    
+    def tearDown( self ):
+        sys.stderr = self.stderr
+    
+    def testVariants( self ):
+        self.assertEqual( FullCycleCreators.FindVariations( self.varlist, "_JES_(up|down)" ), [ "JES_up", "JES_down" ] )
+        self.assertEqual( self.byname[ "met_JES_down" ].variation, "JES_down" )
+        self.assertTrue( self.byname[ "met_JES_down" ].nominal is self.byname[ "met" ] )
+        self.assertEqual( self.byname[ "met" ].variation, "" )
+    
+    def testDifferentTypes( self ):
+        FullCycleCreators.FindVariations( self.varlist, "_JES_up" )
+        self.assertEqual( self.byname[ "el_n_JES_up" ].variation, "" )
+        self.assertTrue( self.byname[ "el_n_JES_up" ].nominal is None )
+    
+    def testNoNominalVariable( self ):
+        # Neither a missing nor a commented nominal variable makes a variant
+        self.assertEqual( FullCycleCreators.FindVariations( self.varlist, "_MUON_up" ), [] )
+        self.assertEqual( self.byname[ "mu_pt_MUON_up" ].variation, "" )
+    
+    def testPatternMatchingNoVariable( self ):
+        import StringIO
+        sys.stderr = StringIO.StringIO()
+        self.assertEqual( FullCycleCreators.FindVariations( self.varlist, "_JES_up, _NOTHING_(up|down)," ), [ "JES_up" ] )
+        self.assertTrue( "\"_NOTHING_(up|down)\" matches no variant" in sys.stderr.getvalue() )
+        self.assertEqual( FullCycleCreators.FindVariations( self.varlist, "_NOTHING_" ), [] )
+        self.assertEqual( [ var.name for var in self.varlist if var.variation ], [ "met_JES_up" ] )
+    
+    def testInvalidPattern( self ):
+        self.assertRaises( SystemExit, FullCycleCreators.FindVariations, self.varlist, "_JES_(up" )
+
+class FeatureCodeTest( unittest.TestCase ):
+    
+    def setUp( self ):
+        self.formdict = { "class":"Ana", "namespace":"", "fullClassName":"Ana" }
+        self.varlist = Varlist( "int el_n;", "float met;", "vector<float> *el_pt;" )
+    
+    def testUnknownOption( self ):
+        self.assertRaises( TypeError, FullCycleCreators.CycleOptions, timings = True )
+    
+    def testNoFeatures( self ):
+        code = FullCycleCreators.FeatureCode( self.formdict, self.varlist, FullCycleCreators.CycleOptions( create_output = True ) )
+        self.assertEqual( [ key for key, lines in code.items() if lines ], [] )
+    
+    def testHookOrder( self ):
+        # The output file is switched before the progress is recorded, and both before the timing starts
+        options = FullCycleCreators.CycleOptions( create_output = True, rollover = True, progress = 10, timing = True )
+        code = FullCycleCreators.FeatureCode( self.formdict, self.varlist, options )
+        eventStart = code[ "eventStart" ]
+        self.assertTrue( 0 <= eventStart.index( "RollOutputPart" ) < eventStart.index( "ReportProgress" ) < eventStart.index( "TimingNow" ) )
+        self.assertTrue( "StartOutputParts" in code[ "inputDataSetup" ] )
+    
+    def testRolloverNeedsOutput( self ):
+        code = FullCycleCreators.FeatureCode( self.formdict, self.varlist, FullCycleCreators.CycleOptions( rollover = True ) )
+        self.assertEqual( code[ "eventStart" ], "" )
+        self.assertEqual( code[ "configDeclarations" ], "" )
+    
+    def testBlocksOfFlatVariables( self ):
+        options = FullCycleCreators.CycleOptions( block_size = 64 )
+        code = FullCycleCreators.FeatureCode( self.formdict, self.varlist, options )
+        self.assertTrue( "m_block.met[ m_blockIndex ]" in code[ "blockReading" ] )
+        self.assertFalse( "el_pt" in code[ "blockReading" ] )
+        self.assertTrue( code[ "blockComparison" ] )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+## @package test_unity_build
+#    @short Tests of the distribution of the sources over the unity sources
+#
+# Run all the tests from the top directory with
+#
+# <code>
+#  $ python -m unittest discover -s test
+# </code>
+
+import os, sys, shutil, tempfile, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "python" ) )
+import library_version_string_facility as facility
+
+class WriteUnityFilesTest( unittest.TestCase ):
+    
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.unity = os.path.join( self.directory, "obj", "unity" )
+    
+    def tearDown( self ):
+        shutil.rmtree( self.directory )
+    
+    ## @short Writes the sources with the given sizes, and returns their paths
+    def Sources( self, sizes ):
+        sources = []
+        for i, size in enumerate( sizes ):
+            path = os.path.join( self.directory, "Source%d.cxx" % i )
+            open( path, "w" ).write( "x" * size )
+            sources.append( path )
+        return sources
+    
+    ## @short Returns the sources included by every unity source
+    def Groups( self, paths ):
+        import re
+        return [ re.findall( r'#include "(.*)"', open( path ).read() ) for path in paths ]
+    
+    def testBalancedBySize( self ):
+        sources = self.Sources( [ 100, 60, 50, 40, 10 ] )
+        paths = facility.write_unity_files( "Ana", 2, self.unity, sources )
+        self.assertEqual( paths, [ os.path.join( self.unity, "Ana_unity_%d.cxx" % i ) for i in range( 2 ) ] )
+        groups = self.Groups( paths )
+        self.assertEqual( sorted( sum( groups, [] ) ), sorted( sources ) )
+        sizes = [ sum( [ os.path.getsize( src ) for src in group ] ) for group in groups ]
+        self.assertEqual( sorted( sizes ), [ 120, 140 ] )
+    
+    def testMoreUnitySourcesThanSources( self ):
+        sources = self.Sources( [ 10, 20 ] )
+        paths = facility.write_unity_files( "Ana", 5, self.unity, sources )
+        self.assertEqual( len( paths ), 2 )
+        self.assertEqual( [ len( group ) for group in self.Groups( paths ) ], [ 1, 1 ] )
+    
+    def testNoSources( self ):
+        self.assertEqual( facility.write_unity_files( "Ana", 3, self.unity, [] ), [] )
+    
+    def testDistributionKept( self ):
+        sources = self.Sources( [ 100, 60, 50 ] )
+        paths = facility.write_unity_files( "Ana", 2, self.unity, sources )
+        before = self.Groups( paths )
+        mtimes = [ os.path.getmtime( path ) for path in paths ]
+        # A source growing doesn't move the sources between the unity sources
+        open( sources[ 2 ], "w" ).write( "x" * 1000 )
+        os.utime( paths[ 0 ], ( 0, 0 ) )
+        facility.write_unity_files( "Ana", 2, self.unity, sources )
+        self.assertEqual( self.Groups( paths ), before )
+        self.assertEqual( os.path.getmtime( paths[ 0 ] ), 0 )
+        self.assertEqual( os.path.getmtime( paths[ 1 ] ), mtimes[ 1 ] )
+    
+    def testLeftoversRemoved( self ):
+        sources = self.Sources( [ 30, 20, 10 ] )
+        facility.write_unity_files( "Ana", 3, self.unity, sources )
+        paths = facility.write_unity_files( "Ana", 2, self.unity, sources )
+        self.assertEqual( sorted( os.listdir( self.unity ) ), sorted( [ os.path.basename( path ) for path in paths ] ) )
+        self.assertEqual( sorted( sum( self.Groups( paths ), [] ) ), sorted( sources ) )
+
+if __name__ == "__main__":
+    unittest.main()